@@ -6,11 +6,11 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
-from ...core.database import get_db
+from ...core.database import get_db, get_read_db
 from ...core.config import settings
 from ...core.security import (
-    get_password_hash,
-    verify_password,
+    get_password_hash_async,
+    verify_and_update_password,
     create_access_token,
     get_current_user
 )
@@ -45,11 +45,10 @@ async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
         email=user_data.email,
         username=user_data.username,
         full_name=user_data.full_name,
-        hashed_password=get_password_hash(user_data.password)
+        hashed_password=await get_password_hash_async(user_data.password)
     )
     db.add(user)
-    await db.commit()
-    await db.refresh(user)
+    await db.flush()
 
     # Generate token
     access_token = create_access_token(
@@ -72,7 +71,14 @@ async def login(credentials: UserLogin, db: AsyncSession = Depends(get_db)):
     result = await db.execute(select(User).where(User.email == credentials.email))
     user = result.scalar_one_or_none()
 
-    if not user or not verify_password(credentials.password, user.hashed_password):
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid email or password"
+        )
+
+    valid, new_hash = await verify_and_update_password(credentials.password, user.hashed_password)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
@@ -84,10 +90,13 @@ async def login(credentials: UserLogin, db: AsyncSession = Depends(get_db)):
             detail="User account is disabled"
         )
 
+    # Upgrade the stored hash if the configured work factor changed
+    if new_hash:
+        user.hashed_password = new_hash
+
     # Update last login
     from datetime import datetime
     user.last_login = datetime.utcnow()
-    await db.commit()
 
     # Generate token
     access_token = create_access_token(
@@ -105,7 +114,7 @@ async def login(credentials: UserLogin, db: AsyncSession = Depends(get_db)):
 @router.get("/me", response_model=UserResponse)
 async def get_current_user_info(
     current_user: dict = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get current authenticated user info"""
     result = await db.execute(select(User).where(User.id == int(current_user["user_id"])))
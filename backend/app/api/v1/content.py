@@ -1,20 +1,28 @@
 """
 Content API endpoints
 """
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+import json
+from typing import Any, AsyncIterator, Dict, List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query, Response, Header
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ...core.database import get_db
+from ...core.database import get_db, get_read_db
 from ...core.security import get_current_user
 from ...models.content import ContentType, Platform
 from ...schemas.content import (
     ContentCreate, ContentResponse,
-    AdaptationCreate, AdaptationResponse, AdaptationPreview,
+    AdaptationCreate, AdaptationResponse, AdaptationPreview, HashtagSuggestion, PlatformImage,
     PLATFORM_CONFIGS, PlatformConfig
 )
-from ...services.content_service import content_service
+from ...core.config import settings
+from ...services.content_service import RENDERED_CONTENT_TYPES, IdempotencyConflictError, content_service
+from ...services.image_service import image_service
+from ...services.llm_router import LLMRateLimitedError
+from ...services.render_service import render_service
 from ...services.storage_service import storage_service
+from ...utils.media import MediaError
+from ...utils.pagination import encode_cursor, decode_cursor
 
 router = APIRouter(prefix="/contents", tags=["Content"])
 
@@ -31,53 +39,112 @@ async def upload_content(
     """Upload new content for processing"""
     user_id = int(current_user["user_id"])
 
-    # Upload file to storage
-    file_content = await file.read()
-    file_url = await storage_service.upload_file(
+    # Stream file to storage in chunks instead of reading it into memory
+    stored = await storage_service.upload_stream(
         user_id=user_id,
-        file_content=file_content,
+        stream=file,
         filename=file.filename,
         content_type=file.content_type,
         folder="original"
     )
+    # Identical files are stored once and shared by reference
+    stored = await storage_service.store_blob(db, stored, file.filename)
 
     # Create content entry
     content_data = ContentCreate(
         title=title,
         description=description,
         content_type=content_type,
-        original_file_url=file_url
+        original_file_url=stored.url,
+        file_size=stored.size,
+        file_hash=stored.sha256
     )
 
     content = await content_service.create_content(db, user_id, content_data)
 
-    # Trigger async analysis (in production, would use background task)
-    content = await content_service.analyze_content(db, content)
+    # Analysis runs in the background worker
+    await content_service.schedule_analysis(db, content)
 
     return ContentResponse.model_validate(content)
 
 
+def _rate_limited() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="AI providers are rate limiting requests, please retry shortly",
+        headers={"Retry-After": str(int(settings.LLM_RETRY_AFTER_DEFAULT_SECONDS))}
+    )
+
+
+def _parse_cursor(cursor: Optional[str]):
+    if cursor is None:
+        return None
+    try:
+        return decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def _set_next_cursor(response: Response, items: list, limit: int) -> None:
+    """Advertise the cursor for the next page when this page is full"""
+    if items and len(items) == limit:
+        last = items[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(last.created_at, last.id)
+
+
 @router.get("/", response_model=List[ContentResponse])
 async def list_contents(
+    response: Response,
     skip: int = 0,
-    limit: int = 20,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
     current_user: dict = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """List all contents for current user"""
+    """
+    List contents for current user, newest first.
+
+    Pass the X-Next-Cursor header of the previous page as `cursor` for
+    keyset paging; `skip` is kept for legacy offset paging.
+    """
     user_id = int(current_user["user_id"])
-    contents = await content_service.list_user_contents(db, user_id, skip, limit)
-    return [ContentResponse.model_validate(c) for c in contents]
+    contents = await content_service.list_user_contents_cached(
+        db, user_id, skip, limit, after=_parse_cursor(cursor)
+    )
+    _set_next_cursor(response, contents, limit)
+    return contents
 
 
 @router.get("/{content_id}", response_model=ContentResponse)
 async def get_content(
     content_id: int,
     current_user: dict = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get content by ID"""
     user_id = int(current_user["user_id"])
+    content = await content_service.get_content_cached(db, content_id, user_id)
+
+    if not content:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Content not found"
+        )
+
+    return content
+
+
+@router.delete("/{content_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_content(
+    content_id: int,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Delete content, its adaptations and its file if no other content shares it"""
+    user_id = int(current_user["user_id"])
     content = await content_service.get_content(db, content_id, user_id)
 
     if not content:
@@ -86,16 +153,17 @@ async def get_content(
             detail="Content not found"
         )
 
-    return ContentResponse.model_validate(content)
+    await content_service.delete_content(db, content)
 
 
 @router.post("/{content_id}/analyze", response_model=ContentResponse)
 async def analyze_content(
     content_id: int,
+    fresh: bool = False,
     current_user: dict = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Trigger content analysis"""
+    """Trigger content analysis (queued for video and audio); fresh=true bypasses cached AI responses"""
     user_id = int(current_user["user_id"])
     content = await content_service.get_content(db, content_id, user_id)
 
@@ -105,7 +173,10 @@ async def analyze_content(
             detail="Content not found"
         )
 
-    content = await content_service.analyze_content(db, content)
+    try:
+        content = await content_service.request_analysis(db, content, use_cache=not fresh)
+    except LLMRateLimitedError:
+        raise _rate_limited()
     return ContentResponse.model_validate(content)
 
 
@@ -113,10 +184,11 @@ async def analyze_content(
 async def preview_adaptations(
     content_id: int,
     target_platforms: List[Platform],
+    fresh: bool = False,
     current_user: dict = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Generate preview of adaptations for selected platforms"""
+    """Generate preview of adaptations for selected platforms; fresh=true bypasses cached AI responses"""
     user_id = int(current_user["user_id"])
     content = await content_service.get_content(db, content_id, user_id)
 
@@ -126,18 +198,79 @@ async def preview_adaptations(
             detail="Content not found"
         )
 
-    previews = await content_service.generate_adaptations_preview(db, content, target_platforms)
+    try:
+        previews = await content_service.generate_adaptations_preview(
+            db, content, target_platforms, use_cache=not fresh
+        )
+    except LLMRateLimitedError:
+        raise _rate_limited()
     return previews
 
 
+async def _encode_events(
+    events: AsyncIterator[Dict[str, Any]],
+    stream_format: str
+) -> AsyncIterator[str]:
+    """Frame events as Server-Sent Events or newline-delimited JSON"""
+    try:
+        async for event in events:
+            if stream_format == "ndjson":
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+            elif event["event"] == "ping":
+                yield ": ping\n\n"
+            else:
+                data = json.dumps(event["data"], ensure_ascii=False)
+                yield f"event: {event['event']}\ndata: {data}\n\n"
+    finally:
+        # Runs when the client disconnects too, cancelling in-flight model calls
+        await events.aclose()
+
+
+@router.post("/{content_id}/adapt/preview/stream")
+async def stream_preview_adaptations(
+    content_id: int,
+    target_platforms: List[Platform],
+    fresh: bool = False,
+    tokens: bool = False,
+    format: Literal["sse", "ndjson"] = "sse",
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Stream adaptation previews as each platform completes.
+
+    Sends Server-Sent Events by default, or NDJSON with format=ndjson;
+    tokens=true also streams the raw model output per platform as `delta`
+    events. Disconnecting cancels the remaining generation.
+    """
+    user_id = int(current_user["user_id"])
+    content = await content_service.get_content(db, content_id, user_id)
+
+    if not content:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Content not found"
+        )
+
+    events = content_service.stream_adaptations_preview(
+        content_id, user_id, target_platforms, use_cache=not fresh, stream_tokens=tokens
+    )
+    return StreamingResponse(
+        _encode_events(events, format),
+        media_type="application/x-ndjson" if format == "ndjson" else "text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.post("/{content_id}/adapt", response_model=List[AdaptationResponse])
 async def create_adaptations(
     content_id: int,
     previews: List[AdaptationPreview],
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
     current_user: dict = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Create adaptations from previews"""
+    """Create adaptations from previews in one transaction; retries with the same Idempotency-Key are safe"""
     user_id = int(current_user["user_id"])
     content = await content_service.get_content(db, content_id, user_id)
 
@@ -147,27 +280,137 @@ async def create_adaptations(
             detail="Content not found"
         )
 
-    adaptations = []
-    for preview in previews:
-        adaptation = await content_service.create_adaptation(db, content, preview, user_id)
-        adaptations.append(AdaptationResponse.model_validate(adaptation))
+    try:
+        adaptations = await content_service.create_adaptations_bulk(
+            db, content, previews, user_id, idempotency_key=idempotency_key
+        )
+    except IdempotencyConflictError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    await content_service.schedule_render(db, content)
 
-    return adaptations
+    return [AdaptationResponse.model_validate(a) for a in adaptations]
+
+
+@router.get("/{content_id}/render")
+async def get_render_progress(
+    content_id: int,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Progress of the content's latest video render: status, progress (0-1), platforms, error"""
+    user_id = int(current_user["user_id"])
+    content = await content_service.get_content_cached(db, content_id, user_id)
+    if not content:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Content not found"
+        )
+
+    progress = await render_service.get_progress(content_id)
+    if progress is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No render for this content"
+        )
+    return progress
+
+
+@router.get("/{content_id}/images", response_model=List[PlatformImage])
+async def get_platform_images(
+    content_id: int,
+    platforms: List[Platform] = Query(...),
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """The content's image, or a frame of its video, cropped for each platform; derived once and then cached"""
+    user_id = int(current_user["user_id"])
+    content = await content_service.get_content(db, content_id, user_id)
+    if not content:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Content not found"
+        )
+    if content.content_type not in RENDERED_CONTENT_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Only image and video content has platform images"
+        )
+
+    try:
+        images = await image_service.platform_images(content, platforms)
+    except MediaError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e)
+        )
+    return [
+        PlatformImage(
+            platform=platform,
+            aspect_ratio=PLATFORM_CONFIGS[platform].aspect_ratio,
+            image_url=urls["image"],
+            thumbnail_url=urls["thumbnail"]
+        )
+        for platform, urls in images.items()
+    ]
 
 
 @router.get("/{content_id}/adaptations", response_model=List[AdaptationResponse])
 async def list_content_adaptations(
     content_id: int,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=100),
+    cursor: Optional[str] = None,
     current_user: dict = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """List all adaptations for a content"""
+    """List adaptations for a content; all of them unless `limit` is set, with keyset paging via `cursor`"""
     user_id = int(current_user["user_id"])
-    adaptations = await content_service.list_content_adaptations(db, content_id, user_id)
-    return [AdaptationResponse.model_validate(a) for a in adaptations]
+    adaptations = await content_service.list_content_adaptations_cached(
+        db, content_id, user_id, limit=limit, after=_parse_cursor(cursor)
+    )
+    if limit is not None:
+        _set_next_cursor(response, adaptations, limit)
+    return adaptations
 
 
 @router.get("/platforms/config", response_model=List[PlatformConfig])
 async def get_platform_configs():
     """Get configuration for all supported platforms"""
     return list(PLATFORM_CONFIGS.values())
+
+
+@router.get("/platforms/{platform}/hashtags", response_model=List[HashtagSuggestion])
+async def suggest_hashtags(
+    platform: Platform,
+    q: Optional[str] = Query(None, max_length=2000),
+    content_id: Optional[int] = None,
+    limit: int = Query(10, ge=1, le=50),
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Hashtags used on the platform for similar content, matched against `q` and/or a content's title and topics"""
+    text = q or ""
+    if content_id is not None:
+        user_id = int(current_user["user_id"])
+        content = await content_service.get_content_cached(db, content_id, user_id)
+        if not content:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Content not found"
+            )
+        text = f"{text} {content_service.hashtag_query(content.title, content.analysis_result)}"
+
+    if not text.strip():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Provide q or content_id"
+        )
+    return content_service.suggest_hashtags(platform, text, limit)
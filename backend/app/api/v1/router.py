@@ -5,8 +5,12 @@ from fastapi import APIRouter
 
 from .auth import router as auth_router
 from .content import router as content_router
+from .system import router as system_router
+from .uploads import router as uploads_router
 
 api_router = APIRouter()
 
 api_router.include_router(auth_router)
 api_router.include_router(content_router)
+api_router.include_router(uploads_router)
+api_router.include_router(system_router)
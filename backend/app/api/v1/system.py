@@ -0,0 +1,33 @@
+"""
+System monitoring API endpoints
+"""
+from fastapi import APIRouter, Depends
+
+from ...core.security import get_current_user
+from ...services.ai_service import ai_service
+from ...services.content_service import content_service
+from ...services.hashtag_index import hashtag_index
+from ...services.image_service import image_service
+from ...services.render_service import render_service
+from ...services.scene_service import scene_service
+from ...services.storage_service import storage_service
+from ...services.transcription_service import transcription_service
+
+router = APIRouter(prefix="/system", tags=["System"])
+
+
+@router.get("/metrics")
+async def get_metrics(current_user: dict = Depends(get_current_user)):
+    """Get runtime metrics for service internals"""
+    return {
+        "llm_providers": ai_service.router.stats() if ai_service.router else None,
+        "ai_governor": ai_service.router.governor_stats() if ai_service.router else None,
+        "llm_cache": ai_service.cache.stats() if ai_service.cache else None,
+        "read_cache": content_service.read_cache.stats() if content_service.read_cache else None,
+        "hashtag_index": hashtag_index.stats() if hashtag_index else None,
+        "storage": storage_service.metrics.snapshot(),
+        "transcription": transcription_service.stats(),
+        "scenes": scene_service.stats(),
+        "render": render_service.stats(),
+        "images": image_service.stats()
+    }
@@ -0,0 +1,124 @@
+"""
+Resumable upload API endpoints
+"""
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...core.database import get_db
+from ...core.config import settings
+from ...core.security import get_current_user
+from ...models.content import ContentType
+from ...schemas.content import ContentCreate, ContentResponse
+from ...schemas.upload import UploadSessionCreate, UploadSessionResponse, UploadChunkResponse
+from ...services.content_service import content_service
+from ...services.storage_service import storage_service
+from ...services.upload_service import upload_service, UploadSessionError
+
+router = APIRouter(prefix="/uploads", tags=["Uploads"])
+
+
+async def _get_session_or_404(upload_id: str, user_id: int) -> dict:
+    session = await upload_service.get_session(upload_id, user_id)
+    if not session:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Upload session not found"
+        )
+    return session
+
+
+@router.post("/", response_model=UploadSessionResponse, status_code=status.HTTP_201_CREATED)
+async def create_upload_session(
+    data: UploadSessionCreate,
+    current_user: dict = Depends(get_current_user)
+):
+    """Start a resumable upload"""
+    user_id = int(current_user["user_id"])
+    try:
+        session = await upload_service.create_session(user_id, data)
+    except UploadSessionError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return await upload_service.get_state(session)
+
+
+@router.get("/{upload_id}", response_model=UploadSessionResponse)
+async def get_upload_session(
+    upload_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get upload progress, including the chunks that are still missing"""
+    session = await _get_session_or_404(upload_id, int(current_user["user_id"]))
+    return await upload_service.get_state(session)
+
+
+@router.put("/{upload_id}/chunks/{index}", response_model=UploadChunkResponse)
+async def put_upload_chunk(
+    upload_id: str,
+    index: int,
+    request: Request,
+    current_user: dict = Depends(get_current_user)
+):
+    """Upload one chunk as the raw request body; chunks may be sent in any order and in parallel"""
+    session = await _get_session_or_404(upload_id, int(current_user["user_id"]))
+
+    # Chunks are bounded by UPLOAD_SESSION_MAX_CHUNK_SIZE, so buffering one is safe
+    data = bytearray()
+    async for block in request.stream():
+        data.extend(block)
+        if len(data) > settings.UPLOAD_SESSION_MAX_CHUNK_SIZE:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail="Chunk too large"
+            )
+
+    try:
+        received = await upload_service.put_chunk(session, index, bytes(data))
+    except UploadSessionError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    return UploadChunkResponse(
+        index=index,
+        size=len(data),
+        received_chunks=received,
+        total_chunks=int(session["total_chunks"])
+    )
+
+
+@router.post("/{upload_id}/complete", response_model=ContentResponse, status_code=status.HTTP_201_CREATED)
+async def complete_upload(
+    upload_id: str,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Assemble all chunks and create the content"""
+    user_id = int(current_user["user_id"])
+    session = await _get_session_or_404(upload_id, user_id)
+
+    try:
+        stored = await upload_service.finalize(db, session)
+    except UploadSessionError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    stored = await storage_service.store_blob(db, stored, session["filename"])
+
+    content_data = ContentCreate(
+        title=session["title"],
+        description=session["description"] or None,
+        content_type=ContentType(session["content_type"]),
+        original_file_url=stored.url,
+        file_size=stored.size,
+        file_hash=stored.sha256
+    )
+    content = await content_service.create_content(db, user_id, content_data)
+    await content_service.schedule_analysis(db, content)
+
+    return ContentResponse.model_validate(content)
+
+
+@router.delete("/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def abort_upload(
+    upload_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Cancel an upload and discard its chunks"""
+    session = await _get_session_or_404(upload_id, int(current_user["user_id"]))
+    await upload_service.abort(session)
@@ -0,0 +1,97 @@
+"""
+Cache backends with TTL and size-bounded eviction
+"""
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional, Tuple
+from redis import asyncio as aioredis
+
+
+class CacheBackend(ABC):
+    """Interface for string key/value caches"""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: str, ttl: int) -> None:
+        ...
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        ...
+
+
+class MemoryCacheBackend(CacheBackend):
+    """In-process LRU cache; entries expire after their TTL"""
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: str, ttl: int) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Redis cache shared across API nodes.
+
+    Keys are tracked in a sorted set by write time so the namespace can be
+    capped at max_entries, evicting the oldest writes first.
+    """
+
+    def __init__(self, redis: aioredis.Redis, prefix: str, max_entries: int = 10000):
+        self.redis = redis
+        self.prefix = prefix
+        self.max_entries = max_entries
+        self._index_key = f"{prefix}:__index__"
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}:{key}"
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self.redis.get(self._key(key))
+
+    async def set(self, key: str, value: str, ttl: int) -> None:
+        full_key = self._key(key)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.set(full_key, value, ex=ttl)
+            pipe.zadd(self._index_key, {full_key: time.time()})
+            pipe.zcard(self._index_key)
+            results = await pipe.execute()
+
+        overflow = results[-1] - self.max_entries
+        if overflow > 0:
+            evicted = await self.redis.zpopmin(self._index_key, overflow)
+            if evicted:
+                await self.redis.delete(*[member for member, _ in evicted])
+
+    async def delete(self, key: str) -> None:
+        full_key = self._key(key)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.delete(full_key)
+            pipe.zrem(self._index_key, full_key)
+            await pipe.execute()
@@ -2,7 +2,7 @@
 Application configuration settings
 """
 from pydantic_settings import BaseSettings
-from typing import List, Optional
+from typing import Dict, List, Optional
 from functools import lru_cache
 
 
@@ -25,20 +25,168 @@ class Settings(BaseSettings):
     # Redis
     REDIS_URL: str = "redis://localhost:6379/0"
 
+    # Background jobs
+    JOB_QUEUE_NAME: str = "crosspilot"
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_VISIBILITY_TIMEOUT_SECONDS: int = 300
+    JOB_RETRY_BACKOFF_SECONDS: float = 5.0
+    JOB_RETRY_BACKOFF_MAX_SECONDS: float = 300.0
+    WORKER_PROCESSES: int = 2
+    WORKER_CONCURRENCY: int = 4  # Jobs per worker process
+    WORKER_MAINTENANCE_INTERVAL_SECONDS: int = 300
+
     # JWT
     SECRET_KEY: str = "your-secret-key-change-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
 
+    # Password hashing
+    BCRYPT_ROUNDS: int = 12  # Existing hashes are upgraded on login when this changes
+    PASSWORD_HASH_WORKERS: int = 4
+
     # AI Services
     OPENAI_API_KEY: Optional[str] = None
+    OPENAI_BASE_URL: Optional[str] = None  # OpenAI-compatible endpoint or local mock server
+    OPENAI_MODEL: str = "gpt-4-turbo-preview"
     ANTHROPIC_API_KEY: Optional[str] = None
+    ANTHROPIC_BASE_URL: Optional[str] = None
+    ANTHROPIC_MODEL: str = "claude-3-sonnet-20240229"
+
+    # LLM routing
+    LLM_PROVIDERS: List[str] = ["openai", "anthropic"]  # Preference order among configured providers
+    LLM_REQUEST_TIMEOUT_SECONDS: float = 60.0
+    LLM_CLIENT_MAX_RETRIES: int = 1  # Per provider; failover to the next provider comes after
+    LLM_MAX_OUTPUT_TOKENS: int = 4096
+    LLM_HEALTH_WINDOW: int = 50  # Recent calls per provider used for routing
+    LLM_BREAKER_FAILURE_THRESHOLD: int = 5
+    LLM_BREAKER_COOLDOWN_SECONDS: float = 30.0
+    LLM_HEDGE_ENABLED: bool = False  # Send a slow request to a second provider as well
+    LLM_HEDGE_MIN_DELAY_SECONDS: float = 2.0
+
+    # AI call governor
+    LLM_RATE_LIMITS: Dict[str, Dict[str, int]] = {  # Per provider; 0 disables a bucket
+        "openai": {"rpm": 500, "tpm": 150000},
+        "anthropic": {"rpm": 50, "tpm": 40000},
+    }
+    LLM_EXPECTED_OUTPUT_TOKENS: int = 800  # Reserved per call, reconciled with reported usage
+    LLM_CONCURRENCY_INITIAL: int = 4
+    LLM_CONCURRENCY_MIN: int = 1
+    LLM_CONCURRENCY_MAX: int = 32
+    LLM_LATENCY_TARGET_SECONDS: float = 30.0  # Slower calls shrink the concurrency limit
+    LLM_RETRY_AFTER_DEFAULT_SECONDS: float = 5.0  # Pause after a 429 without Retry-After
+    LLM_RATE_LIMIT_RETRIES: int = 3  # Rounds of waiting when every provider is throttled
+
+    AI_MAX_CONCURRENCY: int = 4  # Parallel LLM calls per adaptation preview
+    AI_BATCH_ADAPTATION: bool = True  # One prompt for all platforms, per-platform fallback
+    AI_ANALYSIS_INPUT_TOKENS: int = 6000  # Longer content is analyzed map-reduce over chunk summaries
+    AI_CHUNK_TOKENS: int = 3000
+    AI_CHUNK_SUMMARY_TOKENS: int = 300
+    AI_MAX_REDUCE_ROUNDS: int = 3
+    AI_ADAPTATION_SOURCE_TOKENS: int = 2500  # Source text sent with each adaptation prompt
+
+    # Local analysis tier
+    FAST_ANALYZER: Optional[str] = "textrank"  # None disables the tier
+    FAST_ANALYSIS_INLINE_CHARS: int = 5000  # Longer text is analyzed on a worker thread
+    # Per subscription plan: "full" (LLM), "hybrid" (local tier, LLM for the rest) or "fast" (local
+    # tier only: no key points, tone or style). Cheaper modes are opt-in; unlisted plans get "full"
+    AI_ANALYSIS_MODES: Dict[str, str] = {
+        "free": "full",
+        "professional": "full",
+        "team": "full",
+        "enterprise": "full",
+    }
+    ANALYSIS_LOCK_LEASE_SECONDS: int = 30  # Renewed while an analysis runs; a dead node's lease expires
+    ANALYSIS_WAIT_POLL_SECONDS: float = 0.5
+    PREVIEW_STREAM_HEARTBEAT_SECONDS: float = 15.0  # Keep-alive for streamed previews behind proxies
+
+    # Speech transcription for video and audio content
+    TRANSCRIBE_ENABLED: bool = True  # Also needs openai-whisper and ffmpeg installed
+    WHISPER_MODEL: str = "base"
+    TRANSCRIBE_LANGUAGE: Optional[str] = None  # None detects it once, from the first segment
+    TRANSCRIBE_PROCESSES: int = 2  # Whisper processes per API or worker process, started on first use
+    TRANSCRIBE_SEGMENT_SECONDS: float = 60.0  # Audio is cut in pauses into segments of at most this
+    TRANSCRIBE_MIN_SEGMENT_SECONDS: float = 10.0
+    FFMPEG_BINARY: str = "ffmpeg"
+    FFPROBE_BINARY: str = "ffprobe"
+
+    # Platform video rendering
+    RENDER_PROCESSES: int = 2  # Concurrent ffmpeg render processes per worker process
+    RENDER_THREADS: int = 4  # Threads per ffmpeg process; with lookahead this bounds its memory
+    RENDER_MEMORY_LIMIT_MB: Optional[int] = None  # Address-space cap per ffmpeg process (Linux)
+    RENDER_SHORT_SIDE: int = 1080  # Output short side; smaller sources are not upscaled
+    RENDER_X264_PRESET: str = "veryfast"
+    RENDER_CRF: int = 23
+    RENDER_LOOKAHEAD_FRAMES: int = 20
+    RENDER_LOCK_LEASE_SECONDS: int = 60  # One renderer per content; renewed while it runs, a dead worker's expires
+
+    # Scene cuts and keyframes in video
+    SCENE_DETECTION_ENABLED: bool = True  # Also needs ffmpeg installed
+    SCENE_SAMPLE_FPS: float = 2.0
+    SCENE_FRAME_WIDTH: int = 64  # Sampled frames are scaled to this width for analysis
+    SCENE_CUT_THRESHOLD: float = 0.35  # Cut score (0-1) from histogram distance and luma change
+    SCENE_MIN_SECONDS: float = 1.0  # Shortest scene; also merges the frames of a gradual transition
+    SCENE_BATCH_FRAMES: int = 256
+    SCENE_LOCK_LEASE_SECONDS: int = 30  # One scan per file across nodes; renewed while it runs
+    SCENE_WAIT_POLL_SECONDS: float = 1.0
+    KEYFRAME_COUNT: int = 9  # Keyframes recorded in a video's analysis
+
+    # Platform image crops and thumbnails
+    IMAGE_SHORT_SIDE: int = 1080
+    THUMBNAIL_SHORT_SIDE: int = 360
+    IMAGE_SALIENCY_SIZE: int = 128  # Longest side of the map the crop is chosen on
+    CAROUSEL_MAX_SLIDES: int = 9  # Xiaohongshu notes take up to 18 images
+
+    # Hashtag suggestions from past adaptations
+    HASHTAG_INDEX_ENABLED: bool = True
+    HASHTAG_INDEX_REFRESH_SECONDS: int = 600
+    HASHTAG_INDEX_MAX_ADAPTATIONS: int = 50000  # Most recent adaptations the index is built from
+    HASHTAG_INDEX_DIM: int = 256  # Hashed n-gram embedding size
+    HASHTAG_INDEX_TAG_WEIGHT: float = 0.5  # Tag text vs. the topics it was used with
+    HASHTAG_INDEX_POPULARITY_WEIGHT: float = 0.2  # Share of the score from how often a tag was used
+    HASHTAG_INDEX_MIN_LIST_SIZE: int = 32  # Fewer tags per cluster than this means exact search
+    HASHTAG_INDEX_PROBES: int = 4  # Clusters scored per search
+    HASHTAG_INDEX_KMEANS_ITERATIONS: int = 10
+    HASHTAG_PROMPT_CANDIDATES: int = 15  # Suggestions offered to the model per platform; 0 disables
+
+    # LLM response cache
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_BACKEND: str = "memory"  # "memory" or "redis"
+    LLM_CACHE_MAX_ENTRIES: int = 5000
+    LLM_CACHE_DEFAULT_TTL: int = 3600
+    LLM_CACHE_TTLS: Dict[str, int] = {
+        "analyze_content": 7 * 24 * 3600,
+        "summarize_chunk": 7 * 24 * 3600,
+        "analyze_fields": 7 * 24 * 3600,
+        "generate_adaptation": 24 * 3600,
+        "generate_adaptations_batch": 24 * 3600,
+        "rewrite_text": 3600,
+        "generate_titles": 3600,
+    }
+
+    # Read-through cache for content and adaptation reads
+    READ_CACHE_ENABLED: bool = True
+    READ_CACHE_TTL: int = 300
+    READ_CACHE_LOCAL_TTL: int = 2  # Bounds staleness in other processes after a write
+    READ_CACHE_LOCAL_MAX_ENTRIES: int = 2000
+    READ_CACHE_LOCK_TIMEOUT: float = 5.0  # How long concurrent misses wait for the loader
 
     # Cloud Storage
     AWS_ACCESS_KEY_ID: Optional[str] = None
     AWS_SECRET_ACCESS_KEY: Optional[str] = None
     AWS_REGION: str = "us-east-1"
     S3_BUCKET_NAME: str = "crosspilot-media"
+    S3_ENDPOINT_URL: Optional[str] = None  # S3-compatible endpoint (MinIO, moto) instead of AWS
+    STORAGE_MAX_WORKERS: int = 16  # Threads running blocking S3 calls
+    S3_MAX_POOL_CONNECTIONS: int = 32
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # Read size for streamed uploads
+    S3_MULTIPART_PART_SIZE: int = 8 * 1024 * 1024
+    S3_MULTIPART_CONCURRENCY: int = 4  # Parts uploaded in parallel per file
+
+    # Resumable uploads
+    UPLOAD_MAX_FILE_SIZE: int = 20 * 1024 * 1024 * 1024
+    UPLOAD_SESSION_CHUNK_SIZE: int = 8 * 1024 * 1024
+    UPLOAD_SESSION_MAX_CHUNK_SIZE: int = 64 * 1024 * 1024
+    UPLOAD_SESSION_TTL_SECONDS: int = 24 * 3600  # Idle sessions are garbage-collected after this
 
     # CORS
     CORS_ORIGINS: List[str] = ["http://localhost:3000", "http://localhost:5173"]
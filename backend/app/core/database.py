@@ -1,11 +1,22 @@
 """
 Database connection and session management
+
+Transactions follow a unit-of-work model: services only flush, and the
+scope that opened the session (a request via get_db, or a worker job via
+unit_of_work) commits once at the end.
 """
+import logging
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Awaitable, Callable, Iterator, List, Optional
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
 
 from .config import settings
 
+logger = logging.getLogger(__name__)
+
 
 class Base(DeclarativeBase):
     """Base class for SQLAlchemy models"""
@@ -21,6 +32,9 @@ engine = create_async_engine(
     max_overflow=20
 )
 
+# Same pool, but transactions start READ ONLY (no extra round trip with asyncpg)
+read_only_engine = engine.execution_options(postgresql_readonly=True)
+
 # Create async session factory
 async_session_maker = async_sessionmaker(
     engine,
@@ -28,21 +42,134 @@ async_session_maker = async_sessionmaker(
     expire_on_commit=False
 )
 
+read_only_session_maker = async_sessionmaker(
+    read_only_engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+    autoflush=False
+)
+
+
+def after_commit(session: AsyncSession, callback: Callable[[], Awaitable[None]]) -> None:
+    """
+    Run callback once the session's unit of work has committed.
+
+    Use for side effects that must not happen if the transaction rolls
+    back, or that other processes must only see after the data is visible
+    (queueing a job for a new row, deleting a storage object).
+    """
+    session.info.setdefault("after_commit", []).append(callback)
+
+
+def on_rollback(session: AsyncSession, callback: Callable[[], Awaitable[None]]) -> None:
+    """
+    Run callback if the session's unit of work rolls back, just before it does.
+
+    Use to undo side effects made ahead of the commit (moving a storage
+    object, holding a Redis lock). Callbacks run newest first, while the
+    transaction's row locks are still held, so no other transaction can
+    act on the same rows in between.
+    """
+    session.info.setdefault("on_rollback", []).append(callback)
+
+
+async def _run_on_rollback(session: AsyncSession) -> None:
+    callbacks: List[Callable[[], Awaitable[None]]] = session.info.pop("on_rollback", [])
+    for callback in reversed(callbacks):
+        try:
+            await callback()
+        except Exception:
+            logger.exception("on_rollback callback failed")
+
+
+async def _run_after_commit(session: AsyncSession) -> None:
+    callbacks: List[Callable[[], Awaitable[None]]] = session.info.pop("after_commit", [])
+    for callback in callbacks:
+        try:
+            await callback()
+        except Exception:
+            logger.exception("after_commit callback failed")
+
 
-async def get_db() -> AsyncSession:
-    """Dependency to get database session"""
+@asynccontextmanager
+async def unit_of_work() -> AsyncIterator[AsyncSession]:
+    """Session that commits once on success and rolls back on error"""
     async with async_session_maker() as session:
         try:
             yield session
             await session.commit()
-        except Exception:
+        except BaseException:
+            await _run_on_rollback(session)
             await session.rollback()
+            session.info.pop("after_commit", None)
             raise
-        finally:
-            await session.close()
+        session.info.pop("on_rollback", None)
+        await _run_after_commit(session)
+
+
+async def get_db() -> AsyncIterator[AsyncSession]:
+    """Dependency to get database session; the request owns the single commit"""
+    async with unit_of_work() as session:
+        yield session
+
+
+async def get_read_db() -> AsyncIterator[AsyncSession]:
+    """Dependency for read-only endpoints; never commits"""
+    async with read_only_session_maker() as session:
+        yield session
 
 
 async def init_db():
     """Initialize database tables"""
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+
+
+class QueryCounter:
+    """Counts database round trips made while it is active"""
+
+    def __init__(self):
+        self.statements: List[str] = []
+        self.commits = 0
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    @property
+    def round_trips(self) -> int:
+        return self.count + self.commits
+
+
+_query_counter: ContextVar[Optional[QueryCounter]] = ContextVar("query_counter", default=None)
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryCounter]:
+    """
+    Count statements and commits issued by the current task, e.g.
+
+        with count_queries() as counter:
+            await content_service.create_content(db, user_id, data)
+        assert counter.count == 1
+    """
+    counter = QueryCounter()
+    token = _query_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _query_counter.reset(token)
+
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    counter = _query_counter.get()
+    if counter is not None:
+        counter.statements.append(statement)
+
+
+@event.listens_for(engine.sync_engine, "commit")
+def _count_commit(conn):
+    counter = _query_counter.get()
+    if counter is not None:
+        counter.commits += 1
@@ -0,0 +1,82 @@
+"""
+Distributed locks with a lease, backed by Redis
+"""
+import asyncio
+import uuid
+from typing import Optional
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+
+from .redis import get_redis
+
+# Only the holder's token may extend or release the lock
+_EXTEND_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("pexpire", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class RedisLease:
+    """
+    A lock that expires unless its holder keeps renewing it.
+
+    If the holder crashes, the lease runs out and another node can take
+    over, so nothing waits on a dead process for longer than the lease.
+    """
+
+    def __init__(self, redis: aioredis.Redis, key: str, token: str, lease_seconds: float):
+        self.redis = redis
+        self.key = key
+        self.token = token
+        self.lease_seconds = lease_seconds
+
+    @classmethod
+    async def acquire(
+        cls,
+        key: str,
+        lease_seconds: float,
+        redis: Optional[aioredis.Redis] = None
+    ) -> Optional["RedisLease"]:
+        """Take the lock, or return None if someone else holds it"""
+        redis = redis or get_redis()
+        token = uuid.uuid4().hex
+        if not await redis.set(key, token, nx=True, px=int(lease_seconds * 1000)):
+            return None
+        return cls(redis, key, token, lease_seconds)
+
+    @staticmethod
+    async def is_held(key: str, redis: Optional[aioredis.Redis] = None) -> bool:
+        """Whether anyone currently holds the lock"""
+        return bool(await (redis or get_redis()).exists(key))
+
+    async def extend(self) -> bool:
+        """Renew the lease; False if it was lost in the meantime"""
+        renewed = await self.redis.eval(
+            _EXTEND_SCRIPT, 1, self.key, self.token, int(self.lease_seconds * 1000)
+        )
+        return bool(renewed)
+
+    async def keep_alive(self) -> None:
+        """Renew the lease until cancelled; run it as a task alongside the guarded work"""
+        interval = max(0.1, self.lease_seconds / 3)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if not await self.extend():
+                    return
+            except RedisError:
+                # Transient; the next renewal may still land within the lease
+                continue
+
+    async def release(self) -> None:
+        """Release the lock if this lease still holds it"""
+        await self.redis.eval(_RELEASE_SCRIPT, 1, self.key, self.token)
@@ -0,0 +1,84 @@
+"""
+Lightweight in-process latency and throughput metrics
+"""
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator
+
+
+class OperationStats:
+    """Counters for a single operation with a window of recent latencies"""
+
+    def __init__(self, window: int = 1000):
+        self.count = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.bytes = 0
+        self.recent: Deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float, nbytes: int = 0, error: bool = False) -> None:
+        self.count += 1
+        self.errors += int(error)
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.bytes += nbytes
+        self.recent.append(seconds)
+
+    def percentile(self, pct: float) -> float:
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg_ms": round(1000 * self.total_seconds / self.count, 2) if self.count else 0.0,
+            "p50_ms": round(1000 * self.percentile(50), 2),
+            "p95_ms": round(1000 * self.percentile(95), 2),
+            "max_ms": round(1000 * self.max_seconds, 2),
+            "bytes": self.bytes,
+            "throughput_mb_s": (
+                round(self.bytes / self.total_seconds / (1024 * 1024), 2)
+                if self.total_seconds and self.bytes else 0.0
+            )
+        }
+
+
+class Sample:
+    """Mutable handle for a measurement in progress"""
+
+    def __init__(self, nbytes: int = 0):
+        self.nbytes = nbytes
+
+
+class MetricsRegistry:
+    """Per-operation stats keyed by name"""
+
+    def __init__(self, window: int = 1000):
+        self._ops: Dict[str, OperationStats] = defaultdict(lambda: OperationStats(window))
+
+    @contextmanager
+    def measure(self, operation: str, nbytes: int = 0) -> Iterator[Sample]:
+        """
+        Time the wrapped block and record it, marking raised exceptions as errors.
+
+        Set nbytes on the yielded sample when the size is only known at the end.
+        """
+        sample = Sample(nbytes)
+        start = time.perf_counter()
+        error = False
+        try:
+            yield sample
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self._ops[operation].record(time.perf_counter() - start, sample.nbytes, error)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {name: stats.snapshot() for name, stats in sorted(self._ops.items())}
@@ -0,0 +1,25 @@
+"""
+Shared Redis connection management
+"""
+from typing import Optional
+from redis import asyncio as aioredis
+
+from .config import settings
+
+_redis: Optional[aioredis.Redis] = None
+
+
+def get_redis() -> aioredis.Redis:
+    """Get the shared async Redis client, creating it on first use"""
+    global _redis
+    if _redis is None:
+        _redis = aioredis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _redis
+
+
+async def close_redis():
+    """Close the shared Redis client"""
+    global _redis
+    if _redis is not None:
+        await _redis.close()
+        _redis = None
@@ -7,6 +7,10 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from .core.config import settings
 from .core.database import init_db
+from .core.redis import close_redis
+from .services.hashtag_index import hashtag_index
+from .services.storage_service import storage_service
+from .services.transcription_service import transcription_service
 from .api.v1.router import api_router
 
 
@@ -15,9 +19,15 @@ async def lifespan(app: FastAPI):
     """Application lifespan events"""
     # Startup
     await init_db()
+    if hashtag_index:
+        hashtag_index.start()
     yield
     # Shutdown
-    pass
+    if hashtag_index:
+        await hashtag_index.stop()
+    await close_redis()
+    storage_service.shutdown()
+    transcription_service.shutdown()
 
 
 def create_app() -> FastAPI:
@@ -40,6 +50,7 @@ def create_app() -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Next-Cursor"],
     )
 
     # Include API router
@@ -0,0 +1,43 @@
+"""
+Stored blob and derived file models for content-addressed file storage
+"""
+from datetime import datetime
+from sqlalchemy import String, DateTime, Integer, BigInteger
+from sqlalchemy.orm import Mapped, mapped_column
+
+from ..core.database import Base
+
+
+class StoredBlob(Base):
+    """A stored file identified by its SHA-256, shared by every content that uploaded it"""
+    __tablename__ = "stored_blobs"
+
+    sha256: Mapped[str] = mapped_column(String(64), primary_key=True)
+    file_key: Mapped[str] = mapped_column(String(1000), nullable=False)
+    size: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    ref_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+    # Timestamps
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self) -> str:
+        return f"<StoredBlob {self.sha256[:12]} refs={self.ref_count}>"
+
+
+class DerivedImage(Base):
+    """An image rendered from a source (identified by hash) to a variant spec, e.g. a platform crop"""
+    __tablename__ = "derived_images"
+
+    source_hash: Mapped[str] = mapped_column(String(64), primary_key=True)
+    spec: Mapped[str] = mapped_column(String(255), primary_key=True)
+    url: Mapped[str] = mapped_column(String(1000), nullable=False)
+    width: Mapped[int] = mapped_column(Integer, nullable=False)
+    height: Mapped[int] = mapped_column(Integer, nullable=False)
+    size: Mapped[int] = mapped_column(BigInteger, nullable=False)
+
+    # Timestamps
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self) -> str:
+        return f"<DerivedImage {self.source_hash[:12]} {self.spec}>"
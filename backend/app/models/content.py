@@ -3,7 +3,7 @@ Content model for storing original content and adaptations
 """
 from datetime import datetime
 from typing import Optional, List
-from sqlalchemy import String, Text, DateTime, Integer, ForeignKey, JSON, Enum as SQLEnum
+from sqlalchemy import String, Text, DateTime, Integer, BigInteger, ForeignKey, JSON, Index, Enum as SQLEnum
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 import enum
 
@@ -31,6 +31,10 @@ class ContentStatus(enum.Enum):
 class Content(Base):
     """Original content uploaded by user"""
     __tablename__ = "contents"
+    __table_args__ = (
+        # Serves per-user listing ordered by (created_at, id), including keyset pages
+        Index("ix_contents_user_created_id", "user_id", "created_at", "id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False, index=True)
@@ -42,7 +46,8 @@ class Content(Base):
 
     # File info
     original_file_url: Mapped[str] = mapped_column(String(1000), nullable=False)
-    file_size: Mapped[int] = mapped_column(Integer, nullable=True)
+    file_size: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)  # Bytes; recordings exceed 2 GB
+    file_hash: Mapped[Optional[str]] = mapped_column(String(64), nullable=True, index=True)  # SHA-256 hex digest
     duration_seconds: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)  # For video/audio
 
     # Analysis results
@@ -102,6 +107,13 @@ class AdaptationStatus(enum.Enum):
 class Adaptation(Base):
     """Adapted content for specific platform"""
     __tablename__ = "adaptations"
+    __table_args__ = (
+        Index("ix_adaptations_user_created_id", "user_id", "created_at", "id"),
+        # Adaptation listing is scoped to one content
+        Index("ix_adaptations_content_user_created_id", "content_id", "user_id", "created_at", "id"),
+        # A retried bulk create with the same Idempotency-Key can't insert twice
+        Index("uq_adaptations_idempotency", "user_id", "idempotency_key", "platform", unique=True),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     content_id: Mapped[int] = mapped_column(ForeignKey("contents.id"), nullable=False, index=True)
@@ -118,6 +130,11 @@ class Adaptation(Base):
     # Files
     adapted_file_url: Mapped[Optional[str]] = mapped_column(String(1000), nullable=True)
     thumbnail_url: Mapped[Optional[str]] = mapped_column(String(1000), nullable=True)
+    # Ordered images of a multi-image post: Weibo nine-grid tiles, Xiaohongshu carousel slides
+    media_urls: Mapped[Optional[List[str]]] = mapped_column(JSON, nullable=True)
+
+    # Client-supplied key of the bulk create request that made this row
+    idempotency_key: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
 
     # Status
     status: Mapped[AdaptationStatus] = mapped_column(
@@ -0,0 +1,38 @@
+"""
+Scene model for shots and keyframes detected in stored video files
+"""
+from datetime import datetime
+from typing import List
+from sqlalchemy import String, DateTime, Float, JSON
+from sqlalchemy.orm import Mapped, mapped_column
+
+from ..core.database import Base
+
+
+class VideoScenes(Base):
+    """Scene cuts and keyframes of a stored video, shared by every content with the same SHA-256"""
+    __tablename__ = "video_scenes"
+
+    file_hash: Mapped[str] = mapped_column(String(64), primary_key=True)  # StorageService.source_id: the SHA-256, or a hash of the URL for unhashed files
+    duration_seconds: Mapped[float] = mapped_column(Float, nullable=False)
+    scenes: Mapped[List[dict]] = mapped_column(JSON, nullable=False)
+    """
+    Scenes structure, in order:
+    [{"start": 0.0, "end": 6.5, "keyframe": 3.0}]  # seconds; keyframe is the scene's most representative frame
+    """
+    visual: Mapped[dict] = mapped_column(JSON, nullable=False)
+    """
+    Visual structure, over the whole video:
+    {
+        "brightness": 0.45,  # mean luma, 0-1
+        "saturation": 0.30,  # mean HSV saturation, 0-1
+        "motion": 0.03,  # mean luma change between sampled frames within scenes, 0-1
+        "colors": ["蓝", "白"]  # dominant hues of the keyframes
+    }
+    """
+
+    # Timestamps
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self) -> str:
+        return f"<VideoScenes {self.file_hash[:12]} scenes={len(self.scenes)}>"
@@ -0,0 +1,31 @@
+"""
+Transcript model for speech in stored video and audio files
+"""
+from datetime import datetime
+from typing import Optional, List
+from sqlalchemy import String, Text, DateTime, Float, JSON
+from sqlalchemy.orm import Mapped, mapped_column
+
+from ..core.database import Base
+
+
+class Transcript(Base):
+    """Speech transcript of a stored file, shared by every content with the same SHA-256"""
+    __tablename__ = "transcripts"
+
+    file_hash: Mapped[str] = mapped_column(String(64), primary_key=True)  # StorageService.source_id: the SHA-256, or a hash of the URL for unhashed files
+    language: Mapped[Optional[str]] = mapped_column(String(16), nullable=True)
+    text: Mapped[str] = mapped_column(Text, nullable=False)
+    segments: Mapped[List[dict]] = mapped_column(JSON, nullable=False)
+    """
+    Segments structure, in order:
+    [{"start": 0.0, "end": 4.2, "text": "..."}]  # seconds from the start of the file
+    """
+    duration_seconds: Mapped[float] = mapped_column(Float, nullable=False)
+    model: Mapped[str] = mapped_column(String(50), nullable=False)
+
+    # Timestamps
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self) -> str:
+        return f"<Transcript {self.file_hash[:12]} {self.language}>"
@@ -18,6 +18,8 @@ class ContentBase(BaseModel):
 class ContentCreate(ContentBase):
     """Schema for content upload"""
     original_file_url: str
+    file_size: Optional[int] = None
+    file_hash: Optional[str] = None
 
 
 class ContentAnalysis(BaseModel):
@@ -28,6 +30,9 @@ class ContentAnalysis(BaseModel):
     visual_elements: List[str]
     style_fingerprint: dict
     transcript: Optional[str] = None
+    summary: Optional[str] = None  # Set when long content was analyzed from chunk summaries
+    hashtags: List[str] = []  # Candidate hashtags from the local analyzer
+    keyframes: List[float] = []  # Seconds into a video of its most representative frames, in order
 
 
 class ContentResponse(ContentBase):
@@ -180,6 +185,7 @@ class AdaptationResponse(AdaptationBase):
     user_id: int
     adapted_file_url: Optional[str]
     thumbnail_url: Optional[str]
+    media_urls: Optional[List[str]] = None
     status: AdaptationStatus
     published_at: Optional[datetime]
     platform_post_url: Optional[str]
@@ -200,3 +206,19 @@ class AdaptationPreview(BaseModel):
     suggested_hashtags: List[str]
     thumbnail_preview_url: Optional[str]
     estimated_duration_seconds: Optional[int]
+    error: Optional[str] = None  # Set when generation failed for this platform
+
+
+class HashtagSuggestion(BaseModel):
+    """A hashtag used before on the platform for similar content"""
+    tag: str
+    score: float
+    uses: int
+
+
+class PlatformImage(BaseModel):
+    """A content's image or video frame cropped to a platform's aspect ratio"""
+    platform: Platform
+    aspect_ratio: str
+    image_url: str
+    thumbnail_url: str
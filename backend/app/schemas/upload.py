@@ -0,0 +1,40 @@
+"""
+Resumable upload schemas for API request/response
+"""
+from datetime import datetime
+from typing import Optional, List
+from pydantic import BaseModel, Field
+
+from ..models.content import ContentType
+
+
+class UploadSessionCreate(BaseModel):
+    """Schema for starting a resumable upload"""
+    filename: str = Field(..., min_length=1, max_length=255)
+    mime_type: str = "application/octet-stream"
+    total_size: int = Field(..., gt=0)
+    chunk_size: Optional[int] = Field(None, gt=0)
+    title: str = Field(..., min_length=1, max_length=500)
+    description: Optional[str] = None
+    content_type: ContentType
+
+
+class UploadSessionResponse(BaseModel):
+    """Schema for resumable upload state"""
+    upload_id: str
+    filename: str
+    total_size: int
+    chunk_size: int
+    total_chunks: int
+    received_chunks: int
+    missing_chunks: List[int]
+    missing_offsets: List[int]  # Byte offset of each missing chunk
+    expires_at: datetime
+
+
+class UploadChunkResponse(BaseModel):
+    """Schema for a stored chunk"""
+    index: int
+    size: int
+    received_chunks: int
+    total_chunks: int
@@ -0,0 +1,238 @@
+"""
+Rate limiting and adaptive concurrency for AI provider calls
+"""
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+
+from ..core.config import settings
+
+
+class TokenBucket:
+    """
+    Allows `per_minute` units per minute, with bursts up to `capacity`.
+
+    Callers are served in arrival order: the lock is held while a caller
+    waits for its share, so a large request can't be starved by a stream
+    of small ones.
+    """
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60
+        self.capacity = capacity if capacity is not None else per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1) -> None:
+        """Take `amount` units, waiting until the bucket can cover them"""
+        if not self.enabled:
+            return
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            self._refill()
+            self.tokens -= amount
+            if self.tokens < 0:
+                await asyncio.sleep(-self.tokens / self.rate)
+
+    def adjust(self, amount: float) -> None:
+        """Charge (positive) or refund (negative) units after the fact, e.g. actual vs estimated tokens"""
+        if not self.enabled:
+            return
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+    def available(self) -> float:
+        if not self.enabled:
+            return float("inf")
+        self._refill()
+        return self.tokens
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit adjusted AIMD-style.
+
+    Each call under the latency target raises the limit by 1/limit (about
+    +1 per round of calls); a throttle halves it and a slow call trims it
+    by 10%. Waiters are admitted first come, first served.
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int, latency_target: float):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.latency_target = latency_target
+        self.in_flight = 0
+        self._waiters: Deque["asyncio.Future[None]"] = deque()
+
+    async def acquire(self) -> None:
+        if not self._waiters and self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Admitted just as we were cancelled; hand the slot on
+                self.release()
+            else:
+                self._waiters.remove(future)
+            raise
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._admit()
+
+    def _admit(self) -> None:
+        while self._waiters and self.in_flight < int(self.limit):
+            future = self._waiters.popleft()
+            if future.done():
+                continue
+            self.in_flight += 1
+            future.set_result(None)
+
+    def on_success(self, latency: float) -> None:
+        if latency > self.latency_target:
+            self.limit = max(self.minimum, self.limit * 0.9)
+        else:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        self._admit()
+
+    def on_throttle(self) -> None:
+        self.limit = max(self.minimum, self.limit / 2)
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+
+class ProviderGovernor:
+    """Requests-per-minute and tokens-per-minute buckets plus adaptive concurrency for one provider"""
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_minute: int,
+        tokens_per_minute: int,
+        initial_concurrency: int,
+        min_concurrency: int,
+        max_concurrency: int,
+        latency_target: float
+    ):
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.concurrency = AdaptiveLimiter(
+            initial_concurrency, min_concurrency, max_concurrency, latency_target
+        )
+        self.paused_until = 0.0
+        self.calls = 0
+        self.throttles = 0
+
+    @property
+    def paused_for(self) -> float:
+        return max(0.0, self.paused_until - time.monotonic())
+
+    async def _wait_if_paused(self) -> None:
+        while self.paused_for > 0:
+            await asyncio.sleep(self.paused_for)
+
+    @asynccontextmanager
+    async def slot(self, estimated_tokens: int) -> AsyncIterator[None]:
+        """Wait for a concurrency slot and rate budget, then hold the slot for one call"""
+        await self._wait_if_paused()
+        await self.concurrency.acquire()
+        try:
+            await self.requests.acquire(1)
+            await self.tokens.acquire(estimated_tokens)
+            # A throttle may have arrived while this call was queued
+            await self._wait_if_paused()
+            self.calls += 1
+            yield
+        finally:
+            self.concurrency.release()
+
+    def on_success(self, latency: float, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        self.concurrency.on_success(latency)
+        if actual_tokens is not None:
+            self.tokens.adjust(actual_tokens - estimated_tokens)
+
+    def on_throttled(self, retry_after: Optional[float]) -> None:
+        """Back off after a 429: halve concurrency and pause until Retry-After"""
+        self.throttles += 1
+        self.concurrency.on_throttle()
+        delay = retry_after if retry_after is not None else settings.LLM_RETRY_AFTER_DEFAULT_SECONDS
+        self.paused_until = max(self.paused_until, time.monotonic() + delay)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "concurrency_limit": round(self.concurrency.limit, 2),
+            "in_flight": self.concurrency.in_flight,
+            "queued": self.concurrency.queued,
+            "requests_available": round(self.requests.available(), 1),
+            "tokens_available": round(self.tokens.available(), 1),
+            "paused_for_seconds": round(self.paused_for, 2),
+            "calls": self.calls,
+            "throttles": self.throttles
+        }
+
+
+def is_rate_limited(error: BaseException) -> bool:
+    return getattr(error, "status_code", None) == 429
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Read Retry-After (seconds or HTTP date) or retry-after-ms from an API error's response"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return max(0.0, float(retry_after_ms) / 1000)
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def create_provider_governor(name: str) -> ProviderGovernor:
+    """Build a provider's governor from LLM_RATE_LIMITS and the concurrency settings"""
+    limits = settings.LLM_RATE_LIMITS.get(name, {})
+    return ProviderGovernor(
+        name,
+        requests_per_minute=limits.get("rpm", 0),
+        tokens_per_minute=limits.get("tpm", 0),
+        initial_concurrency=settings.LLM_CONCURRENCY_INITIAL,
+        min_concurrency=settings.LLM_CONCURRENCY_MIN,
+        max_concurrency=settings.LLM_CONCURRENCY_MAX,
+        latency_target=settings.LLM_LATENCY_TARGET_SECONDS
+    )
@@ -1,36 +1,168 @@
 """
 AI Service for content analysis and adaptation
 """
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Awaitable, Callable, Tuple
+import asyncio
 import json
-from openai import AsyncOpenAI
-import anthropic
 
 from ..core.config import settings
 from ..models.content import Platform, ContentType
 from ..schemas.content import PLATFORM_CONFIGS, ContentAnalysis, AdaptationPreview
+from ..utils.text import chunk_text, estimate_tokens, truncate_to_tokens
+from .fast_analysis import create_fast_analyzer
+from .llm_cache import create_llm_cache
+from .llm_router import create_llm_router
+
+
+ANALYSIS_FAST = "fast"
+ANALYSIS_HYBRID = "hybrid"
+ANALYSIS_FULL = "full"
+
+# ContentAnalysis fields the LLM can be asked for, with their prompt descriptions
+ANALYSIS_FIELDS = {
+    "key_points": "3-5个核心观点/信息点",
+    "emotional_tone": "情感基调（专业/幽默/亲切/严肃/轻松）",
+    "main_topics": "主要话题标签",
+    "visual_elements": "视觉元素描述（如有）",
+    "style_fingerprint": "风格指纹，包含 language_style（语言风格）、visual_style（视觉风格，如适用）、pace（节奏感：快/中/慢）",
+}
 
 
 class AIService:
     """Service for AI-powered content processing"""
 
     def __init__(self):
-        self.openai_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY) if settings.OPENAI_API_KEY else None
-        self.anthropic_client = anthropic.Anthropic(api_key=settings.ANTHROPIC_API_KEY) if settings.ANTHROPIC_API_KEY else None
+        # None when no provider has an API key; methods then return mock results
+        self.router = create_llm_router()
+        self.cache = create_llm_cache()
+        self.fast_analyzer = create_fast_analyzer(settings.FAST_ANALYZER) if settings.FAST_ANALYZER else None
+
+    async def _chat(
+        self,
+        method: str,
+        system_prompt: str,
+        prompt: str,
+        json_mode: bool = True,
+        platform: Optional[str] = None,
+        preserve_style: Optional[bool] = None,
+        use_cache: bool = True,
+        on_delta: Optional[Callable[[str], Awaitable[None]]] = None
+    ) -> str:
+        """
+        Run a chat completion, serving identical requests from the response cache.
+
+        use_cache=False skips the cache read but still stores the fresh output.
+        With on_delta the reply is streamed and each piece passed to it as it
+        arrives; a cache hit returns at once without calling it.
+        """
+        cache_key = None
+        if self.cache:
+            cache_key = self.cache.make_key(
+                method, self.router.signature, f"{system_prompt}\n{prompt}", platform, preserve_style
+            )
+            if use_cache:
+                cached = await self.cache.get(method, cache_key)
+                if cached is not None:
+                    return cached
+
+        if on_delta is None:
+            content = await self.router.complete(system_prompt, prompt, json_mode=json_mode)
+        else:
+            chunks = []
+            async for chunk in self.router.stream(system_prompt, prompt, json_mode=json_mode):
+                chunks.append(chunk)
+                await on_delta(chunk)
+            content = "".join(chunks)
+
+        # Don't cache malformed JSON, or a retry would keep failing
+        if cache_key and content is not None and (not json_mode or self._is_json(content)):
+            await self.cache.set(method, cache_key, content)
+        return content
+
+    @staticmethod
+    def _is_json(text: str) -> bool:
+        """Check whether text parses as JSON"""
+        try:
+            json.loads(text)
+            return True
+        except ValueError:
+            return False
 
     async def analyze_content(
         self,
         content_text: str,
         content_type: ContentType,
-        metadata: Optional[Dict[str, Any]] = None
+        metadata: Optional[Dict[str, Any]] = None,
+        use_cache: bool = True,
+        mode: str = ANALYSIS_FULL
     ) -> ContentAnalysis:
-        """Analyze content to extract key information and style fingerprint"""
+        """
+        Analyze content to extract key information and style fingerprint.
+
+        mode picks how much runs on the LLM:
+        - "fast": only the local analyzer; fields it can't fill stay empty
+        - "hybrid": the local analyzer fills what it can, the LLM the rest
+        - "full": the LLM fills everything
+
+        Candidate hashtags always come from the local analyzer when one is
+        configured. metadata["visual_elements"], measured from a video's
+        keyframes, grounds visual_elements instead of the model guessing
+        them from text; without an LLM it fills them directly. In full and
+        hybrid mode, text over AI_ANALYSIS_INPUT_TOKENS is analyzed
+        map-reduce style instead of being truncated: chunks are summarized
+        concurrently, then the summaries are analyzed together.
+        """
+        local = await self._fast_analyze(content_text) if self.fast_analyzer else {}
+        # Empty fields (e.g. too little text) are left to the LLM
+        local = {field: value for field, value in local.items() if value}
+        visuals = (metadata or {}).get("visual_elements") or []
+
+        if not self.router:
+            # Fallback mock response for development, with whatever the local tier found
+            return ContentAnalysis(**{
+                "key_points": ["核心观点1", "核心观点2", "核心观点3"],
+                "emotional_tone": "专业",
+                "main_topics": ["科技", "教程"],
+                "visual_elements": visuals or ["人物出镜", "图表展示"],
+                "style_fingerprint": {
+                    "language_style": "专业",
+                    "visual_style": "简约",
+                    "pace": "中等"
+                },
+                **local
+            })
+
+        if mode == ANALYSIS_FAST:
+            # Even when the local analyzer found nothing: fast never calls the LLM
+            return ContentAnalysis(**{
+                "key_points": [],
+                "emotional_tone": "",
+                "main_topics": [],
+                "visual_elements": visuals,
+                "style_fingerprint": {},
+                **local
+            })
+
+        if mode == ANALYSIS_HYBRID and local:
+            if visuals:
+                local["visual_elements"] = visuals
+            remaining = [field for field in ANALYSIS_FIELDS if field not in local]
+            source, summary = await self._analysis_source(content_text, content_type, use_cache)
+            result = await self._analyze_fields(source, content_type, remaining, local, use_cache)
+            if summary is not None:
+                result["summary"] = summary
+            return ContentAnalysis(**{**result, **local})
+
+        source, summary = await self._analysis_source(content_text, content_type, use_cache)
+        if visuals:
+            # Only for video, so prompts (and cache keys) of text content are unchanged
+            source = f"{source}\n\n        画面信息（来自关键帧分析）：{'；'.join(visuals)}"
 
         prompt = f"""
         分析以下{content_type.value}内容，提取关键信息：
 
         内容：
-        {content_text[:5000]}  # Limit to 5000 chars
+        {source}
 
         请以JSON格式返回以下信息：
         1. key_points: 3-5个核心观点/信息点
@@ -43,48 +175,166 @@ class AIService:
            - pace: 节奏感（快/中/慢）
         """
 
-        if self.openai_client:
-            response = await self.openai_client.chat.completions.create(
-                model="gpt-4-turbo-preview",
-                messages=[
-                    {"role": "system", "content": "你是一个专业的内容分析师，擅长分析自媒体内容的风格和特点。"},
-                    {"role": "user", "content": prompt}
-                ],
-                response_format={"type": "json_object"}
-            )
-            result = json.loads(response.choices[0].message.content)
-        else:
-            # Fallback mock response for development
-            result = {
-                "key_points": ["核心观点1", "核心观点2", "核心观点3"],
-                "emotional_tone": "专业",
-                "main_topics": ["科技", "教程"],
-                "visual_elements": ["人物出镜", "图表展示"],
-                "style_fingerprint": {
-                    "language_style": "专业",
-                    "visual_style": "简约",
-                    "pace": "中等"
-                }
-            }
-
+        response = await self._chat(
+            "analyze_content",
+            "你是一个专业的内容分析师，擅长分析自媒体内容的风格和特点。",
+            prompt,
+            use_cache=use_cache
+        )
+        result = json.loads(response)
+        if summary is not None:
+            result["summary"] = summary
+        if local.get("hashtags"):
+            result["hashtags"] = local["hashtags"]
         return ContentAnalysis(**result)
 
+    async def _fast_analyze(self, text: str) -> Dict[str, List[str]]:
+        """Run the local analyzer, off the event loop for long text"""
+        if len(text) <= settings.FAST_ANALYSIS_INLINE_CHARS:
+            return self.fast_analyzer.analyze(text)
+        return await asyncio.get_running_loop().run_in_executor(None, self.fast_analyzer.analyze, text)
+
+    async def _analysis_source(
+        self,
+        content_text: str,
+        content_type: ContentType,
+        use_cache: bool
+    ) -> Tuple[str, Optional[str]]:
+        """The text to analyze and, for text over AI_ANALYSIS_INPUT_TOKENS, the summary it was reduced to"""
+        if estimate_tokens(content_text) <= settings.AI_ANALYSIS_INPUT_TOKENS:
+            return content_text, None
+        summary = await self._reduce_to_summary(content_text, content_type, use_cache)
+        return f"以下是长内容按顺序分段的摘要：\n{summary}", summary
+
+    async def _analyze_fields(
+        self,
+        content_text: str,
+        content_type: ContentType,
+        fields: List[str],
+        known: Dict[str, List[str]],
+        use_cache: bool
+    ) -> Dict[str, Any]:
+        """Ask the LLM for only the given fields, with the local results as context"""
+        if not fields:
+            return {}
+
+        requested = "\n        ".join(
+            f"{index}. {field}: {ANALYSIS_FIELDS[field]}" for index, field in enumerate(fields, 1)
+        )
+        context = ""
+        if known.get("main_topics"):
+            context += f"\n        已知主要话题：{', '.join(known['main_topics'])}"
+        if known.get("key_points"):
+            context += f"\n        已知核心观点：{'；'.join(known['key_points'])}"
+        if known.get("visual_elements"):
+            context += f"\n        画面信息（来自关键帧分析）：{'；'.join(known['visual_elements'])}"
+
+        prompt = f"""
+        分析以下{content_type.value}内容：
+
+        内容：
+        {truncate_to_tokens(content_text, settings.AI_ANALYSIS_INPUT_TOKENS)}
+        {context}
+
+        请以JSON格式只返回以下信息：
+        {requested}
+        """
+        response = await self._chat(
+            "analyze_fields",
+            "你是一个专业的内容分析师，擅长分析自媒体内容的风格和特点。",
+            prompt,
+            use_cache=use_cache
+        )
+        result = json.loads(response)
+        return {field: result[field] for field in fields if field in result}
+
+    async def _reduce_to_summary(self, text: str, content_type: ContentType, use_cache: bool) -> str:
+        """
+        Summarize each chunk concurrently (map), repeating over the joined
+        summaries until they fit the analysis budget (reduce).
+
+        Chunk summaries go through the LLM cache keyed by chunk text, and
+        chunk boundaries only move near an edit, so re-analyzing edited
+        content only pays for the chunks that changed.
+        """
+        semaphore = asyncio.Semaphore(max(1, settings.AI_MAX_CONCURRENCY))
+
+        async def summarize(chunk: str) -> str:
+            async with semaphore:
+                return await self._summarize_chunk(chunk, content_type, use_cache)
+
+        for _ in range(settings.AI_MAX_REDUCE_ROUNDS):
+            chunks = chunk_text(text, settings.AI_CHUNK_TOKENS)
+            summaries = await asyncio.gather(*(summarize(chunk) for chunk in chunks))
+            text = "\n".join(summaries)
+            if estimate_tokens(text) <= settings.AI_ANALYSIS_INPUT_TOKENS:
+                return text
+
+        # Pathologically long input; the summaries' opening still beats the text's
+        return truncate_to_tokens(text, settings.AI_ANALYSIS_INPUT_TOKENS)
+
+    async def _summarize_chunk(self, chunk: str, content_type: ContentType, use_cache: bool) -> str:
+        """Summarize one chunk; the prompt holds no position so the cache key depends only on the text"""
+        prompt = f"""
+        以下是一段较长{content_type.value}内容中的一个片段，请概括其内容：
+
+        片段：
+        {chunk}
+
+        以JSON格式返回：
+        - summary: 片段摘要（保留关键事实、观点和语气，不超过{settings.AI_CHUNK_SUMMARY_TOKENS}字）
+        """
+        response = await self._chat(
+            "summarize_chunk",
+            "你是一个专业的内容编辑，擅长准确概括长内容。",
+            prompt,
+            use_cache=use_cache
+        )
+        try:
+            return str(json.loads(response).get("summary", "")).strip()
+        except (ValueError, AttributeError):
+            return truncate_to_tokens(chunk, settings.AI_CHUNK_SUMMARY_TOKENS)
+
+    def _source_excerpt(self, original_content: str, analysis: ContentAnalysis) -> str:
+        """The original text if it fits the adaptation budget, else its summary plus the opening"""
+        budget = settings.AI_ADAPTATION_SOURCE_TOKENS
+        if estimate_tokens(original_content) <= budget:
+            return original_content
+        if not analysis.summary:
+            return truncate_to_tokens(original_content, budget)
+
+        summary = truncate_to_tokens(analysis.summary, budget * 2 // 3)
+        opening = truncate_to_tokens(original_content, budget - estimate_tokens(summary))
+        return f"全文摘要：\n{summary}\n\n开头原文：\n{opening}"
+
     async def generate_adaptation(
         self,
         original_content: str,
         analysis: ContentAnalysis,
         target_platform: Platform,
-        preserve_style: bool = True
+        preserve_style: bool = True,
+        use_cache: bool = True,
+        hashtag_candidates: Optional[List[str]] = None,
+        on_delta: Optional[Callable[[str], Awaitable[None]]] = None
     ) -> AdaptationPreview:
-        """Generate content adaptation for target platform"""
+        """
+        Generate content adaptation for target platform; on_delta receives the raw reply as it streams.
+
+        hashtag_candidates are tags that worked on the platform before; the
+        model is asked to pick from them rather than invent new ones.
+        """
 
         platform_config = PLATFORM_CONFIGS[target_platform]
+        if hashtag_candidates:
+            hashtag_request = f"5-10个话题标签，优先从该平台的常用标签中选择：{' '.join(hashtag_candidates)}，不足时再补充"
+        else:
+            hashtag_request = "5-10个相关话题标签"
 
         prompt = f"""
         将以下内容适配到{platform_config.display_name}平台：
 
         原始内容：
-        {original_content[:3000]}
+        {self._source_excerpt(original_content, analysis)}
 
         内容分析：
         - 核心观点：{', '.join(analysis.key_points)}
@@ -99,7 +349,7 @@ class AIService:
         请生成：
         1. suggested_title: 适合该平台的标题（符合长度限制）
         2. suggested_caption: 适合该平台的文案/描述
-        3. suggested_hashtags: 5-10个相关话题标签
+        3. suggested_hashtags: {hashtag_request}
         4. content_outline: 内容大纲（用于视频剪辑/文章改写）
 
         要求：
@@ -108,28 +358,151 @@ class AIService:
         - 标题要有吸引力，符合平台用户偏好
         """
 
-        if self.openai_client:
-            response = await self.openai_client.chat.completions.create(
-                model="gpt-4-turbo-preview",
-                messages=[
-                    {"role": "system", "content": f"你是一个专业的{platform_config.display_name}内容运营专家。"},
-                    {"role": "user", "content": prompt}
-                ],
-                response_format={"type": "json_object"}
+        if self.router:
+            response = await self._chat(
+                "generate_adaptation",
+                f"你是一个专业的{platform_config.display_name}内容运营专家。",
+                prompt,
+                platform=target_platform.value,
+                preserve_style=preserve_style,
+                use_cache=use_cache,
+                on_delta=on_delta
             )
-            result = json.loads(response.choices[0].message.content)
+            result = json.loads(response)
         else:
             # Fallback mock response
-            result = {
-                "suggested_title": f"【必看】{analysis.key_points[0] if analysis.key_points else '精彩内容'}",
-                "suggested_caption": f"分享一个关于{', '.join(analysis.main_topics[:2]) if analysis.main_topics else '精彩话题'}的内容...",
-                "suggested_hashtags": [f"#{topic}" for topic in analysis.main_topics[:5]] if analysis.main_topics else ["#干货", "#分享"],
-                "content_outline": ["开头引入", "核心内容", "总结收尾"]
+            result = self._mock_adaptation_result(analysis, hashtag_candidates)
+
+        return self._build_adaptation_preview(target_platform, result)
+
+    async def generate_adaptations_batch(
+        self,
+        original_content: str,
+        analysis: ContentAnalysis,
+        target_platforms: List[Platform],
+        preserve_style: bool = True,
+        use_cache: bool = True,
+        hashtag_candidates: Optional[Dict[Platform, List[str]]] = None
+    ) -> Dict[Platform, AdaptationPreview]:
+        """
+        Generate adaptations for several platforms with a single LLM call.
+
+        The original content and analysis are sent once instead of once per
+        platform. Only platforms whose section of the response passes
+        validation are returned; callers should fall back to
+        generate_adaptation for the rest.
+        """
+
+        hashtag_candidates = hashtag_candidates or {}
+        platforms = list(dict.fromkeys(target_platforms))
+        platform_sections = []
+        for platform in platforms:
+            config = PLATFORM_CONFIGS[platform]
+            section = (
+                f"[{config.name}] {config.display_name}：标题≤{config.max_title_length}字，"
+                f"文案≤{config.max_caption_length}字，风格关键词：{', '.join(config.style_keywords)}"
+            )
+            if hashtag_candidates.get(platform):
+                section += f"，常用标签：{' '.join(hashtag_candidates[platform])}"
+            platform_sections.append(section)
+        platform_lines = "\n        ".join(platform_sections)
+
+        prompt = f"""
+        将以下内容分别适配到多个平台：
+
+        原始内容：
+        {self._source_excerpt(original_content, analysis)}
+
+        内容分析：
+        - 核心观点：{', '.join(analysis.key_points)}
+        - 情感基调：{analysis.emotional_tone}
+        - 主要话题：{', '.join(analysis.main_topics)}
+
+        目标平台及特性：
+        {platform_lines}
+
+        请为每个平台分别生成：
+        1. suggested_title: 适合该平台的标题（符合长度限制）
+        2. suggested_caption: 适合该平台的文案/描述
+        3. suggested_hashtags: 5-10个相关话题标签（有常用标签的平台优先从中选择）
+        4. content_outline: 内容大纲（用于视频剪辑/文章改写）
+
+        以JSON格式返回，结构为 {{"adaptations": {{"<平台标识>": {{...}}}}}}，
+        平台标识使用方括号中的英文名称，每个平台都必须返回。
+
+        要求：
+        - {'保持原有风格特点' if preserve_style else '完全适配平台风格'}
+        - 使用各平台的流行表达方式
+        - 标题要有吸引力，符合平台用户偏好
+        """
+
+        if self.router:
+            response = await self._chat(
+                "generate_adaptations_batch",
+                "你是一个专业的多平台内容运营专家。",
+                prompt,
+                platform=",".join(platform.value for platform in platforms),
+                preserve_style=preserve_style,
+                use_cache=use_cache
+            )
+            try:
+                result = json.loads(response)
+            except (TypeError, ValueError):
+                return {}
+            adaptations = result.get("adaptations") if isinstance(result, dict) else None
+            if not isinstance(adaptations, dict):
+                return {}
+        else:
+            # Fallback mock response
+            adaptations = {
+                PLATFORM_CONFIGS[platform].name: self._mock_adaptation_result(analysis, hashtag_candidates.get(platform))
+                for platform in platforms
             }
 
+        previews = {}
+        for platform in platforms:
+            platform_result = adaptations.get(PLATFORM_CONFIGS[platform].name)
+            if self._is_valid_adaptation_result(platform_result):
+                previews[platform] = self._build_adaptation_preview(platform, platform_result)
+        return previews
+
+    def _mock_adaptation_result(
+        self,
+        analysis: ContentAnalysis,
+        hashtag_candidates: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Mock adaptation result used when no AI provider is configured"""
+        if hashtag_candidates:
+            return {
+                **self._mock_adaptation_result(analysis),
+                "suggested_hashtags": hashtag_candidates[:8]
+            }
+        return {
+            "suggested_title": f"【必看】{analysis.key_points[0] if analysis.key_points else '精彩内容'}",
+            "suggested_caption": f"分享一个关于{', '.join(analysis.main_topics[:2]) if analysis.main_topics else '精彩话题'}的内容...",
+            "suggested_hashtags": [f"#{topic}" for topic in analysis.main_topics[:5]] if analysis.main_topics else ["#干货", "#分享"],
+            "content_outline": ["开头引入", "核心内容", "总结收尾"]
+        }
+
+    def _is_valid_adaptation_result(self, result: Any) -> bool:
+        """Check that a per-platform adaptation result has usable fields"""
+        if not isinstance(result, dict):
+            return False
+        title = result.get("suggested_title")
+        caption = result.get("suggested_caption")
+        hashtags = result.get("suggested_hashtags")
+        return (
+            isinstance(title, str) and bool(title.strip())
+            and isinstance(caption, str)
+            and isinstance(hashtags, list)
+            and all(isinstance(tag, str) for tag in hashtags)
+        )
+
+    def _build_adaptation_preview(self, platform: Platform, result: Dict[str, Any]) -> AdaptationPreview:
+        """Convert a raw adaptation result into a preview"""
         return AdaptationPreview(
-            platform=target_platform,
-            platform_config=platform_config,
+            platform=platform,
+            platform_config=PLATFORM_CONFIGS[platform],
             suggested_title=result.get("suggested_title", ""),
             suggested_caption=result.get("suggested_caption", ""),
             suggested_hashtags=result.get("suggested_hashtags", []),
@@ -141,7 +514,8 @@ class AIService:
         self,
         text: str,
         target_platform: Platform,
-        style: Optional[str] = None
+        style: Optional[str] = None,
+        use_cache: bool = True
     ) -> str:
         """Rewrite text for specific platform style"""
 
@@ -163,15 +537,15 @@ class AIService:
         直接输出改写后的文本，不要有任何解释。
         """
 
-        if self.openai_client:
-            response = await self.openai_client.chat.completions.create(
-                model="gpt-4-turbo-preview",
-                messages=[
-                    {"role": "system", "content": "你是一个专业的文案撰写专家。"},
-                    {"role": "user", "content": prompt}
-                ]
+        if self.router:
+            return await self._chat(
+                "rewrite_text",
+                "你是一个专业的文案撰写专家。",
+                prompt,
+                json_mode=False,
+                platform=target_platform.value,
+                use_cache=use_cache
             )
-            return response.choices[0].message.content
         else:
             return text  # Return original if no AI available
 
@@ -179,7 +553,8 @@ class AIService:
         self,
         content: str,
         target_platform: Platform,
-        count: int = 5
+        count: int = 5,
+        use_cache: bool = True
     ) -> List[str]:
         """Generate multiple title options for A/B testing"""
 
@@ -199,16 +574,15 @@ class AIService:
         以JSON数组格式返回标题列表。
         """
 
-        if self.openai_client:
-            response = await self.openai_client.chat.completions.create(
-                model="gpt-4-turbo-preview",
-                messages=[
-                    {"role": "system", "content": "你是一个标题创作专家。"},
-                    {"role": "user", "content": prompt}
-                ],
-                response_format={"type": "json_object"}
+        if self.router:
+            response = await self._chat(
+                "generate_titles",
+                "你是一个标题创作专家。",
+                prompt,
+                platform=target_platform.value,
+                use_cache=use_cache
             )
-            result = json.loads(response.choices[0].message.content)
+            result = json.loads(response)
             return result.get("titles", [])
         else:
             return [
@@ -1,17 +1,84 @@
 """
 Content processing service for analysis and adaptation
 """
-from typing import List, Optional
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, insert, update, tuple_
+from sqlalchemy.exc import IntegrityError
+from pydantic import ValidationError
+from redis.exceptions import RedisError
 
-from ..models.content import Content, Adaptation, ContentStatus, AdaptationStatus, Platform
-from ..schemas.content import ContentCreate, AdaptationCreate, AdaptationResponse, AdaptationPreview
-from .ai_service import ai_service
+from ..core.config import settings
+from ..core.database import after_commit, unit_of_work
+from ..core.locks import RedisLease
+from ..models.content import Content, Adaptation, ContentStatus, ContentType, AdaptationStatus, Platform
+from ..models.user import User
+from ..schemas.content import (
+    ContentCreate, ContentResponse, AdaptationCreate, AdaptationResponse, AdaptationPreview,
+    HashtagSuggestion, PLATFORM_CONFIGS
+)
+from .ai_service import ai_service, ANALYSIS_FULL
+from .hashtag_index import hashtag_index
+from .job_queue import job_queue
+from .llm_router import LLMRateLimitedError
+from .read_cache import create_read_cache
+from .scene_service import describe_visuals, keyframe_times, scene_service
+from .storage_service import storage_service
+from .transcription_service import SPEECH_CONTENT_TYPES, transcription_service
+
+logger = logging.getLogger(__name__)
+
+RENDERED_CONTENT_TYPES = {ContentType.VIDEO, ContentType.LIVE_RECORDING, ContentType.IMAGE}
+
+
+class IdempotencyConflictError(ValueError):
+    """An Idempotency-Key was reused for a different content"""
 
 
 class ContentService:
-    """Service for content management and processing"""
+    """
+    Service for content management and processing
+
+    The *_cached read methods serve API polling from the read cache; every
+    write that changes what they return invalidates the affected scopes
+    once its transaction commits.
+    """
+
+    def __init__(self):
+        self.read_cache = create_read_cache()
+        # Analyses running in this process, by content id
+        self._analyses: Dict[int, "asyncio.Future[None]"] = {}
+
+    def _contents_scope(self, user_id: int) -> str:
+        return f"contents:{user_id}"
+
+    def _content_scope(self, user_id: int, content_id: int) -> str:
+        return f"content:{user_id}:{content_id}"
+
+    def _adaptations_scope(self, user_id: int, content_id: int) -> str:
+        return f"adaptations:{user_id}:{content_id}"
+
+    def _invalidate_after_commit(self, db: AsyncSession, *scopes: str) -> None:
+        """Invalidate once the write is visible, so a concurrent read can't re-cache old rows"""
+        if self.read_cache is None:
+            return
+
+        async def invalidate():
+            await self.read_cache.invalidate(scopes)
+
+        after_commit(db, invalidate)
+
+    def invalidate_adaptations(self, db: AsyncSession, user_id: int, content_id: int) -> None:
+        """Drop a content's cached adaptation lists once db commits; for any service that writes adaptations"""
+        self._invalidate_after_commit(db, self._adaptations_scope(user_id, content_id))
+
+    def _page_key(self, skip: int, limit: Optional[int], after: Optional[Tuple[datetime, int]]) -> str:
+        if after is not None:
+            return f"after:{after[0].isoformat()}:{after[1]}:{limit}"
+        return f"skip:{skip}:{limit}"
 
     async def create_content(
         self,
@@ -26,13 +93,51 @@ class ContentService:
             description=content_data.description,
             content_type=content_data.content_type,
             original_file_url=content_data.original_file_url,
+            file_size=content_data.file_size,
+            file_hash=content_data.file_hash,
             status=ContentStatus.PENDING
         )
         db.add(content)
-        await db.commit()
-        await db.refresh(content)
+        await db.flush()
+        self._invalidate_after_commit(db, self._contents_scope(user_id))
         return content
 
+    async def schedule_analysis(self, db: AsyncSession, content: Content, use_cache: bool = True) -> None:
+        """
+        Queue AI analysis for the background worker; the content stays PENDING until then.
+
+        The job is enqueued after commit so the worker always finds the row.
+        """
+        content_id = content.id
+
+        async def enqueue():
+            try:
+                await job_queue.enqueue("analyze_content", {"content_id": content_id, "use_cache": use_cache})
+            except RedisError as e:
+                # Preview generation analyzes PENDING content on demand, so this is recoverable
+                logger.warning("Failed to enqueue analysis for content %s: %s", content_id, e)
+
+        after_commit(db, enqueue)
+
+    async def schedule_render(self, db: AsyncSession, content: Content) -> None:
+        """
+        Queue rendering of the content's platform videos or image crops, after commit.
+
+        Only video and image content is rendered; the job picks up every adaptation
+        of the content that has no file yet, so one job covers a bulk create.
+        """
+        if content.content_type not in RENDERED_CONTENT_TYPES:
+            return
+        content_id = content.id
+
+        async def enqueue():
+            try:
+                await job_queue.enqueue("render_adaptations", {"content_id": content_id})
+            except RedisError as e:
+                logger.warning("Failed to enqueue render for content %s: %s", content_id, e)
+
+        after_commit(db, enqueue)
+
     async def get_content(
         self,
         db: AsyncSession,
@@ -48,78 +153,524 @@ class ContentService:
         )
         return result.scalar_one_or_none()
 
+    async def get_content_cached(
+        self,
+        db: AsyncSession,
+        content_id: int,
+        user_id: int
+    ) -> Optional[ContentResponse]:
+        """Get content by ID through the read cache"""
+        async def load():
+            content = await self.get_content(db, content_id, user_id)
+            return ContentResponse.model_validate(content).model_dump(mode="json") if content else None
+
+        if self.read_cache is None:
+            data = await load()
+        else:
+            data = await self.read_cache.get_or_load(
+                self._content_scope(user_id, content_id), "detail", load
+            )
+        return ContentResponse.model_validate(data) if data is not None else None
+
     async def list_user_contents(
         self,
         db: AsyncSession,
         user_id: int,
         skip: int = 0,
-        limit: int = 20
+        limit: int = 20,
+        after: Optional[Tuple[datetime, int]] = None
     ) -> List[Content]:
-        """List all contents for a user"""
-        result = await db.execute(
+        """
+        List contents for a user, newest first.
+
+        Pass the (created_at, id) of the last row seen as `after` for keyset
+        paging, which stays fast at any depth; `skip` is the legacy offset mode.
+        """
+        query = (
             select(Content)
             .where(Content.user_id == user_id)
-            .order_by(Content.created_at.desc())
-            .offset(skip)
+            .order_by(Content.created_at.desc(), Content.id.desc())
             .limit(limit)
         )
+        if after is not None:
+            query = query.where(tuple_(Content.created_at, Content.id) < tuple_(*after))
+        elif skip:
+            query = query.offset(skip)
+
+        result = await db.execute(query)
         return list(result.scalars().all())
 
+    async def list_user_contents_cached(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        skip: int = 0,
+        limit: int = 20,
+        after: Optional[Tuple[datetime, int]] = None
+    ) -> List[ContentResponse]:
+        """list_user_contents through the read cache"""
+        async def load():
+            contents = await self.list_user_contents(db, user_id, skip, limit, after)
+            return [ContentResponse.model_validate(c).model_dump(mode="json") for c in contents]
+
+        if self.read_cache is None:
+            data = await load()
+        else:
+            data = await self.read_cache.get_or_load(
+                self._contents_scope(user_id), self._page_key(skip, limit, after), load
+            )
+        return [ContentResponse.model_validate(item) for item in data]
+
+    async def request_analysis(
+        self,
+        db: AsyncSession,
+        content: Content,
+        use_cache: bool = True
+    ) -> Content:
+        """
+        Analyze content on a user's request: inline, or queued for speech content.
+
+        Decoding and transcribing a long recording takes minutes, far longer
+        than a request should hold its transaction, so video and audio go
+        back to PENDING and the analyze_content job runs them.
+        """
+        if content.content_type not in SPEECH_CONTENT_TYPES:
+            return await self.analyze_content(db, content, use_cache=use_cache)
+
+        if content.status == ContentStatus.ANALYZING and await self._analysis_running(content.id):
+            return content
+        content.status = ContentStatus.PENDING
+        await db.flush()
+        self._invalidate_content(db, content)
+        await self.schedule_analysis(db, content, use_cache=use_cache)
+        return content
+
     async def analyze_content(
         self,
         db: AsyncSession,
-        content: Content
+        content: Content,
+        use_cache: bool = True
     ) -> Content:
-        """Run AI analysis on content"""
-        content.status = ContentStatus.ANALY
-        await db.commit()
+        """
+        Run AI analysis on content.
+
+        Concurrent calls for the same content, in this process or on other
+        nodes, share one analysis; every caller gets the refreshed row.
+        """
+        if use_cache and content.file_hash:
+            # Same user re-uploading an identical file: reuse the earlier analysis
+            previous = await self._find_analyzed_duplicate(db, content)
+            if previous is not None:
+                content.analysis_result = previous.analysis_result
+                content.status = ContentStatus.READY
+                await db.flush()
+                self._invalidate_content(db, content)
+                return content
+
+        # Single flight per content: join a run in this process, or one that
+        # another node has claimed (ANALYZING under a live lease); otherwise
+        # claim the lease and run it. A lease that ran out means its holder
+        # died, and the loop takes over.
+        while True:
+            inflight = self._analyses.get(content.id)
+            if inflight is not None:
+                try:
+                    await asyncio.shield(inflight)
+                except asyncio.CancelledError:
+                    if not inflight.cancelled():
+                        raise
+                except LLMRateLimitedError:
+                    raise
+                except Exception:
+                    # The owner records failures on the row; read it below
+                    pass
+            elif content.status == ContentStatus.ANALYZING and await self._analysis_running(content.id):
+                await self._wait_for_analysis(content.id)
+            else:
+                try:
+                    lease = await RedisLease.acquire(
+                        self._analysis_lock_key(content.id),
+                        settings.ANALYSIS_LOCK_LEASE_SECONDS
+                    )
+                except RedisError as e:
+                    # Without Redis only in-process coalescing applies
+                    logger.warning("Analysis lock unavailable for content %s: %s", content.id, e)
+                    return await self._run_analysis(db, content, None, use_cache)
+                else:
+                    if lease is not None:
+                        return await self._run_analysis(db, content, lease, use_cache)
+                    await self._wait_for_analysis(content.id)
+
+            await db.refresh(content)
+            if content.status in (ContentStatus.READY, ContentStatus.ERROR):
+                return content
+
+    async def _analysis_mode(self, db: AsyncSession, user_id: int) -> str:
+        """Analysis mode for the user's subscription plan (see AI_ANALYSIS_MODES)"""
+        plan = await db.scalar(select(User.subscription_plan).where(User.id == user_id))
+        return settings.AI_ANALYSIS_MODES.get(plan.value if plan else "", ANALYSIS_FULL)
 
+    def _analysis_lock_key(self, content_id: int) -> str:
+        return f"analysis:lock:{content_id}"
+
+    async def _analysis_running(self, content_id: int) -> bool:
         try:
-            # Get content text (in real implementation, would extract from file)
-            content_text = content.description or content.title
+            return await RedisLease.is_held(self._analysis_lock_key(content_id))
+        except RedisError:
+            return False
 
-            # Run AI analysis
-            analysis = await ai_service.analyze_content(
-                content_text=content_text,
-                content_type=content.content_type
-            )
+    async def _wait_for_analysis(self, content_id: int) -> None:
+        """Wait until no node holds the analysis lease for the content"""
+        while await self._analysis_running(content_id):
+            await asyncio.sleep(settings.ANALYSIS_WAIT_POLL_SECONDS)
+
+    async def _run_analysis(
+        self,
+        db: AsyncSession,
+        content: Content,
+        lease: Optional[RedisLease],
+        use_cache: bool
+    ) -> Content:
+        """
+        Analyze as the single owner of the content's analysis.
+
+        The ANALYZING claim and the result are committed in their own short
+        transactions, so pollers and joiners on other nodes see both as soon
+        as they happen rather than when the caller's transaction ends.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._analyses[content.id] = future
+        keep_alive = asyncio.create_task(lease.keep_alive()) if lease else None
+        try:
+            async with unit_of_work() as claim_db:
+                await claim_db.execute(
+                    update(Content)
+                    .where(Content.id == content.id)
+                    .values(status=ContentStatus.ANALYZING)
+                )
+                self._invalidate_content(claim_db, content)
 
-            content.analysis_result = analysis.model_dump()
-            content.status = ContentStatus.READY
+            try:
+                # Speech in video and audio is analyzed along with the text fields,
+                # and what the video shows from its keyframes
+                content_text = content.description or content.title
+                transcript, scenes = await asyncio.gather(
+                    transcription_service.get_transcript(content),
+                    scene_service.get_scenes(content)
+                )
+                if transcript is not None and transcript.text:
+                    content_text = f"{content_text}\n\n{transcript.text}"
+                metadata = None
+                if scenes is not None:
+                    metadata = {"visual_elements": describe_visuals(scenes.scenes, scenes.visual)}
 
-        except Exception as e:
-            content.status = ContentStatus.ERROR
-            content.analysis_result = {"error": str(e)}
+                # Run AI analysis, at the depth the owner's plan includes
+                analysis = await ai_service.analyze_content(
+                    content_text=content_text,
+                    content_type=content.content_type,
+                    metadata=metadata,
+                    use_cache=use_cache,
+                    mode=await self._analysis_mode(db, content.user_id)
+                )
+                values = {"status": ContentStatus.READY}
+                if transcript is not None:
+                    analysis.transcript = transcript.text
+                    if content.duration_seconds is None:
+                        values["duration_seconds"] = round(transcript.duration_seconds)
+                if scenes is not None:
+                    analysis.keyframes = keyframe_times(scenes.scenes, settings.KEYFRAME_COUNT, scenes.duration_seconds)
+                    if content.duration_seconds is None and "duration_seconds" not in values:
+                        values["duration_seconds"] = round(scenes.duration_seconds)
+                values["analysis_result"] = analysis.model_dump()
+                rate_limited = None
+            except LLMRateLimitedError as e:
+                # Not the content's fault: leave it PENDING and let the caller retry later
+                values = {"status": ContentStatus.PENDING, "analysis_result": None}
+                rate_limited = e
+            except Exception as e:
+                values = {"status": ContentStatus.ERROR, "analysis_result": {"error": str(e)}}
+                rate_limited = None
+
+            async with unit_of_work() as result_db:
+                await result_db.execute(
+                    update(Content).where(Content.id == content.id).values(**values)
+                )
+                self._invalidate_content(result_db, content)
+
+            if rate_limited is not None:
+                raise rate_limited
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        else:
+            future.set_result(None)
+        finally:
+            self._analyses.pop(content.id, None)
+            if keep_alive is not None:
+                keep_alive.cancel()
+            if lease is not None:
+                try:
+                    await lease.release()
+                except RedisError as e:
+                    # The lease expires on its own
+                    logger.warning("Failed to release analysis lock for content %s: %s", content.id, e)
 
-        await db.commit()
         await db.refresh(content)
         return content
 
+    def _invalidate_content(self, db: AsyncSession, content: Content) -> None:
+        self._invalidate_after_commit(
+            db,
+            self._contents_scope(content.user_id),
+            self._content_scope(content.user_id, content.id)
+        )
+
+    async def _find_analyzed_duplicate(self, db: AsyncSession, content: Content) -> Optional[Content]:
+        """Find another analyzed content of the same user with an identical file"""
+        result = await db.execute(
+            select(Content)
+            .where(
+                Content.user_id == content.user_id,
+                Content.file_hash == content.file_hash,
+                Content.id != content.id,
+                Content.status == ContentStatus.READY
+            )
+            .order_by(Content.updated_at.desc())
+            .limit(1)
+        )
+        return result.scalar_one_or_none()
+
+    async def delete_content(self, db: AsyncSession, content: Content) -> None:
+        """Delete content and drop its reference to the stored file"""
+        file_key = storage_service.file_key_from_url(content.original_file_url)
+        self._invalidate_content(db, content)
+        self.invalidate_adaptations(db, content.user_id, content.id)
+        await db.delete(content)
+        await db.flush()
+        if file_key:
+            await storage_service.delete_file(file_key, db)
+
+    def hashtag_query(self, title: str, analysis_result: Optional[Dict[str, Any]]) -> str:
+        """Text describing a content for hashtag search: its title, topics and candidate tags"""
+        analysis_result = analysis_result or {}
+        words = [*analysis_result.get("main_topics", []), *analysis_result.get("hashtags", [])]
+        return " ".join([title, *(word for word in words if isinstance(word, str))])
+
+    def suggest_hashtags(self, platform: Platform, text: str, limit: int = 10) -> List[HashtagSuggestion]:
+        """Hashtags used on the platform for similar content; empty until the index is built"""
+        if hashtag_index is None:
+            return []
+        return [
+            HashtagSuggestion(tag=match.tag, score=match.score, uses=match.uses)
+            for match in hashtag_index.suggest(platform, text, limit)
+        ]
+
+    def _hashtag_candidates(self, content: Content, platforms: List[Platform]) -> Dict[Platform, List[str]]:
+        """Proven tags per platform to offer the model instead of having it invent them"""
+        limit = settings.HASHTAG_PROMPT_CANDIDATES
+        if hashtag_index is None or limit <= 0:
+            return {}
+        query = self.hashtag_query(content.title, content.analysis_result)
+        candidates = {}
+        for platform in platforms:
+            tags = [suggestion.tag for suggestion in self.suggest_hashtags(platform, query, limit)]
+            if tags:
+                candidates[platform] = tags
+        return candidates
+
     async def generate_adaptations_preview(
         self,
         db: AsyncSession,
         content: Content,
-        target_platforms: List[Platform]
+        target_platforms: List[Platform],
+        use_cache: bool = True
     ) -> List[AdaptationPreview]:
         """Generate preview of adaptations for multiple platforms"""
 
         if not content.analysis_result:
-            content = await self.analyze_content(db, content)
+            content = await self.analyze_content(db, content, use_cache=use_cache)
 
-        previews = []
         from ..schemas.content import ContentAnalysis
         analysis = ContentAnalysis(**content.analysis_result)
+        original_content = content.description or content.title
+        hashtag_candidates = self._hashtag_candidates(content, list(dict.fromkeys(target_platforms)))
 
-        for platform in target_platforms:
-            preview = await ai_service.generate_adaptation(
-                original_content=content.description or content.title,
-                analysis=analysis,
-                target_platform=platform
-            )
-            previews.append(preview)
+        # Try a single batched call first; platforms missing from it fall back below
+        batched = {}
+        if settings.AI_BATCH_ADAPTATION and len(set(target_platforms)) > 1:
+            try:
+                batched = await ai_service.generate_adaptations_batch(
+                    original_content=original_content,
+                    analysis=analysis,
+                    target_platforms=target_platforms,
+                    use_cache=use_cache,
+                    hashtag_candidates=hashtag_candidates
+                )
+            except Exception:
+                batched = {}
+
+        # Fan out one LLM call per platform, capped to avoid provider rate limits
+        semaphore = asyncio.Semaphore(max(1, settings.AI_MAX_CONCURRENCY))
+
+        async def generate(platform: Platform) -> AdaptationPreview:
+            if platform in batched:
+                return batched[platform]
+            async with semaphore:
+                return await ai_service.generate_adaptation(
+                    original_content=original_content,
+                    analysis=analysis,
+                    target_platform=platform,
+                    use_cache=use_cache,
+                    hashtag_candidates=hashtag_candidates.get(platform)
+                )
+
+        results = await asyncio.gather(
+            *(generate(platform) for platform in target_platforms),
+            return_exceptions=True
+        )
+
+        # gather preserves request order; failed platforms are reported inline
+        previews = []
+        for platform, result in zip(target_platforms, results):
+            if isinstance(result, BaseException):
+                if isinstance(result, asyncio.CancelledError):
+                    raise result
+                result = self._failed_preview(platform, result)
+            previews.append(result)
 
         return previews
 
+    async def stream_adaptations_preview(
+        self,
+        content_id: int,
+        user_id: int,
+        target_platforms: List[Platform],
+        use_cache: bool = True,
+        stream_tokens: bool = False
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield preview events as each platform finishes, for streaming responses.
+
+        Events are {"event": name, "data": ...}:
+        - status: {"stage"}: "preparing" while the content is loaded (and
+          analyzed if it wasn't yet), then "generating"
+        - delta: {"platform", "text"} raw model output, only with stream_tokens
+        - preview: an AdaptationPreview, one per platform, failed ones with error set
+        - error: {"detail"} if the stream can't continue
+        - ping: keep-alive while nothing else is ready
+        - done: after the last preview
+
+        The generator opens its own sessions, since it outlives the request's.
+        Closing it cancels the platform calls still running.
+        """
+        heartbeat = settings.PREVIEW_STREAM_HEARTBEAT_SECONDS
+        platforms = list(dict.fromkeys(target_platforms))
+        tasks: List["asyncio.Task[None]"] = []
+
+        async def load_analyzed() -> Optional[Content]:
+            async with unit_of_work() as db:
+                content = await self.get_content(db, content_id, user_id)
+                if content is not None and not content.analysis_result:
+                    content = await self.analyze_content(db, content, use_cache=use_cache)
+                return content
+
+        try:
+            loading = asyncio.create_task(load_analyzed())
+            tasks.append(loading)
+            yield {"event": "status", "data": {"stage": "preparing"}}
+            while not loading.done():
+                await asyncio.wait({loading}, timeout=heartbeat)
+                if not loading.done():
+                    yield {"event": "ping", "data": None}
+
+            try:
+                content = loading.result()
+            except LLMRateLimitedError as e:
+                yield {"event": "error", "data": {"detail": str(e)}}
+                return
+            except Exception:
+                logger.exception("Loading content %s for preview stream failed", content_id)
+                yield {"event": "error", "data": {"detail": "Content analysis failed"}}
+                return
+            if content is None:
+                yield {"event": "error", "data": {"detail": "Content not found"}}
+                return
+
+            from ..schemas.content import ContentAnalysis
+            try:
+                # A failed analysis leaves {"error": ...} behind rather than an analysis
+                analysis = ContentAnalysis(**content.analysis_result)
+            except ValidationError:
+                detail = content.analysis_result.get("error") or "Content analysis is unusable"
+                yield {"event": "error", "data": {"detail": f"Content analysis failed: {detail}"}}
+                return
+            original_content = content.description or content.title
+            hashtag_candidates = self._hashtag_candidates(content, platforms)
+            yield {"event": "status", "data": {"stage": "generating"}}
+
+            # Per-platform calls rather than one batch, so each result can go out on its own
+            semaphore = asyncio.Semaphore(max(1, settings.AI_MAX_CONCURRENCY))
+            events: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue()
+
+            async def generate(platform: Platform) -> None:
+                async def on_delta(text: str) -> None:
+                    await events.put({"event": "delta", "data": {"platform": platform.value, "text": text}})
+
+                try:
+                    async with semaphore:
+                        preview = await ai_service.generate_adaptation(
+                            original_content=original_content,
+                            analysis=analysis,
+                            target_platform=platform,
+                            use_cache=use_cache,
+                            hashtag_candidates=hashtag_candidates.get(platform),
+                            on_delta=on_delta if stream_tokens else None
+                        )
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    preview = self._failed_preview(platform, e)
+                await events.put({"event": "preview", "data": preview.model_dump(mode="json")})
+
+            tasks.extend(asyncio.create_task(generate(platform)) for platform in platforms)
+
+            remaining = len(platforms)
+            while remaining:
+                try:
+                    event = await asyncio.wait_for(events.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield {"event": "ping", "data": None}
+                    continue
+                if event["event"] == "preview":
+                    remaining -= 1
+                yield event
+
+            yield {"event": "done", "data": None}
+        finally:
+            # Client disconnected or the stream ended early: stop paying for model calls
+            pending = [task for task in tasks if not task.done()]
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    def _failed_preview(self, platform: Platform, error: BaseException) -> AdaptationPreview:
+        """Build a placeholder preview for a platform whose generation failed"""
+        return AdaptationPreview(
+            platform=platform,
+            platform_config=PLATFORM_CONFIGS[platform],
+            suggested_title="",
+            suggested_caption="",
+            suggested_hashtags=[],
+            thumbnail_preview_url=None,
+            estimated_duration_seconds=None,
+            error=str(error) or error.__class__.__name__
+        )
+
     async def create_adaptation(
         self,
         db: AsyncSession,
@@ -138,10 +689,87 @@ class ContentService:
             status=AdaptationStatus.PENDING
         )
         db.add(adaptation)
-        await db.commit()
-        await db.refresh(adaptation)
+        await db.flush()
+        self.invalidate_adaptations(db, user_id, content.id)
         return adaptation
 
+    async def create_adaptations_bulk(
+        self,
+        db: AsyncSession,
+        content: Content,
+        previews: List[AdaptationPreview],
+        user_id: int,
+        idempotency_key: Optional[str] = None
+    ) -> List[Adaptation]:
+        """
+        Create adaptations for several previews in one INSERT ... RETURNING.
+
+        All rows are written or none are. Repeating a request with the same
+        idempotency_key returns the adaptations created the first time;
+        reusing the key for another content raises IdempotencyConflictError.
+        Previews that failed to generate are skipped.
+        """
+        previews = [preview for preview in previews if not preview.error]
+        if not previews:
+            return []
+
+        if idempotency_key:
+            platforms = [preview.platform for preview in previews]
+            if len(set(platforms)) != len(platforms):
+                raise ValueError("Each platform may appear only once per idempotent request")
+
+            existing = await self._get_idempotent_adaptations(db, user_id, content.id, idempotency_key)
+            if existing:
+                return existing
+
+        rows = [
+            {
+                "content_id": content.id,
+                "user_id": user_id,
+                "platform": preview.platform,
+                "title": preview.suggested_title,
+                "caption": preview.suggested_caption,
+                "hashtags": preview.suggested_hashtags,
+                "idempotency_key": idempotency_key,
+                "status": AdaptationStatus.PENDING
+            }
+            for preview in previews
+        ]
+
+        try:
+            # Savepoint so a concurrent retry losing the unique race leaves the session usable
+            async with db.begin_nested():
+                result = await db.scalars(insert(Adaptation).returning(Adaptation), rows)
+                adaptations = list(result.all())
+        except IntegrityError:
+            if not idempotency_key:
+                raise
+            return await self._get_idempotent_adaptations(db, user_id, content.id, idempotency_key)
+
+        self.invalidate_adaptations(db, user_id, content.id)
+        return adaptations
+
+    async def _get_idempotent_adaptations(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        content_id: int,
+        idempotency_key: str
+    ) -> List[Adaptation]:
+        # Keys are unique per user, not per content, so look across all of the user's contents
+        result = await db.execute(
+            select(Adaptation)
+            .where(
+                Adaptation.user_id == user_id,
+                Adaptation.idempotency_key == idempotency_key
+            )
+            .order_by(Adaptation.id)
+        )
+        adaptations = list(result.scalars().all())
+        if any(adaptation.content_id != content_id for adaptation in adaptations):
+            raise IdempotencyConflictError("Idempotency-Key was already used for another content")
+        return adaptations
+
     async def get_adaptation(
         self,
         db: AsyncSession,
@@ -161,19 +789,48 @@ class ContentService:
         self,
         db: AsyncSession,
         content_id: int,
-        user_id: int
+        user_id: int,
+        limit: Optional[int] = None,
+        after: Optional[Tuple[datetime, int]] = None
     ) -> List[Adaptation]:
-        """List all adaptations for a content"""
-        result = await db.execute(
+        """List adaptations for a content, newest first; all of them unless limit is given"""
+        query = (
             select(Adaptation)
             .where(
                 Adaptation.content_id == content_id,
                 Adaptation.user_id == user_id
             )
-            .order_by(Adaptation.created_at.desc())
+            .order_by(Adaptation.created_at.desc(), Adaptation.id.desc())
         )
+        if after is not None:
+            query = query.where(tuple_(Adaptation.created_at, Adaptation.id) < tuple_(*after))
+        if limit is not None:
+            query = query.limit(limit)
+
+        result = await db.execute(query)
         return list(result.scalars().all())
 
+    async def list_content_adaptations_cached(
+        self,
+        db: AsyncSession,
+        content_id: int,
+        user_id: int,
+        limit: Optional[int] = None,
+        after: Optional[Tuple[datetime, int]] = None
+    ) -> List[AdaptationResponse]:
+        """list_content_adaptations through the read cache"""
+        async def load():
+            adaptations = await self.list_content_adaptations(db, content_id, user_id, limit, after)
+            return [AdaptationResponse.model_validate(a).model_dump(mode="json") for a in adaptations]
+
+        if self.read_cache is None:
+            data = await load()
+        else:
+            data = await self.read_cache.get_or_load(
+                self._adaptations_scope(user_id, content_id), self._page_key(0, limit, after), load
+            )
+        return [AdaptationResponse.model_validate(item) for item in data]
+
 
 # Create singleton instance
 content_service = ContentService()
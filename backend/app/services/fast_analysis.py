@@ -0,0 +1,255 @@
+"""
+Local CPU-only analysis tier: keywords, topics and key sentences without an LLM
+"""
+import logging
+import math
+import re
+from abc import ABC, abstractmethod
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set
+
+from ..utils.text import split_sentences
+
+try:
+    import jieba
+    jieba.setLogLevel(logging.WARNING)
+except ImportError:  # Optional; CJK text falls back to character bigrams
+    jieba = None
+
+_TOKEN = re.compile(r"[一-鿿]+|[A-Za-z][A-Za-z0-9+#'\-]*|\d+(?:\.\d+)?")
+_CJK = re.compile(r"[一-鿿]")
+
+STOPWORDS = frozenset("""
+的 了 和 是 在 我 有 也 就 不 人 都 一 一个 上 也是 很 到 说 要 去 你 会 着 没有 看 好 自己 这 那 他 她 它
+我们 你们 他们 这个 那个 这些 那些 什么 怎么 为什么 因为 所以 但是 而且 如果 或者 还是 然后 就是 可以 已经
+还有 一下 一些 非常 真的 其实 今天 大家 时候 现在 这样 那样 以及 对于 关于 通过 进行 没 吗 呢 吧 啊 哦 嗯
+the a an and or but if then of to in on for with at by from as is are was were be been being it its this that
+these those i you he she we they my your our their not no so do does did have has had can will just about
+""".split())
+
+# Bigrams that straddle these characters are rarely words
+_FUNCTION_CHARS = frozenset("的了和是在也就都很着吗呢吧啊哦与及或而被把给让从对向这那们个来于之其为以")
+
+
+@dataclass
+class Token:
+    text: str
+    start: int
+    end: int
+
+
+def tokenize(text: str) -> List[Token]:
+    """
+    Content words with their character offsets.
+
+    Uses jieba when installed; otherwise CJK runs become overlapping
+    character bigrams, which keyphrase merging later joins back into words.
+    """
+    tokens: List[Token] = []
+    if jieba is not None:
+        for word, start, end in jieba.tokenize(text):
+            word = word.strip().lower()
+            if len(word) >= 2 and word not in STOPWORDS and _TOKEN.fullmatch(word):
+                tokens.append(Token(word, start, end))
+        return tokens
+
+    for match in _TOKEN.finditer(text):
+        word = match.group()
+        if _CJK.match(word):
+            for offset in range(len(word) - 1):
+                bigram = word[offset:offset + 2]
+                if bigram in STOPWORDS or bigram[0] in _FUNCTION_CHARS or bigram[1] in _FUNCTION_CHARS:
+                    continue
+                start = match.start() + offset
+                tokens.append(Token(bigram, start, start + 2))
+        else:
+            word = word.lower()
+            if len(word) >= 2 and word not in STOPWORDS and not word[0].isdigit():
+                tokens.append(Token(word, match.start(), match.end()))
+    return tokens
+
+
+def _pagerank(graph: Dict[str, Dict[str, float]], iterations: int = 30, damping: float = 0.85) -> Dict[str, float]:
+    """Weighted PageRank over an undirected graph"""
+    scores = {node: 1.0 for node in graph}
+    out_weight = {node: sum(edges.values()) or 1.0 for node, edges in graph.items()}
+    for _ in range(iterations):
+        updated = {
+            node: (1 - damping) + damping * sum(
+                weight / out_weight[neighbor] * scores[neighbor]
+                for neighbor, weight in edges.items()
+            )
+            for node, edges in graph.items()
+        }
+        delta = max((abs(updated[node] - scores[node]) for node in graph), default=0.0)
+        scores = updated
+        if delta < 1e-4:
+            break
+    return scores
+
+
+class FastAnalyzer(ABC):
+    """Interface for local analyzers; returns the ContentAnalysis fields it can fill"""
+
+    name = "base"
+
+    @abstractmethod
+    def analyze(self, text: str) -> Dict[str, List[str]]:
+        ...
+
+
+class TextRankAnalyzer(FastAnalyzer):
+    """
+    TextRank keyphrases for main_topics and hashtags, and TextRank over
+    sentences for key_points.
+
+    Token scores come from co-occurrence PageRank weighted by inverse
+    sentence frequency, so words spread evenly through every sentence
+    (filler) rank below words concentrated where a topic is discussed.
+    Adjacent top tokens are merged into phrases.
+    """
+
+    name = "textrank"
+
+    def __init__(
+        self,
+        window: int = 5,
+        max_topics: int = 5,
+        max_hashtags: int = 10,
+        max_key_points: int = 4,
+        max_sentences: int = 200,
+        max_point_length: int = 80
+    ):
+        self.window = window
+        self.max_topics = max_topics
+        self.max_hashtags = max_hashtags
+        self.max_key_points = max_key_points
+        self.max_sentences = max_sentences
+        self.max_point_length = max_point_length
+
+    def analyze(self, text: str) -> Dict[str, List[str]]:
+        tokens = tokenize(text)
+        if not tokens:
+            return {"main_topics": [], "hashtags": [], "key_points": []}
+
+        sentences = split_sentences(text)
+        sentence_words = [{token.text for token in tokenize(sentence)} for sentence in sentences]
+        token_scores = self._token_scores(tokens, sentence_words)
+        phrases = self._keyphrases(text, tokens, token_scores)
+        return {
+            "main_topics": phrases[:self.max_topics],
+            "hashtags": phrases[:self.max_hashtags],
+            "key_points": self._key_sentences(sentences, sentence_words, token_scores)
+        }
+
+    def _token_scores(self, tokens: List[Token], sentence_words: List[Set[str]]) -> Dict[str, float]:
+        graph: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        words = [token.text for token in tokens]
+        for i, word in enumerate(words):
+            graph[word]
+            for other in words[i + 1:i + self.window]:
+                if other != word:
+                    graph[word][other] += 1.0
+                    graph[other][word] += 1.0
+        ranks = _pagerank(graph)
+
+        # Inverse sentence frequency; single-sentence text gets no weighting
+        if len(sentence_words) < 2:
+            return ranks
+        sentence_frequency = Counter()
+        for words_in_sentence in sentence_words:
+            sentence_frequency.update(words_in_sentence)
+        total = len(sentence_words)
+        return {
+            word: rank * (math.log((1 + total) / (1 + sentence_frequency[word])) + 1)
+            for word, rank in ranks.items()
+        }
+
+    def _keyphrases(self, text: str, tokens: List[Token], scores: Dict[str, float]) -> List[str]:
+        # Recurring tokens only, when there are enough: a bigram seen once is
+        # as likely to straddle two words as to be one
+        counts = Counter(token.text for token in tokens)
+        recurring = [word for word in scores if counts[word] > 1]
+        pool = recurring if len(recurring) >= self.max_topics else list(scores)
+        ranked = sorted(pool, key=scores.get, reverse=True)
+        candidates = set(ranked[:min(self.max_hashtags * 3, max(self.max_topics, len(scores) // 3))])
+
+        # Join runs of candidate tokens that touch or overlap in the text
+        phrase_scores: Dict[str, float] = defaultdict(float)
+        run: List[Token] = []
+
+        def close_run() -> None:
+            if run:
+                phrase = text[run[0].start:run[-1].end].strip()
+                if 2 <= len(phrase) <= 12 and phrase.lower() not in STOPWORDS:
+                    score = sum(scores[token.text] for token in run) / math.sqrt(len(run))
+                    phrase_scores[phrase.lower()] = max(phrase_scores[phrase.lower()], score)
+                run.clear()
+
+        for token in tokens:
+            if token.text not in candidates:
+                close_run()
+                continue
+            if run and token.start > run[-1].end:
+                close_run()
+            run.append(token)
+        close_run()
+
+        phrases: List[str] = []
+        for phrase in sorted(phrase_scores, key=phrase_scores.get, reverse=True):
+            # Skip fragments of a phrase already chosen and vice versa
+            if any(phrase in chosen or chosen in phrase for chosen in phrases):
+                continue
+            phrases.append(phrase)
+            if len(phrases) >= self.max_hashtags:
+                break
+        return phrases
+
+    def _key_sentences(
+        self,
+        sentences: List[str],
+        sentence_words: List[Set[str]],
+        token_scores: Dict[str, float]
+    ) -> List[str]:
+        bags = [
+            (index, sentence, words)
+            for index, (sentence, words) in enumerate(zip(sentences, sentence_words))
+            if words
+        ]
+        if not bags:
+            return []
+
+        # Sentence TextRank is quadratic; pre-select by keyword weight on long text
+        if len(bags) > self.max_sentences:
+            bags = sorted(bags, key=lambda bag: sum(token_scores[w] for w in bag[2]), reverse=True)
+            bags = bags[:self.max_sentences]
+
+        graph: Dict[str, Dict[str, float]] = {str(index): {} for index, _, _ in bags}
+        for a in range(len(bags)):
+            index_a, _, words_a = bags[a]
+            for b in range(a + 1, len(bags)):
+                index_b, _, words_b = bags[b]
+                overlap = len(words_a & words_b)
+                if overlap:
+                    weight = overlap / (math.log(len(words_a) + 1) + math.log(len(words_b) + 1))
+                    graph[str(index_a)][str(index_b)] = weight
+                    graph[str(index_b)][str(index_a)] = weight
+        ranks = _pagerank(graph)
+
+        top = sorted(bags, key=lambda bag: ranks[str(bag[0])], reverse=True)[:self.max_key_points]
+        return [sentence[:self.max_point_length] for _, sentence, _ in sorted(top, key=lambda bag: bag[0])]
+
+
+FAST_ANALYZERS = {
+    TextRankAnalyzer.name: TextRankAnalyzer,
+}
+
+
+def create_fast_analyzer(name: str) -> Optional[FastAnalyzer]:
+    """Build the configured analyzer; unknown names disable the tier"""
+    analyzer = FAST_ANALYZERS.get(name)
+    if analyzer is None:
+        logging.getLogger(__name__).warning("Unknown fast analyzer %r", name)
+        return None
+    return analyzer()
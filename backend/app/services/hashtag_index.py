@@ -0,0 +1,323 @@
+"""
+Per-platform hashtag recommendations from past adaptations
+"""
+import asyncio
+import logging
+import math
+import re
+import time
+import zlib
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select
+
+from ..core.config import settings
+from ..core.database import read_only_session_maker
+from ..models.content import Adaptation, AdaptationStatus, Content, Platform
+
+logger = logging.getLogger(__name__)
+
+_SPACES = re.compile(r"\s+")
+_CJK = re.compile(r"[一-鿿]")
+
+
+def normalize_tag(tag: str) -> str:
+    """Compare tags without their marker or case: '#AI工具 ' and 'ai工具' are one tag"""
+    return _SPACES.sub("", tag.strip().lstrip("#＃").rstrip("#＃")).lower()
+
+
+def _features(text: str) -> Iterable[str]:
+    """Character n-grams: CJK unigrams, and bigrams and trigrams of everything"""
+    text = _SPACES.sub(" ", text.lower().replace("#", " ").replace("＃", " ")).strip()
+    for index, char in enumerate(text):
+        if _CJK.match(char):
+            yield char
+        if index + 2 <= len(text):
+            yield text[index:index + 2]
+        if index + 3 <= len(text):
+            yield text[index:index + 3]
+
+
+def embed(texts: Sequence[str], dim: int) -> np.ndarray:
+    """
+    Hashed character n-gram vectors, L2-normalized, one row per text.
+
+    crc32 rather than hash(), so the same text maps to the same vector in
+    every process. A second hash bit picks the sign, which keeps collisions
+    from only ever adding up.
+    """
+    vectors = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for feature in _features(text):
+            code = zlib.crc32(feature.encode("utf-8"))
+            vectors[row, code % dim] += 1.0 if code & 0x80000000 else -1.0
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+    return vectors
+
+
+def _kmeans(vectors: np.ndarray, clusters: int, iterations: int, rng: np.random.Generator) -> np.ndarray:
+    """Spherical k-means: unit centroids, assignment by cosine similarity"""
+    centroids = vectors[rng.choice(len(vectors), clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        empty = norms[:, 0] == 0
+        # Re-seed empty clusters rather than let them go dead
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+        norms[empty] = 1.0
+        centroids = sums / norms
+    return centroids
+
+
+@dataclass
+class HashtagMatch:
+    tag: str
+    score: float
+    uses: int
+
+
+class PlatformHashtags:
+    """
+    One platform's tags with an inverted-file (IVF) index over their vectors.
+
+    A tag's vector blends the embedding of the tag itself with the mean
+    embedding of the titles and topics it was used with, so a query about a
+    topic finds tags that were used for it even when they share no
+    characters. Tags are clustered with k-means; a search scores only the
+    tags in the probed clusters nearest the query. Platforms with few tags
+    get a single cluster, which is an exact search.
+    """
+
+    def __init__(self, tags: List[str], uses: np.ndarray, vectors: np.ndarray, lists: int, rng: np.random.Generator):
+        self.tags = tags
+        self.uses = uses
+        self.popularity = np.log1p(uses) / math.log1p(max(int(uses.max()), 1)) if len(uses) else uses
+        self.vectors = vectors
+
+        lists = max(1, min(lists, len(tags) // settings.HASHTAG_INDEX_MIN_LIST_SIZE))
+        if lists == 1:
+            self.centroids = np.zeros((1, vectors.shape[1]), dtype=np.float32)
+            self.lists = [np.arange(len(tags))]
+            return
+
+        sample = vectors
+        if len(vectors) > lists * 64:
+            sample = vectors[rng.choice(len(vectors), lists * 64, replace=False)]
+        self.centroids = _kmeans(sample, lists, settings.HASHTAG_INDEX_KMEANS_ITERATIONS, rng).astype(np.float32)
+        assignment = np.argmax(vectors @ self.centroids.T, axis=1)
+        order = np.argsort(assignment, kind="stable")
+        bounds = np.searchsorted(assignment[order], np.arange(lists + 1))
+        self.lists = [order[bounds[i]:bounds[i + 1]] for i in range(lists)]
+
+    def __len__(self) -> int:
+        return len(self.tags)
+
+    def search(self, query: np.ndarray, limit: int, probes: int, exclude: Iterable[str] = ()) -> List[HashtagMatch]:
+        if not self.tags or not query.any():
+            return []
+        if len(self.lists) == 1:
+            candidates = self.lists[0]
+        else:
+            nearest = np.argsort(self.centroids @ query)[::-1][:probes]
+            candidates = np.concatenate([self.lists[i] for i in nearest])
+        if not len(candidates):
+            return []
+
+        weight = settings.HASHTAG_INDEX_POPULARITY_WEIGHT
+        scores = (self.vectors[candidates] @ query) * (1 - weight) + self.popularity[candidates] * weight
+        excluded = {normalize_tag(tag) for tag in exclude}
+        count = min(len(candidates), limit + len(excluded))
+        top = np.argpartition(scores, -count)[-count:]
+        top = top[np.argsort(scores[top])[::-1]]
+
+        matches = []
+        for position in top:
+            index = candidates[position]
+            if normalize_tag(self.tags[index]) in excluded:
+                continue
+            matches.append(HashtagMatch(self.tags[index], round(float(scores[position]), 4), int(self.uses[index])))
+            if len(matches) >= limit:
+                break
+        return matches
+
+
+def build_platform_index(
+    rows: Sequence[Tuple[List[str], str]],
+    dim: int,
+    tag_weight: float,
+    lists: Optional[int] = None,
+    seed: int = 0
+) -> PlatformHashtags:
+    """
+    Build one platform's index from (hashtags, context text) rows.
+
+    The context is whatever the tags were chosen for, e.g. the adaptation
+    title and the content's topics. A tag is shown in its most used spelling.
+    """
+    rng = np.random.default_rng(seed)
+    tag_ids: Dict[str, int] = {}
+    spellings: List[Dict[str, int]] = []
+    pairs_tag: List[int] = []
+    pairs_row: List[int] = []
+    contexts: List[str] = []
+
+    for hashtags, context in rows:
+        row = len(contexts)
+        contexts.append(context)
+        for tag in dict.fromkeys(hashtags):
+            key = normalize_tag(tag)
+            if not key:
+                continue
+            if key not in tag_ids:
+                tag_ids[key] = len(tag_ids)
+                spellings.append(defaultdict(int))
+            tag_id = tag_ids[key]
+            display = "#" + tag.strip().strip("#＃").strip()
+            spellings[tag_id][display] += 1
+            pairs_tag.append(tag_id)
+            pairs_row.append(row)
+
+    tags = [max(counts, key=counts.get) for counts in spellings]
+    if not tags:
+        return PlatformHashtags([], np.zeros(0, dtype=np.int64), np.zeros((0, dim), dtype=np.float32), 1, rng)
+
+    tag_indices = np.asarray(pairs_tag, dtype=np.int64)
+    uses = np.bincount(tag_indices, minlength=len(tags))
+
+    context_vectors = embed(contexts, dim)
+    context_sums = np.zeros((len(tags), dim), dtype=np.float32)
+    np.add.at(context_sums, tag_indices, context_vectors[np.asarray(pairs_row, dtype=np.int64)])
+    norms = np.linalg.norm(context_sums, axis=1, keepdims=True)
+    np.divide(context_sums, norms, out=context_sums, where=norms > 0)
+
+    vectors = tag_weight * embed(tags, dim) + (1 - tag_weight) * context_sums
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+
+    if lists is None:
+        lists = int(math.sqrt(len(tags)))
+    return PlatformHashtags(tags, uses, vectors.astype(np.float32), lists, rng)
+
+
+class HashtagIndex:
+    """
+    In-process hashtag index per platform, rebuilt periodically from the database.
+
+    Each API process holds its own copy; a rebuild runs on a worker thread
+    and swaps the new index in whole, so searches never see a partial one.
+    Until the first build finishes, suggest() returns nothing.
+    """
+
+    def __init__(self):
+        self.dim = settings.HASHTAG_INDEX_DIM
+        self.platforms: Dict[Platform, PlatformHashtags] = {}
+        self.built_at: Optional[float] = None
+        self.build_seconds: Optional[float] = None
+        self.builds = 0
+        self.build_errors = 0
+        self.searches = 0
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    def suggest(
+        self,
+        platform: Platform,
+        text: str,
+        limit: int = 10,
+        exclude: Iterable[str] = ()
+    ) -> List[HashtagMatch]:
+        """Tags used on this platform for content like `text`, best first"""
+        index = self.platforms.get(platform)
+        if index is None or not text.strip():
+            return []
+        self.searches += 1
+        query = embed([text], self.dim)[0]
+        return index.search(query, limit, settings.HASHTAG_INDEX_PROBES, exclude)
+
+    async def refresh(self) -> None:
+        """Load recent adaptations and rebuild every platform's index"""
+        start = time.perf_counter()
+        rows = await self._load_rows()
+        loop = asyncio.get_running_loop()
+        platforms = await loop.run_in_executor(None, self._build, rows)
+        self.platforms = platforms
+        self.built_at = time.time()
+        self.build_seconds = time.perf_counter() - start
+        self.builds += 1
+        logger.info(
+            "Hashtag index rebuilt in %.2fs: %s", self.build_seconds,
+            ", ".join(f"{platform.value}={len(index)}" for platform, index in platforms.items())
+        )
+
+    async def _load_rows(self) -> Dict[Platform, List[Tuple[List[str], str]]]:
+        statement = (
+            select(Adaptation.platform, Adaptation.hashtags, Adaptation.title, Content.analysis_result["main_topics"])
+            .join(Content, Content.id == Adaptation.content_id)
+            .where(Adaptation.hashtags.is_not(None), Adaptation.status != AdaptationStatus.ERROR)
+            .order_by(Adaptation.id.desc())
+            .limit(settings.HASHTAG_INDEX_MAX_ADAPTATIONS)
+        )
+        rows: Dict[Platform, List[Tuple[List[str], str]]] = defaultdict(list)
+        async with read_only_session_maker() as db:
+            for platform, hashtags, title, topics in (await db.execute(statement)).all():
+                if not isinstance(hashtags, list):
+                    continue
+                topics = [topic for topic in topics if isinstance(topic, str)] if isinstance(topics, list) else []
+                rows[platform].append(
+                    ([tag for tag in hashtags if isinstance(tag, str)], " ".join([title or "", *topics]))
+                )
+        return rows
+
+    def _build(self, rows: Dict[Platform, List[Tuple[List[str], str]]]) -> Dict[Platform, PlatformHashtags]:
+        return {
+            platform: build_platform_index(platform_rows, self.dim, settings.HASHTAG_INDEX_TAG_WEIGHT)
+            for platform, platform_rows in rows.items()
+        }
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.build_errors += 1
+                logger.exception("Hashtag index refresh failed")
+            await asyncio.sleep(settings.HASHTAG_INDEX_REFRESH_SECONDS)
+
+    def start(self) -> None:
+        """Build now and then every HASHTAG_INDEX_REFRESH_SECONDS, in the background"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "platforms": {
+                platform.value: {"tags": len(index), "lists": len(index.lists)}
+                for platform, index in self.platforms.items()
+            },
+            "built_at": self.built_at,
+            "build_seconds": round(self.build_seconds, 3) if self.build_seconds is not None else None,
+            "builds": self.builds,
+            "build_errors": self.build_errors,
+            "searches": self.searches
+        }
+
+
+def create_hashtag_index() -> Optional[HashtagIndex]:
+    """The shared index, or None when HASHTAG_INDEX_ENABLED is off"""
+    return HashtagIndex() if settings.HASHTAG_INDEX_ENABLED else None
+
+
+hashtag_index = create_hashtag_index()
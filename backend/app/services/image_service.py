@@ -0,0 +1,649 @@
+"""
+Platform-sized image crops with saliency-based framing
+"""
+import asyncio
+import hashlib
+import io
+import logging
+import math
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image, ImageOps
+from sqlalchemy import or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from ..core.config import settings
+from ..core.database import read_only_session_maker, unit_of_work
+from ..models.blob import DerivedImage
+from ..models.content import Content, ContentType, Platform
+from ..models.scenes import VideoScenes
+from ..schemas.content import PLATFORM_CONFIGS
+from ..utils.media import MediaError, MediaInfo, decode_frames, extract_frame, parse_aspect_ratio, probe_media
+from .scene_service import keyframe_times, scene_service, thumbnail_time
+from .storage_service import storage_service
+
+logger = logging.getLogger(__name__)
+
+# Bump when the crop or encoding changes, so cached images are re-derived
+CROP_VERSION = 1
+
+# Rows copied at a time from a decoded image into its memory-mapped buffer
+DECODE_BAND_BYTES = 4 * 1024 * 1024
+
+
+@dataclass(frozen=True)
+class ImageVariant:
+    """A crop to an aspect ratio at a short side, encoded as JPEG"""
+    aspect_ratio: str
+    short_side: int
+    quality: int = 88
+
+    @property
+    def spec(self) -> str:
+        return f"crop-v{CROP_VERSION}:{self.aspect_ratio}:{self.short_side}:jpeg:q{self.quality}"
+
+    @property
+    def filename(self) -> str:
+        return f"{self.aspect_ratio.replace(':', 'x')}_{self.short_side}.jpg"
+
+
+@dataclass
+class RenderedImage:
+    data: bytes
+    width: int
+    height: int
+
+
+def crop_size(width: int, height: int, aspect_ratio: str) -> Tuple[float, float]:
+    """The largest window of the aspect ratio that fits in width x height"""
+    aspect_w, aspect_h = parse_aspect_ratio(aspect_ratio)
+    if width * aspect_h > height * aspect_w:
+        return height * aspect_w / aspect_h, float(height)
+    return float(width), width * aspect_h / aspect_w
+
+
+def _normalize(values: np.ndarray) -> np.ndarray:
+    span = values.max() - values.min()
+    return (values - values.min()) / span if span > 0 else np.zeros_like(values)
+
+
+def _box_blur(values: np.ndarray, radius: int) -> np.ndarray:
+    """Separable box blur through cumulative sums, for a 2-D or 3-D (H, W, C) array"""
+    size = 2 * radius + 1
+    for axis in (0, 1):
+        padded = np.pad(values, [(radius, radius) if a == axis else (0, 0) for a in range(values.ndim)], mode="edge")
+        summed = np.cumsum(padded, axis=axis, dtype=np.float32)
+        summed = np.concatenate([np.zeros_like(summed.take([0], axis=axis)), summed], axis=axis)
+        values = (summed.take(range(size, summed.shape[axis]), axis=axis)
+                  - summed.take(range(0, summed.shape[axis] - size), axis=axis)) / size
+    return values
+
+
+def saliency_map(rgb: np.ndarray) -> np.ndarray:
+    """
+    Per-pixel saliency of a small RGB image, in [0, 1].
+
+    Two cues: how far a pixel's (slightly blurred) colour is from the
+    image's mean colour in an opponent colour space, which picks out
+    subjects against plain backgrounds; and edge strength, which picks out
+    text and detail. Both are computed over whole arrays.
+    """
+    pixels = rgb.astype(np.float32) / 255.0
+    r, g, b = pixels[..., 0], pixels[..., 1], pixels[..., 2]
+    opponent = np.stack([(r + g + b) / 3, r - g, (r + g) / 2 - b], axis=-1)
+    blurred = _box_blur(opponent, 1)
+    contrast = np.linalg.norm(blurred - opponent.reshape(-1, 3).mean(axis=0), axis=-1)
+
+    luminance = opponent[..., 0]
+    gradient_y, gradient_x = np.gradient(luminance)
+    edges = _box_blur(np.hypot(gradient_x, gradient_y), 2)
+
+    return _normalize(_normalize(contrast) + 0.5 * _normalize(edges))
+
+
+def best_crop(saliency: np.ndarray, aspect_ratio: str) -> Tuple[float, float, float, float]:
+    """
+    The window of the aspect ratio holding the most saliency, as fractions (left, top, right, bottom).
+
+    The window spans the whole image along one axis, so only its offset
+    along the other needs choosing: every offset is scored at once from a
+    cumulative sum of the saliency profile. Near-ties go to the most
+    central offset.
+    """
+    height, width = saliency.shape
+    crop_w, crop_h = crop_size(width, height, aspect_ratio)
+    horizontal = crop_w < width - 0.5
+    profile = saliency.sum(axis=0 if horizontal else 1)
+    length = len(profile)
+    window = max(1, min(length, int(round(crop_w if horizontal else crop_h))))
+
+    cumulative = np.concatenate([[0.0], np.cumsum(profile)])
+    totals = cumulative[window:] - cumulative[:-window]
+    offsets = np.arange(len(totals))
+    centre = (length - window) / 2
+    # A 2% preference for the centre settles flat profiles without overriding content
+    scores = totals * (1 - 0.02 * np.abs(offsets - centre) / max(centre, 1))
+    offset = int(np.argmax(scores))
+
+    if horizontal:
+        return offset / length, 0.0, (offset + window) / length, 1.0
+    return 0.0, offset / length, 1.0, (offset + window) / length
+
+
+def place_crop(saliency: np.ndarray, width: int, height: int, aspect_ratio: str) -> Tuple[float, float, float, float]:
+    """
+    The best crop of the aspect ratio in a width x height image, as (x, y, crop width, crop height).
+
+    The window is chosen on the (smaller) saliency map, then sized exactly
+    at full resolution and centred where the map put it.
+    """
+    left, top, right, bottom = best_crop(saliency, aspect_ratio)
+    crop_w, crop_h = crop_size(width, height, aspect_ratio)
+    x = min(max(0.0, (left + right) / 2 * width - crop_w / 2), width - crop_w)
+    y = min(max(0.0, (top + bottom) / 2 * height - crop_h / 2), height - crop_h)
+    return x, y, crop_w, crop_h
+
+
+def render_image_variants(data: bytes, variants: Sequence[ImageVariant]) -> List[RenderedImage]:
+    """
+    Decode an image once and produce every variant from it.
+
+    JPEGs are decoded in draft mode at the smallest DCT scale that still
+    covers the largest output, so a 24 MP photo for 1080 px crops decodes
+    at a quarter or an eighth of the work. Variants are never upscaled.
+    """
+    with Image.open(io.BytesIO(data)) as source:
+        stored_w, stored_h = source.size
+        oriented = (stored_h, stored_w) if source.getexif().get(0x0112, 1) in (5, 6, 7, 8) else (stored_w, stored_h)
+
+        # Scale the decode only needs to reach for the largest output
+        scale = 0.0
+        for variant in variants:
+            crop_w, crop_h = crop_size(*oriented, variant.aspect_ratio)
+            scale = max(scale, min(1.0, variant.short_side / min(crop_w, crop_h)))
+        source.draft("RGB", (math.ceil(stored_w * scale), math.ceil(stored_h * scale)))
+
+        image = ImageOps.exif_transpose(source)
+        image = image.convert("RGB")
+
+    small = image.copy()
+    small.thumbnail((settings.IMAGE_SALIENCY_SIZE, settings.IMAGE_SALIENCY_SIZE), Image.BILINEAR)
+    saliency = saliency_map(np.asarray(small))
+
+    rendered = []
+    width, height = image.size
+    for variant in variants:
+        x, y, crop_w, crop_h = place_crop(saliency, width, height, variant.aspect_ratio)
+        output_scale = min(1.0, variant.short_side / min(crop_w, crop_h))
+        size = (max(1, round(crop_w * output_scale)), max(1, round(crop_h * output_scale)))
+
+        cropped = image.resize(size, Image.LANCZOS, box=(x, y, x + crop_w, y + crop_h), reducing_gap=2.0)
+        buffer = io.BytesIO()
+        cropped.save(buffer, "JPEG", quality=variant.quality, optimize=True, progressive=True)
+        rendered.append(RenderedImage(buffer.getvalue(), size[0], size[1]))
+    return rendered
+
+
+@dataclass(frozen=True)
+class ImageSet:
+    """
+    An ordered set of images cut from one source, e.g. a Weibo nine-grid.
+
+    From an image, "grid" splits one crop into rows x columns of tiles,
+    and "carousel" into slides side by side along the image's long side,
+    as many as fit (up to count). From a video, both are count keyframes.
+    """
+    layout: str
+    aspect_ratio: str  # Of each image in the set
+    count: int
+    short_side: int
+    quality: int = 88
+
+    @property
+    def spec(self) -> str:
+        return f"set-v{CROP_VERSION}:{self.layout}:{self.aspect_ratio}:{self.count}:{self.short_side}:jpeg:q{self.quality}"
+
+    def tile_spec(self, index: int) -> str:
+        return f"{self.spec}:{index}"
+
+    def filename(self, index: int) -> str:
+        return f"{self.layout}_{self.aspect_ratio.replace(':', 'x')}_{index + 1}.jpg"
+
+
+# Platforms that post a set of images per post: layout and aspect ratio of each image
+IMAGE_SET_LAYOUTS: Dict[Platform, Tuple[str, str]] = {
+    Platform.WEIBO: ("grid", "1:1"),  # 九宫格
+    Platform.XIAOHONGSHU: ("carousel", "3:4"),
+}
+
+
+def platform_image_set(platform: Platform) -> Optional[ImageSet]:
+    if platform not in IMAGE_SET_LAYOUTS:
+        return None
+    layout, aspect_ratio = IMAGE_SET_LAYOUTS[platform]
+    count = 9 if layout == "grid" else settings.CAROUSEL_MAX_SLIDES
+    return ImageSet(layout, aspect_ratio, count, settings.IMAGE_SHORT_SIDE)
+
+
+def set_shape(width: int, height: int, image_set: ImageSet) -> Tuple[int, int]:
+    """(rows, columns) of tiles the set cuts a width x height image into"""
+    if image_set.layout == "grid":
+        side = max(1, math.isqrt(image_set.count))
+        return side, side
+    aspect_w, aspect_h = parse_aspect_ratio(image_set.aspect_ratio)
+    # Slides run along the long side; a panorama becomes a swipe through it
+    if width * aspect_h >= height * aspect_w:
+        return 1, max(1, min(image_set.count, round(width * aspect_h / (height * aspect_w))))
+    return max(1, min(image_set.count, round(height * aspect_w / (width * aspect_h)))), 1
+
+
+def _saliency_of(pixels: np.ndarray) -> np.ndarray:
+    """Saliency of a decoded image, computed on a strided view instead of a resized copy"""
+    step = max(1, math.ceil(max(pixels.shape[:2]) / settings.IMAGE_SALIENCY_SIZE))
+    return saliency_map(pixels[::step, ::step])
+
+
+def cut_tiles(pixels: np.ndarray, image_set: ImageSet) -> List[np.ndarray]:
+    """Slices of one decoded image for each tile of the set, in reading order; nothing is copied"""
+    height, width = pixels.shape[:2]
+    rows, columns = set_shape(width, height, image_set)
+    aspect_w, aspect_h = parse_aspect_ratio(image_set.aspect_ratio)
+    x, y, crop_w, crop_h = place_crop(
+        _saliency_of(pixels), width, height, f"{columns * aspect_w}:{rows * aspect_h}"
+    )
+    # Shared integer edges, so neighbouring tiles meet without a gap or overlap
+    xs = np.round(x + np.arange(columns + 1) * crop_w / columns).astype(int)
+    ys = np.round(y + np.arange(rows + 1) * crop_h / rows).astype(int)
+    return [
+        pixels[ys[row]:ys[row + 1], xs[column]:xs[column + 1]]
+        for row in range(rows)
+        for column in range(columns)
+    ]
+
+
+def crop_frame(frame: np.ndarray, aspect_ratio: str) -> np.ndarray:
+    """Slice of a decoded frame holding its best crop of the aspect ratio"""
+    height, width = frame.shape[:2]
+    x, y, crop_w, crop_h = place_crop(_saliency_of(frame), width, height, aspect_ratio)
+    left, top = int(round(x)), int(round(y))
+    return frame[top:top + int(round(crop_h)), left:left + int(round(crop_w))]
+
+
+def encode_tile(pixels: np.ndarray, short_side: int, quality: int) -> RenderedImage:
+    """JPEG of a tile, scaled down to short_side (never up)"""
+    tile = Image.fromarray(np.ascontiguousarray(pixels))
+    scale = min(1.0, short_side / min(tile.size))
+    if scale < 1.0:
+        tile = tile.resize(
+            (max(1, round(tile.width * scale)), max(1, round(tile.height * scale))),
+            Image.LANCZOS, reducing_gap=2.0
+        )
+    buffer = io.BytesIO()
+    tile.save(buffer, "JPEG", quality=quality, optimize=True, progressive=True)
+    return RenderedImage(buffer.getvalue(), tile.width, tile.height)
+
+
+def decode_image_buffer(data: bytes, path: str, image_sets: Sequence[ImageSet]) -> np.ndarray:
+    """
+    Decode an image once into a memory-mapped (height, width, 3) array at path.
+
+    Like render_image_variants, JPEGs are drafted down to the scale the
+    smallest tile of any set still needs.
+    """
+    with Image.open(io.BytesIO(data)) as source:
+        stored_w, stored_h = source.size
+        oriented = (stored_h, stored_w) if source.getexif().get(0x0112, 1) in (5, 6, 7, 8) else (stored_w, stored_h)
+
+        scale = 0.0
+        for image_set in image_sets:
+            rows, columns = set_shape(*oriented, image_set)
+            aspect_w, aspect_h = parse_aspect_ratio(image_set.aspect_ratio)
+            crop_w, crop_h = crop_size(*oriented, f"{columns * aspect_w}:{rows * aspect_h}")
+            scale = max(scale, min(1.0, image_set.short_side / min(crop_w / columns, crop_h / rows)))
+        source.draft("RGB", (math.ceil(stored_w * scale), math.ceil(stored_h * scale)))
+
+        # Neither call copies the decoded image unless it has to convert or rotate it
+        image = source.convert("RGB") if source.mode != "RGB" else source
+        ImageOps.exif_transpose(image, in_place=True)
+
+        # Copied over in row bands, so only the decoded image is ever held in full;
+        # once it's freed the pixels live in page cache the kernel can evict
+        pixels = np.memmap(path, dtype=np.uint8, mode="w+", shape=(image.height, image.width, 3))
+        band = max(1, DECODE_BAND_BYTES // (image.width * 3))
+        for top in range(0, image.height, band):
+            bottom = min(top + band, image.height)
+            pixels[top:bottom] = np.asarray(image.crop((0, top, image.width, bottom)))
+    return pixels
+
+
+def decode_frame_buffer(source: str, info: MediaInfo, timestamps: List[float], path: str) -> np.ndarray:
+    """Decode the frames at timestamps into a memory-mapped (N, height, width, 3) array at path"""
+    scale = min(1.0, settings.IMAGE_SHORT_SIDE / min(info.width, info.height))
+    width, height = max(2, round(info.width * scale)), max(2, round(info.height * scale))
+    frames = np.memmap(path, dtype=np.uint8, mode="w+", shape=(len(timestamps), height, width, 3))
+    decode_frames(source, timestamps, frames)
+    return frames
+
+
+class ImageService:
+    """
+    Derives platform crops, thumbnails and image sets from images and video frames.
+
+    Derived images are stored once per (source hash, variant spec) in
+    derived_images; a repeat request for the same crop of the same source
+    is one query. Missing variants of a source are rendered from a single
+    decode and uploaded concurrently.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.decodes = 0
+        self.tiles = 0
+
+    async def _stored(self, source_hash: str, specs: Sequence[str]) -> Dict[str, str]:
+        """URLs of the specs already derived from the source"""
+        async with read_only_session_maker() as db:
+            result = await db.execute(
+                select(DerivedImage.spec, DerivedImage.url).where(
+                    DerivedImage.source_hash == source_hash,
+                    DerivedImage.spec.in_(list(specs))
+                )
+            )
+            return dict(result.all())
+
+    async def _store(
+        self,
+        source_hash: str,
+        user_id: int,
+        images: Sequence[Tuple[str, str, RenderedImage]]
+    ) -> List[str]:
+        """
+        Upload (spec, filename, image) triples concurrently and record them; returns their URLs.
+
+        A concurrent request deriving the same spec may record it first; its
+        URL is returned instead and this request's upload is deleted, so no
+        file is left behind without a row.
+        """
+        uploaded = await asyncio.gather(*(
+            storage_service.upload_file(user_id, image.data, filename, "image/jpeg", folder="derived")
+            for _, filename, image in images
+        ))
+        urls = {spec: url for (spec, _, _), url in zip(images, uploaded)}
+        async with unit_of_work() as db:
+            result = await db.execute(
+                pg_insert(DerivedImage)
+                .values([
+                    {
+                        "source_hash": source_hash,
+                        "spec": spec,
+                        "url": url,
+                        "width": image.width,
+                        "height": image.height,
+                        "size": len(image.data)
+                    }
+                    for (spec, _, image), url in zip(images, uploaded)
+                ])
+                .on_conflict_do_nothing(index_elements=[DerivedImage.source_hash, DerivedImage.spec])
+                .returning(DerivedImage.spec)
+            )
+            recorded = set(result.scalars().all())
+            lost = [spec for spec in urls if spec not in recorded]
+            winners: Dict[str, str] = {}
+            if lost:
+                # The conflicting rows are committed by now: the insert waited for their transaction
+                result = await db.execute(
+                    select(DerivedImage.spec, DerivedImage.url).where(
+                        DerivedImage.source_hash == source_hash,
+                        DerivedImage.spec.in_(lost)
+                    )
+                )
+                winners = dict(result.all())
+
+        if winners:
+            await asyncio.gather(*(
+                storage_service.delete_file(file_key)
+                for spec in winners
+                if (file_key := storage_service.file_key_from_url(urls[spec])) is not None
+            ))
+            urls.update(winners)
+        return [urls[spec] for spec, _, _ in images]
+
+    async def derive(
+        self,
+        source_hash: str,
+        variants: Sequence[ImageVariant],
+        load_source: Callable[[], Awaitable[bytes]],
+        user_id: int
+    ) -> Dict[ImageVariant, str]:
+        """URLs of the variants of a source, rendering the ones not derived before"""
+        variants = list(dict.fromkeys(variants))
+        stored = await self._stored(source_hash, [variant.spec for variant in variants])
+        urls = {variant: stored[variant.spec] for variant in variants if variant.spec in stored}
+        self.hits += len(urls)
+
+        missing = [variant for variant in variants if variant not in urls]
+        if not missing:
+            return urls
+        self.misses += len(missing)
+
+        data = await load_source()
+        loop = asyncio.get_running_loop()
+        try:
+            rendered = await loop.run_in_executor(None, render_image_variants, data, missing)
+        except (OSError, Image.DecompressionBombError) as e:
+            raise MediaError(f"Unreadable image: {e}") from e
+        self.decodes += 1
+
+        uploaded = await self._store(
+            source_hash, user_id,
+            [(variant.spec, variant.filename, image) for variant, image in zip(missing, rendered)]
+        )
+        urls.update(zip(missing, uploaded))
+        return urls
+
+    async def _image_source(self, content: Content) -> Tuple[str, Callable[[], Awaitable[bytes]]]:
+        """Hash of an image content's file, and a loader for its bytes that reads it at most once"""
+        cached_data: Dict[str, bytes] = {}
+        source_hash = content.file_hash
+        if not source_hash:
+            cached_data["data"] = await storage_service.read_file(content.original_file_url)
+            source_hash = hashlib.sha256(cached_data["data"]).hexdigest()
+
+        async def load_source() -> bytes:
+            if "data" not in cached_data:
+                cached_data["data"] = await storage_service.read_file(content.original_file_url)
+            return cached_data["data"]
+
+        return source_hash, load_source
+
+    async def platform_images(
+        self,
+        content: Content,
+        platforms: Sequence[Platform],
+        at_seconds: Optional[float] = None
+    ) -> Dict[Platform, Dict[str, str]]:
+        """
+        {"image", "thumbnail"} URLs per platform, cropped to the platform's aspect ratio.
+
+        The source is the content's image, or for video a frame at
+        at_seconds: by default the keyframe of the video's longest scene,
+        or a tenth of the way in (past most intros) if it wasn't scanned yet.
+        """
+        platforms = list(dict.fromkeys(platforms))
+        variants = {
+            platform: (
+                ImageVariant(PLATFORM_CONFIGS[platform].aspect_ratio, settings.IMAGE_SHORT_SIDE),
+                ImageVariant(PLATFORM_CONFIGS[platform].aspect_ratio, settings.THUMBNAIL_SHORT_SIDE)
+            )
+            for platform in platforms
+        }
+        all_variants = [variant for pair in variants.values() for variant in pair]
+
+        if content.content_type == ContentType.IMAGE:
+            source_hash, load_source = await self._image_source(content)
+        else:
+            source = await storage_service.get_readable_source(content.original_file_url)
+            if source is None:
+                raise MediaError("Original file is not readable")
+            if at_seconds is None:
+                # Only scenes found before: a request must not scan the whole video
+                scenes = await scene_service.stored_scenes(content)
+                at_seconds = thumbnail_time(scenes.scenes) if scenes is not None else None
+            if at_seconds is None:
+                at_seconds = (content.duration_seconds or 0) / 10
+            frame_of = content.file_hash or content.original_file_url
+            source_hash = hashlib.sha256(f"{frame_of}@{at_seconds:.3f}".encode("utf-8")).hexdigest()
+
+            async def load_source() -> bytes:
+                return await asyncio.get_running_loop().run_in_executor(None, extract_frame, source, at_seconds)
+
+        urls = await self.derive(source_hash, all_variants, load_source, content.user_id)
+        return {
+            platform: {"image": urls[image], "thumbnail": urls[thumbnail]}
+            for platform, (image, thumbnail) in variants.items()
+        }
+
+    async def image_sets(
+        self,
+        content: Content,
+        platforms: Sequence[Platform],
+        scenes: Optional[VideoScenes] = None
+    ) -> Dict[Platform, List[str]]:
+        """
+        Ordered image URLs per platform that posts image sets (Weibo grids, Xiaohongshu carousels).
+
+        The source is decoded once into a memory-mapped buffer: an image,
+        or for video every frame any set needs. Tiles are slices of that
+        buffer, encoded concurrently; nothing is decoded per tile. A set
+        derived before is looked up, not cut again. A video's frames come
+        from scenes, or its stored scenes when not given.
+        """
+        sets = {
+            platform: image_set
+            for platform in dict.fromkeys(platforms)
+            if (image_set := platform_image_set(platform)) is not None
+        }
+        if not sets:
+            return {}
+
+        if content.content_type == ContentType.IMAGE:
+            source_hash, load_source = await self._image_source(content)
+        else:
+            frames_of = content.file_hash or content.original_file_url
+            source_hash = hashlib.sha256(f"{frames_of}@keyframes".encode("utf-8")).hexdigest()
+
+        distinct = list(dict.fromkeys(sets.values()))
+        # A set's tiles are inserted together, so a set is either all there or missing
+        stored = await self._stored_sets(source_hash, distinct)
+        urls = {image_set: tiles for image_set, tiles in stored.items() if tiles}
+        missing = [image_set for image_set in distinct if image_set not in urls]
+        self.hits += len(urls)
+
+        if missing:
+            self.misses += len(missing)
+            loop = asyncio.get_running_loop()
+            work_dir = tempfile.mkdtemp(prefix="crosspilot_sets_")
+            try:
+                if content.content_type == ContentType.IMAGE:
+                    data = await load_source()
+                    try:
+                        pixels = await loop.run_in_executor(
+                            None, decode_image_buffer, data, os.path.join(work_dir, "image.rgb"), missing
+                        )
+                    except (OSError, Image.DecompressionBombError) as e:
+                        raise MediaError(f"Unreadable image: {e}") from e
+                    tiles = {image_set: cut_tiles(pixels, image_set) for image_set in missing}
+                else:
+                    tiles = await self._cut_frames(content, missing, os.path.join(work_dir, "frames.rgb"), scenes)
+                self.decodes += 1
+
+                encoded = await asyncio.gather(*(
+                    loop.run_in_executor(None, encode_tile, tile, image_set.short_side, image_set.quality)
+                    for image_set in missing
+                    for tile in tiles[image_set]
+                ))
+            finally:
+                shutil.rmtree(work_dir, ignore_errors=True)
+
+            entries = []
+            position = 0
+            for image_set in missing:
+                for index in range(len(tiles[image_set])):
+                    entries.append((image_set.tile_spec(index), image_set.filename(index), encoded[position]))
+                    position += 1
+            self.tiles += len(entries)
+            uploaded = iter(await self._store(source_hash, content.user_id, entries))
+            for image_set in missing:
+                urls[image_set] = [next(uploaded) for _ in tiles[image_set]]
+
+        return {platform: urls[image_set] for platform, image_set in sets.items()}
+
+    async def _stored_sets(self, source_hash: str, image_sets: Sequence[ImageSet]) -> Dict[ImageSet, List[str]]:
+        """Tile URLs of sets derived before, in order"""
+        async with read_only_session_maker() as db:
+            result = await db.execute(
+                select(DerivedImage.spec, DerivedImage.url).where(
+                    DerivedImage.source_hash == source_hash,
+                    or_(*(DerivedImage.spec.startswith(f"{image_set.spec}:") for image_set in image_sets))
+                )
+            )
+            rows = result.all()
+        urls = {}
+        for image_set in image_sets:
+            prefix = f"{image_set.spec}:"
+            tiles = sorted(
+                (int(spec[len(prefix):]), url) for spec, url in rows if spec.startswith(prefix)
+            )
+            urls[image_set] = [url for _, url in tiles]
+        return urls
+
+    async def _cut_frames(
+        self,
+        content: Content,
+        image_sets: Sequence[ImageSet],
+        path: str,
+        scenes: Optional[VideoScenes]
+    ) -> Dict[ImageSet, List[np.ndarray]]:
+        """
+        Decode every frame the sets need once, then crop each set's frames from the buffer.
+
+        A set's frames are the keyframes of the video's longest scenes, in
+        time order, topped up with evenly spread frames for short videos.
+        """
+        source = await storage_service.get_readable_source(content.original_file_url)
+        if source is None:
+            raise MediaError("Original file is not readable")
+        loop = asyncio.get_running_loop()
+        info = await loop.run_in_executor(None, probe_media, source)
+        if not info.width:
+            raise MediaError("Source has no video stream")
+        duration = info.duration or content.duration_seconds or 0
+        if scenes is None:
+            scenes = await scene_service.stored_scenes(content)
+        scene_list = scenes.scenes if scenes is not None else []
+
+        timestamps = {image_set: keyframe_times(scene_list, image_set.count, duration) for image_set in image_sets}
+        # Sets asking for the same moment share its decoded frame
+        unique = list(dict.fromkeys(t for times in timestamps.values() for t in times))
+        frames = await loop.run_in_executor(None, decode_frame_buffer, source, info, unique, path)
+        index = {t: i for i, t in enumerate(unique)}
+
+        def crop_all() -> Dict[ImageSet, List[np.ndarray]]:
+            return {
+                image_set: [crop_frame(frames[index[t]], image_set.aspect_ratio) for t in times]
+                for image_set, times in timestamps.items()
+            }
+
+        return await loop.run_in_executor(None, crop_all)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"hits": self.hits, "misses": self.misses, "decodes": self.decodes, "tiles": self.tiles}
+
+
+image_service = ImageService()
@@ -0,0 +1,259 @@
+"""
+Redis-backed job queue with retries, visibility timeouts and a dead-letter list
+"""
+import json
+import random
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+from redis import asyncio as aioredis
+
+from ..core.config import settings
+from ..core.redis import get_redis
+
+# Each move between states is one script, so no crash can leave a job on none of them
+
+# Due retries go back to the ready list
+_PROMOTE_DELAYED_SCRIPT = """
+local due = redis.call("zrangebyscore", KEYS[1], "-inf", ARGV[1])
+for _, job_id in ipairs(due) do
+    redis.call("zrem", KEYS[1], job_id)
+    redis.call("lpush", KEYS[2], job_id)
+end
+return #due
+"""
+
+# Claimed jobs whose worker died before scoring them get a deadline, so they expire like any other
+_ADOPT_CLAIMED_SCRIPT = """
+local claimed = redis.call("lrange", KEYS[1], 0, -1)
+for _, job_id in ipairs(claimed) do
+    redis.call("zadd", KEYS[2], "NX", ARGV[1], job_id)
+end
+return #claimed
+"""
+
+# An expired in-flight job is failed by exactly one caller, and only if its deadline wasn't extended
+_EXPIRE_SCRIPT = """
+local deadline = redis.call("zscore", KEYS[1], ARGV[1])
+if not deadline or tonumber(deadline) > tonumber(ARGV[2]) then
+    return 0
+end
+redis.call("zrem", KEYS[1], ARGV[1])
+redis.call("lrem", KEYS[2], 1, ARGV[1])
+redis.call("hset", KEYS[3], ARGV[1], ARGV[3])
+if ARGV[4] == "" then
+    redis.call("lpush", KEYS[5], ARGV[1])
+else
+    redis.call("zadd", KEYS[4], ARGV[4], ARGV[1])
+end
+return 1
+"""
+
+# A dead job goes back to the ready list with the record reset by the caller
+_REQUEUE_DEAD_SCRIPT = """
+if redis.call("lrem", KEYS[1], 1, ARGV[1]) == 0 then
+    return 0
+end
+redis.call("hset", KEYS[2], ARGV[1], ARGV[2])
+redis.call("lpush", KEYS[3], ARGV[1])
+return 1
+"""
+
+
+class JobQueue:
+    """
+    Reliable job queue on plain Redis data structures.
+
+    - ready:    list of job ids waiting for a worker
+    - jobs:     hash of job id -> JSON job record
+    - claimed:  list of job ids taken by a worker (BLMOVE from ready)
+    - inflight: sorted set of claimed job ids scored by visibility deadline
+    - delayed:  sorted set of failed job ids scored by next retry time
+    - dead:     list of job ids that exhausted their attempts
+
+    A claimed job that is neither acked nor failed before its deadline is
+    redelivered, so a crashed worker never loses work. Every move between
+    states is a single atomic command, transaction or script; a job a
+    worker claimed but died before scoring is adopted from the claimed
+    list and given a deadline.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        redis: Optional[aioredis.Redis] = None,
+        visibility_timeout: int = 300,
+        max_attempts: int = 3,
+        backoff_base: float = 5.0,
+        backoff_max: float = 300.0
+    ):
+        self.name = name
+        self._redis = redis
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        prefix = f"queue:{name}"
+        self.ready_key = f"{prefix}:ready"
+        self.claimed_key = f"{prefix}:claimed"
+        self.jobs_key = f"{prefix}:jobs"
+        self.inflight_key = f"{prefix}:inflight"
+        self.delayed_key = f"{prefix}:delayed"
+        self.dead_key = f"{prefix}:dead"
+
+    @property
+    def redis(self) -> aioredis.Redis:
+        return self._redis or get_redis()
+
+    async def enqueue(
+        self,
+        job_type: str,
+        payload: Dict[str, Any],
+        max_attempts: Optional[int] = None
+    ) -> str:
+        """Add a job and return its id"""
+        job = {
+            "id": uuid.uuid4().hex,
+            "type": job_type,
+            "payload": payload,
+            "attempts": 0,
+            "max_attempts": max_attempts or self.max_attempts,
+            "enqueued_at": time.time(),
+            "last_error": None
+        }
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(self.jobs_key, job["id"], json.dumps(job))
+            pipe.lpush(self.ready_key, job["id"])
+            await pipe.execute()
+        return job["id"]
+
+    async def claim(self, timeout: int = 5) -> Optional[Dict[str, Any]]:
+        """Block up to timeout seconds for the next job and mark it in flight"""
+        await self.promote_due()
+
+        # The move is atomic: the job is on the ready or the claimed list, never neither
+        job_id = await self.redis.blmove(self.ready_key, self.claimed_key, timeout, "RIGHT", "LEFT")
+        if job_id is None:
+            return None
+
+        await self.redis.zadd(self.inflight_key, {job_id: time.time() + self.visibility_timeout})
+        raw = await self.redis.hget(self.jobs_key, job_id)
+        if raw is None:
+            # Job record was removed (e.g. purged); nothing to run
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.zrem(self.inflight_key, job_id)
+                pipe.lrem(self.claimed_key, 1, job_id)
+                await pipe.execute()
+            return None
+        return json.loads(raw)
+
+    async def extend(self, job_id: str, seconds: Optional[int] = None) -> None:
+        """Push back the visibility deadline of a job that is still running"""
+        deadline = time.time() + (seconds or self.visibility_timeout)
+        await self.redis.zadd(self.inflight_key, {job_id: deadline}, xx=True)
+
+    async def ack(self, job_id: str) -> None:
+        """Mark a job as done"""
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.zrem(self.inflight_key, job_id)
+            pipe.lrem(self.claimed_key, 1, job_id)
+            pipe.hdel(self.jobs_key, job_id)
+            await pipe.execute()
+
+    async def fail(self, job: Dict[str, Any], error: str) -> bool:
+        """
+        Record a failed attempt.
+
+        Returns True if the job was scheduled for retry, False if it was
+        moved to the dead-letter list.
+        """
+        retry_at = self._record_failure(job, error)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.zrem(self.inflight_key, job["id"])
+            pipe.lrem(self.claimed_key, 1, job["id"])
+            pipe.hset(self.jobs_key, job["id"], json.dumps(job))
+            if retry_at is None:
+                pipe.lpush(self.dead_key, job["id"])
+            else:
+                pipe.zadd(self.delayed_key, {job["id"]: retry_at})
+            await pipe.execute()
+        return retry_at is not None
+
+    def _record_failure(self, job: Dict[str, Any], error: str) -> Optional[float]:
+        """Count a failed attempt on the job record; returns when to retry, or None when it's dead"""
+        job["attempts"] += 1
+        job["last_error"] = error
+        if job["attempts"] >= job["max_attempts"]:
+            return None
+        return time.time() + self._backoff(job["attempts"])
+
+    def _backoff(self, attempts: int) -> float:
+        """Exponential backoff with full jitter"""
+        delay = min(self.backoff_max, self.backoff_base * (2 ** (attempts - 1)))
+        return random.uniform(delay / 2, delay)
+
+    async def promote_due(self) -> None:
+        """Move due retries and expired in-flight jobs back to the ready list"""
+        now = time.time()
+        await self.redis.eval(_PROMOTE_DELAYED_SCRIPT, 2, self.delayed_key, self.ready_key, now)
+        await self.redis.eval(
+            _ADOPT_CLAIMED_SCRIPT, 2, self.claimed_key, self.inflight_key, now + self.visibility_timeout
+        )
+
+        for job_id in await self.redis.zrangebyscore(self.inflight_key, "-inf", now):
+            raw = await self.redis.hget(self.jobs_key, job_id)
+            if raw is None:
+                async with self.redis.pipeline(transaction=True) as pipe:
+                    pipe.zrem(self.inflight_key, job_id)
+                    pipe.lrem(self.claimed_key, 1, job_id)
+                    await pipe.execute()
+                continue
+            job = json.loads(raw)
+            retry_at = self._record_failure(job, "Visibility timeout expired")
+            # The job leaves flight and lands in delayed or dead in one step
+            await self.redis.eval(
+                _EXPIRE_SCRIPT, 5,
+                self.inflight_key, self.claimed_key, self.jobs_key, self.delayed_key, self.dead_key,
+                job_id, now, json.dumps(job), "" if retry_at is None else retry_at
+            )
+
+    async def dead_letters(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Return jobs in the dead-letter list, newest first"""
+        job_ids = await self.redis.lrange(self.dead_key, 0, limit - 1)
+        if not job_ids:
+            return []
+        records = await self.redis.hmget(self.jobs_key, job_ids)
+        return [json.loads(raw) for raw in records if raw]
+
+    async def requeue_dead(self, job_id: str) -> bool:
+        """Give a dead-lettered job a fresh set of attempts"""
+        raw = await self.redis.hget(self.jobs_key, job_id)
+        if raw is None:
+            return False
+        job = json.loads(raw)
+        job["attempts"] = 0
+        requeued = await self.redis.eval(
+            _REQUEUE_DEAD_SCRIPT, 3, self.dead_key, self.jobs_key, self.ready_key, job_id, json.dumps(job)
+        )
+        return bool(requeued)
+
+    async def stats(self) -> Dict[str, int]:
+        """Queue depth per state"""
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.llen(self.ready_key)
+            pipe.zcard(self.inflight_key)
+            pipe.zcard(self.delayed_key)
+            pipe.llen(self.dead_key)
+            ready, inflight, delayed, dead = await pipe.execute()
+        return {"ready": ready, "inflight": inflight, "delayed": delayed, "dead": dead}
+
+
+# Create singleton instance
+job_queue = JobQueue(
+    name=settings.JOB_QUEUE_NAME,
+    visibility_timeout=settings.JOB_VISIBILITY_TIMEOUT_SECONDS,
+    max_attempts=settings.JOB_MAX_ATTEMPTS,
+    backoff_base=settings.JOB_RETRY_BACKOFF_SECONDS,
+    backoff_max=settings.JOB_RETRY_BACKOFF_MAX_SECONDS
+)
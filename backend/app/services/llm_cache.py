@@ -0,0 +1,99 @@
+"""
+Response cache for LLM calls
+"""
+import hashlib
+import json
+import logging
+from collections import defaultdict
+from typing import Any, Dict, Optional
+from redis.exceptions import RedisError
+
+from ..core.cache import CacheBackend, MemoryCacheBackend, RedisCacheBackend
+from ..core.config import settings
+from ..core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+class LLMCache:
+    """Cache of raw model responses keyed by a normalized request hash"""
+
+    def __init__(self, backend: CacheBackend, ttls: Dict[str, int], default_ttl: int = 3600):
+        self.backend = backend
+        self.ttls = ttls
+        self.default_ttl = default_ttl
+        self.hits: Dict[str, int] = defaultdict(int)
+        self.misses: Dict[str, int] = defaultdict(int)
+        self.errors = 0
+
+    def make_key(
+        self,
+        method: str,
+        model: str,
+        prompt: str,
+        platform: Optional[str] = None,
+        preserve_style: Optional[bool] = None
+    ) -> str:
+        """Hash the request; whitespace is collapsed so prompt indentation doesn't matter"""
+        normalized_prompt = " ".join(prompt.split())
+        payload = json.dumps(
+            [method, model, normalized_prompt, platform, preserve_style],
+            ensure_ascii=False
+        )
+        return f"{method}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+    async def get(self, method: str, key: str) -> Optional[str]:
+        """Return the cached response, or None on a miss"""
+        try:
+            value = await self.backend.get(key)
+        except RedisError as e:
+            # A cache outage should never fail the request
+            self.errors += 1
+            logger.warning("LLM cache read failed: %s", e)
+            value = None
+
+        if value is None:
+            self.misses[method] += 1
+        else:
+            self.hits[method] += 1
+        return value
+
+    async def set(self, method: str, key: str, value: str) -> None:
+        """Store a response using the TTL configured for its method"""
+        ttl = self.ttls.get(method, self.default_ttl)
+        if ttl <= 0:
+            return
+        try:
+            await self.backend.set(key, value, ttl)
+        except RedisError as e:
+            self.errors += 1
+            logger.warning("LLM cache write failed: %s", e)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters per method"""
+        methods = sorted(set(self.hits) | set(self.misses))
+        return {
+            "backend": self.backend.__class__.__name__,
+            "errors": self.errors,
+            "methods": {
+                method: {"hits": self.hits[method], "misses": self.misses[method]}
+                for method in methods
+            }
+        }
+
+
+def create_llm_cache() -> Optional[LLMCache]:
+    """Build the LLM cache from settings"""
+    if not settings.LLM_CACHE_ENABLED:
+        return None
+
+    if settings.LLM_CACHE_BACKEND == "redis":
+        backend = RedisCacheBackend(
+            get_redis(),
+            prefix="llm-cache",
+            max_entries=settings.LLM_CACHE_MAX_ENTRIES
+        )
+    else:
+        backend = MemoryCacheBackend(max_entries=settings.LLM_CACHE_MAX_ENTRIES)
+
+    return LLMCache(backend, ttls=settings.LLM_CACHE_TTLS, default_ttl=settings.LLM_CACHE_DEFAULT_TTL)
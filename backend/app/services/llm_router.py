@@ -0,0 +1,580 @@
+"""
+LLM providers with health-aware routing, circuit breakers and hedged requests
+"""
+import asyncio
+import logging
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+import anthropic
+import httpx
+import openai
+from openai import AsyncOpenAI
+
+from ..core.config import settings
+from ..utils.text import estimate_tokens
+from .ai_governor import create_provider_governor, is_rate_limited, retry_after_seconds
+
+logger = logging.getLogger(__name__)
+
+# Statuses that say the provider is misconfigured (key, access, model name), not the request
+PROVIDER_ERROR_STATUSES = (401, 403, 404)
+
+# Failures in reaching a provider at all; anything else without a status code is our own bug
+TRANSIENT_ERRORS = (
+    asyncio.TimeoutError,
+    ConnectionError,
+    httpx.TimeoutException,
+    httpx.TransportError,
+    openai.APIConnectionError,
+    anthropic.APIConnectionError,
+)
+
+
+class LLMUnavailableError(Exception):
+    """Raised when no provider could serve a request"""
+    pass
+
+
+class LLMRateLimitedError(LLMUnavailableError):
+    """Raised when every provider rejected the request with a rate limit"""
+    pass
+
+
+@dataclass
+class LLMCompletion:
+    """A provider's reply and the tokens it was billed for, if reported"""
+    text: str
+    total_tokens: Optional[int] = None
+
+
+class LLMProvider(ABC):
+    """A chat model behind an async client"""
+
+    name = "provider"
+
+    def __init__(self, model: str):
+        self.model = model
+        self.health = HealthWindow(settings.LLM_HEALTH_WINDOW)
+        self.breaker = CircuitBreaker(
+            failure_threshold=settings.LLM_BREAKER_FAILURE_THRESHOLD,
+            cooldown_seconds=settings.LLM_BREAKER_COOLDOWN_SECONDS
+        )
+        self.governor = create_provider_governor(self.name)
+
+    @abstractmethod
+    async def complete(self, system_prompt: str, prompt: str, json_mode: bool = True) -> LLMCompletion:
+        ...
+
+    @abstractmethod
+    def stream(self, system_prompt: str, prompt: str, json_mode: bool = True) -> AsyncIterator[str]:
+        """Yield the reply's text as the model produces it"""
+        ...
+
+    @staticmethod
+    def is_retryable(error: BaseException) -> bool:
+        """Whether another provider might succeed where this one failed"""
+        if isinstance(error, TRANSIENT_ERRORS):
+            return True
+        status_code = getattr(error, "status_code", None)
+        if status_code is None:
+            return False
+        # Malformed requests (400, 422) fail everywhere; rate limits, server
+        # errors and this provider's own configuration don't
+        return status_code in (408, 409, 429) or status_code in PROVIDER_ERROR_STATUSES or status_code >= 500
+
+    @staticmethod
+    def is_misconfigured(error: BaseException) -> bool:
+        """Whether the provider rejected the call over its own setup: a bad key, no access, an unknown model"""
+        return getattr(error, "status_code", None) in PROVIDER_ERROR_STATUSES
+
+
+class OpenAIProvider(LLMProvider):
+    """OpenAI chat completions"""
+
+    name = "openai"
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str,
+        base_url: Optional[str] = None,
+        http_client: Optional[httpx.AsyncClient] = None
+    ):
+        super().__init__(model)
+        self.client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url or None,
+            timeout=settings.LLM_REQUEST_TIMEOUT_SECONDS,
+            max_retries=settings.LLM_CLIENT_MAX_RETRIES,
+            http_client=http_client
+        )
+
+    async def complete(self, system_prompt: str, prompt: str, json_mode: bool = True) -> LLMCompletion:
+        request = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt}
+            ]
+        }
+        if json_mode:
+            request["response_format"] = {"type": "json_object"}
+        response = await self.client.chat.completions.create(**request)
+        usage = response.usage
+        return LLMCompletion(
+            text=response.choices[0].message.content,
+            total_tokens=usage.total_tokens if usage else None
+        )
+
+    async def stream(self, system_prompt: str, prompt: str, json_mode: bool = True) -> AsyncIterator[str]:
+        request = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt}
+            ],
+            "stream": True
+        }
+        if json_mode:
+            request["response_format"] = {"type": "json_object"}
+        response = await self.client.chat.completions.create(**request)
+        try:
+            async for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            await response.response.aclose()
+
+
+class AnthropicProvider(LLMProvider):
+    """Anthropic messages API"""
+
+    name = "anthropic"
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str,
+        base_url: Optional[str] = None,
+        http_client: Optional[httpx.AsyncClient] = None
+    ):
+        super().__init__(model)
+        self.client = anthropic.AsyncAnthropic(
+            api_key=api_key,
+            base_url=base_url or None,
+            timeout=settings.LLM_REQUEST_TIMEOUT_SECONDS,
+            max_retries=settings.LLM_CLIENT_MAX_RETRIES,
+            http_client=http_client
+        )
+
+    def _request(self, system_prompt: str, prompt: str, json_mode: bool) -> Dict[str, Any]:
+        messages = [{"role": "user", "content": prompt}]
+        if json_mode:
+            # No JSON mode here; prefilling the opening brace keeps the reply a bare object
+            system_prompt = f"{system_prompt}\n只输出JSON对象，不要输出其他内容。"
+            messages.append({"role": "assistant", "content": "{"})
+        return {
+            "model": self.model,
+            "max_tokens": settings.LLM_MAX_OUTPUT_TOKENS,
+            "system": system_prompt,
+            "messages": messages
+        }
+
+    async def complete(self, system_prompt: str, prompt: str, json_mode: bool = True) -> LLMCompletion:
+        response = await self.client.messages.create(**self._request(system_prompt, prompt, json_mode))
+        text = "".join(block.text for block in response.content if block.type == "text")
+        usage = response.usage
+        return LLMCompletion(
+            text="{" + text if json_mode else text,
+            total_tokens=usage.input_tokens + usage.output_tokens if usage else None
+        )
+
+    async def stream(self, system_prompt: str, prompt: str, json_mode: bool = True) -> AsyncIterator[str]:
+        response = await self.client.messages.create(
+            **self._request(system_prompt, prompt, json_mode), stream=True
+        )
+        try:
+            if json_mode:
+                yield "{"
+            async for event in response:
+                if event.type == "content_block_delta" and getattr(event.delta, "text", None):
+                    yield event.delta.text
+        finally:
+            await response.response.aclose()
+
+
+class HealthWindow:
+    """Latency and outcome of a provider's most recent calls"""
+
+    def __init__(self, size: int = 50):
+        self._samples: Deque[Tuple[float, bool]] = deque(maxlen=size)
+
+    def record(self, latency: float, ok: bool) -> None:
+        self._samples.append((latency, ok))
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    @property
+    def error_rate(self) -> float:
+        if not self._samples:
+            return 0.0
+        return sum(1 for _, ok in self._samples if not ok) / len(self._samples)
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        """Latency percentile of successful calls, or None without data"""
+        latencies = sorted(latency for latency, ok in self._samples if ok)
+        if not latencies:
+            return None
+        index = min(len(latencies) - 1, int(round(percentile / 100 * (len(latencies) - 1))))
+        return latencies[index]
+
+    def snapshot(self) -> Dict[str, Any]:
+        p50 = self.latency_percentile(50)
+        p95 = self.latency_percentile(95)
+        return {
+            "samples": len(self._samples),
+            "error_rate": round(self.error_rate, 3),
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None
+        }
+
+
+class CircuitBreaker:
+    """
+    Stops sending traffic to a failing provider.
+
+    Opens after failure_threshold consecutive failures. After the cooldown
+    a single probe is let through (half-open): success closes the breaker,
+    failure opens it for another cooldown.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, cooldown_seconds: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    def available(self) -> bool:
+        """Whether a call may be sent now, without reserving it"""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            return time.monotonic() - self.opened_at >= self.cooldown_seconds
+        return not self._probing
+
+    def acquire(self) -> bool:
+        """Reserve a call; in half-open state only one probe is allowed at a time"""
+        if not self.available():
+            return False
+        if self.state == self.OPEN:
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            self._probing = True
+        return True
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+        self._probing = False
+
+    def trip(self) -> None:
+        """Open at once, without waiting for failure_threshold failures"""
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self._probing = False
+
+    def release(self) -> None:
+        """Give back a reservation whose call ended without an outcome (e.g. cancelled)"""
+        self._probing = False
+
+
+class LLMRouter:
+    """
+    Sends each request to the healthiest available provider.
+
+    Providers are ranked by recent error rate, then p95 latency, then the
+    configured order; a failed call fails over to the next one. With
+    hedging on, if the first provider hasn't answered after its p95
+    latency, the next provider is sent the same request and the first
+    response wins.
+    """
+
+    MIN_HEDGE_SAMPLES = 5
+
+    def __init__(
+        self,
+        providers: List[LLMProvider],
+        hedge: bool = False,
+        hedge_min_delay: float = 1.0
+    ):
+        self.providers = providers
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.hedges = 0
+        self.failovers = 0
+        self.rate_limit_retries = 0
+
+    @property
+    def signature(self) -> str:
+        """Identifies the configured models, e.g. for cache keys"""
+        return ",".join(f"{p.name}:{p.model}" for p in self.providers)
+
+    def _ranked(self) -> List[LLMProvider]:
+        available = [p for p in self.providers if p.breaker.available()]
+        order = {id(p): i for i, p in enumerate(self.providers)}
+        # Providers paused by a Retry-After go last, soonest to resume first
+        return sorted(
+            available,
+            key=lambda p: (
+                p.governor.paused_for,
+                round(p.health.error_rate, 1),
+                p.health.latency_percentile(95) or 0.0,
+                order[id(p)]
+            )
+        )
+
+    def _hedge_delay(self, provider: LLMProvider) -> float:
+        p95 = provider.health.latency_percentile(95)
+        if p95 is None or len(provider.health) < self.MIN_HEDGE_SAMPLES:
+            return self.hedge_min_delay
+        return max(self.hedge_min_delay, p95)
+
+    async def _call(self, provider: LLMProvider, system_prompt: str, prompt: str, json_mode: bool) -> str:
+        estimated_tokens = estimate_tokens(system_prompt) + estimate_tokens(prompt) + settings.LLM_EXPECTED_OUTPUT_TOKENS
+        started = None
+        try:
+            async with provider.governor.slot(estimated_tokens):
+                started = time.monotonic()
+                completion = await provider.complete(system_prompt, prompt, json_mode)
+        except asyncio.CancelledError:
+            # Lost a hedge race; says nothing about the provider's health
+            provider.breaker.release()
+            raise
+        except Exception as e:
+            self._record_failure(provider, e, started)
+            raise
+
+        self._record_success(provider, started, estimated_tokens, completion.total_tokens)
+        return completion.text
+
+    def _record_failure(self, provider: LLMProvider, error: Exception, started: Optional[float]) -> None:
+        latency = time.monotonic() - started if started is not None else 0.0
+        if is_rate_limited(error):
+            # Throttling is about our request rate, not the provider's health
+            provider.governor.on_throttled(retry_after_seconds(error))
+            provider.health.record(latency, False)
+            provider.breaker.release()
+        elif provider.is_misconfigured(error):
+            # Every call would fail the same way: stop routing to it at once, probe after the cooldown
+            logger.error("LLM provider %s is misconfigured: %s", provider.name, error)
+            provider.health.record(latency, False)
+            provider.breaker.trip()
+        elif provider.is_retryable(error):
+            provider.health.record(latency, False)
+            provider.breaker.record_failure()
+        else:
+            provider.breaker.release()
+
+    def _record_success(
+        self,
+        provider: LLMProvider,
+        started: float,
+        estimated_tokens: int,
+        actual_tokens: Optional[int]
+    ) -> None:
+        latency = time.monotonic() - started
+        provider.health.record(latency, True)
+        provider.breaker.record_success()
+        provider.governor.on_success(latency, estimated_tokens, actual_tokens)
+
+    async def stream(self, system_prompt: str, prompt: str, json_mode: bool = True) -> AsyncIterator[str]:
+        """
+        Stream a completion from the best available provider.
+
+        Fails over only until the first chunk arrives; after that an error
+        is raised, since the caller has already consumed part of the reply.
+        No hedging: two streams can't be merged.
+        """
+        estimated_tokens = estimate_tokens(system_prompt) + estimate_tokens(prompt) + settings.LLM_EXPECTED_OUTPUT_TOKENS
+        errors: List[Exception] = []
+
+        for provider in self._ranked():
+            if not provider.breaker.acquire():
+                continue
+            started = None
+            emitted = False
+            try:
+                async with provider.governor.slot(estimated_tokens):
+                    started = time.monotonic()
+                    chunks = provider.stream(system_prompt, prompt, json_mode)
+                    try:
+                        async for chunk in chunks:
+                            emitted = True
+                            yield chunk
+                    finally:
+                        await chunks.aclose()
+            except (asyncio.CancelledError, GeneratorExit):
+                # The consumer went away; not the provider's fault
+                provider.breaker.release()
+                raise
+            except Exception as e:
+                self._record_failure(provider, e, started)
+                if emitted or not provider.is_retryable(e):
+                    raise
+                errors.append(e)
+                logger.warning("LLM provider %s failed: %s", provider.name, e)
+                self.failovers += 1
+                continue
+
+            # Streams don't report usage on every provider; keep the estimate
+            self._record_success(provider, started, estimated_tokens, None)
+            return
+
+        if errors and all(is_rate_limited(e) for e in errors):
+            raise LLMRateLimitedError(f"All LLM providers are rate limited: {errors[-1]}") from errors[-1]
+        if errors:
+            raise LLMUnavailableError(f"All LLM providers failed: {errors[-1]}") from errors[-1]
+        raise LLMUnavailableError("All LLM providers are unavailable")
+
+    async def complete(self, system_prompt: str, prompt: str, json_mode: bool = True) -> str:
+        """
+        Run a chat completion on the best available provider.
+
+        When every provider is rate limited the request waits out their
+        Retry-After in the governors' queues and tries again, rather than failing.
+        """
+        for attempt in range(settings.LLM_RATE_LIMIT_RETRIES + 1):
+            try:
+                return await self._complete_once(system_prompt, prompt, json_mode)
+            except LLMRateLimitedError:
+                if attempt == settings.LLM_RATE_LIMIT_RETRIES:
+                    raise
+                self.rate_limit_retries += 1
+
+    async def _complete_once(self, system_prompt: str, prompt: str, json_mode: bool) -> str:
+        queue = self._ranked()
+        if not queue:
+            raise LLMUnavailableError("All LLM providers are unavailable")
+
+        pending: Dict["asyncio.Task[str]", LLMProvider] = {}
+        errors: List[BaseException] = []
+        hedged = False
+
+        def start_next() -> bool:
+            while queue:
+                provider = queue.pop(0)
+                if provider.breaker.acquire():
+                    task = asyncio.create_task(self._call(provider, system_prompt, prompt, json_mode))
+                    pending[task] = provider
+                    return True
+            return False
+
+        start_next()
+        try:
+            while pending:
+                timeout = None
+                if self.hedge and not hedged and queue and len(pending) == 1:
+                    timeout = self._hedge_delay(next(iter(pending.values())))
+
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    if start_next():
+                        self.hedges += 1
+                    continue
+
+                # Retrieve every finished task so none is left with an unread exception
+                results = []
+                for task in done:
+                    provider = pending.pop(task)
+                    try:
+                        results.append(task.result())
+                    except Exception as e:
+                        if not provider.is_retryable(e):
+                            raise
+                        errors.append(e)
+                        logger.warning("LLM provider %s failed: %s", provider.name, e)
+                if results:
+                    return results[0]
+
+                if not pending and start_next():
+                    self.failovers += 1
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        if errors and all(is_rate_limited(e) for e in errors):
+            raise LLMRateLimitedError(f"All LLM providers are rate limited: {errors[-1]}") from errors[-1]
+        if errors:
+            raise LLMUnavailableError(f"All LLM providers failed: {errors[-1]}") from errors[-1]
+        raise LLMUnavailableError("All LLM providers are unavailable")
+
+    def governor_stats(self) -> Dict[str, Any]:
+        """Rate budget, concurrency and queue state per provider"""
+        return {provider.name: provider.governor.snapshot() for provider in self.providers}
+
+    def stats(self) -> Dict[str, Any]:
+        """Health and breaker state per provider"""
+        return {
+            "hedges": self.hedges,
+            "failovers": self.failovers,
+            "rate_limit_retries": self.rate_limit_retries,
+            "providers": {
+                provider.name: {
+                    "model": provider.model,
+                    "breaker": provider.breaker.state,
+                    **provider.health.snapshot()
+                }
+                for provider in self.providers
+            }
+        }
+
+
+def create_llm_router() -> Optional[LLMRouter]:
+    """Build the router from the providers that have API keys, in LLM_PROVIDERS order"""
+    factories = {
+        "openai": lambda: OpenAIProvider(
+            settings.OPENAI_API_KEY, settings.OPENAI_MODEL, settings.OPENAI_BASE_URL
+        ) if settings.OPENAI_API_KEY else None,
+        "anthropic": lambda: AnthropicProvider(
+            settings.ANTHROPIC_API_KEY, settings.ANTHROPIC_MODEL, settings.ANTHROPIC_BASE_URL
+        ) if settings.ANTHROPIC_API_KEY else None,
+    }
+
+    providers = []
+    for name in settings.LLM_PROVIDERS:
+        factory = factories.get(name)
+        if factory is None:
+            logger.warning("Unknown LLM provider %r in LLM_PROVIDERS", name)
+            continue
+        provider = factory()
+        if provider is not None:
+            providers.append(provider)
+
+    if not providers:
+        return None
+    return LLMRouter(
+        providers,
+        hedge=settings.LLM_HEDGE_ENABLED,
+        hedge_min_delay=settings.LLM_HEDGE_MIN_DELAY_SECONDS
+    )
@@ -0,0 +1,242 @@
+"""
+Read-through cache for API reads
+"""
+import asyncio
+import json
+import logging
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+
+from ..core.cache import MemoryCacheBackend
+from ..core.config import settings
+from ..core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+Loader = Callable[[], Awaitable[Any]]
+
+
+class ReadCache:
+    """
+    Two-tier read-through cache: a short-lived in-process tier in front of Redis.
+
+    Entries live in scopes (e.g. one content of one user). Each scope has a
+    generation token in Redis, and entry keys include it, so invalidating a
+    scope is a single write that orphans every entry in it, including the
+    many variants of a paginated listing. The in-process tier keeps both
+    entries and generations for LOCAL_TTL seconds, which bounds how stale
+    another process can be after an invalidation.
+
+    Concurrent misses for the same key are coalesced: within a process they
+    share one load, and across processes a short Redis lock lets one caller
+    load while the others wait for its result.
+    """
+
+    POLL_INTERVAL = 0.05
+
+    def __init__(
+        self,
+        redis: Optional[aioredis.Redis] = None,
+        prefix: str = "read-cache",
+        ttl: int = 300,
+        local_ttl: int = 2,
+        local_max_entries: int = 2000,
+        lock_timeout: float = 5.0
+    ):
+        self._redis = redis
+        self.prefix = prefix
+        self.ttl = ttl
+        self.local_ttl = local_ttl
+        self.lock_timeout = lock_timeout
+        self.local = MemoryCacheBackend(max_entries=local_max_entries)
+        self._inflight: Dict[str, "asyncio.Future[Any]"] = {}
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    @property
+    def redis(self) -> aioredis.Redis:
+        return self._redis or get_redis()
+
+    def _generation_key(self, scope: str) -> str:
+        return f"{self.prefix}:gen:{scope}"
+
+    async def _generation(self, scope: str) -> str:
+        local_key = f"gen:{scope}"
+        generation = await self.local.get(local_key)
+        if generation is not None:
+            return generation
+
+        try:
+            generation = await self.redis.get(self._generation_key(scope)) or "0"
+        except RedisError as e:
+            self._redis_failed("generation read", e)
+            generation = "0"
+        await self.local.set(local_key, generation, self.local_ttl)
+        return generation
+
+    def _redis_failed(self, operation: str, error: Exception) -> None:
+        # The cache is an optimization; an outage degrades to database reads
+        self.errors += 1
+        logger.warning("Read cache %s failed: %s", operation, error)
+
+    async def get_or_load(self, scope: str, key: str, loader: Loader) -> Any:
+        """
+        Return the cached value for key within scope, calling loader on a miss.
+
+        The loader's result must be JSON-serializable; None is returned but
+        not cached, so a missing row is looked up again on the next read.
+        """
+        # The generation is read before loading: if a write invalidates the
+        # scope mid-load, the result lands under the old generation and is
+        # never served
+        generation = await self._generation(scope)
+        full_key = f"{scope}:{generation}:{key}"
+
+        cached = await self.local.get(full_key)
+        if cached is not None:
+            self.local_hits += 1
+            return json.loads(cached)
+
+        inflight = self._inflight.get(full_key)
+        if inflight is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise
+                # The request doing the load went away; load for ourselves
+                return await self._load(full_key, loader)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[full_key] = future
+        try:
+            value = await self._load(full_key, loader)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Waiters re-raise it; mark it retrieved so an unawaited future doesn't warn
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            self._inflight.pop(full_key, None)
+
+    async def _load(self, full_key: str, loader: Loader) -> Any:
+        redis_key = f"{self.prefix}:{full_key}"
+        lock_key = f"{self.prefix}:lock:{full_key}"
+
+        cached = await self._redis_get(redis_key)
+        if cached is not None:
+            self.redis_hits += 1
+            await self.local.set(full_key, cached, self.local_ttl)
+            return json.loads(cached)
+
+        locked = False
+        try:
+            locked = bool(await self.redis.set(lock_key, "1", nx=True, px=int(self.lock_timeout * 1000)))
+        except RedisError as e:
+            self._redis_failed("lock", e)
+        else:
+            if not locked:
+                # Another process is loading this key; wait briefly for its result
+                cached = await self._wait_for(redis_key, lock_key)
+                if cached is not None:
+                    self.coalesced += 1
+                    await self.local.set(full_key, cached, self.local_ttl)
+                    return json.loads(cached)
+
+        self.misses += 1
+        try:
+            value = await loader()
+            if value is not None:
+                serialized = json.dumps(value)
+                await self.local.set(full_key, serialized, self.local_ttl)
+                await self._redis_set(redis_key, serialized)
+            return value
+        finally:
+            if locked:
+                try:
+                    await self.redis.delete(lock_key)
+                except RedisError as e:
+                    self._redis_failed("unlock", e)
+
+    async def _wait_for(self, redis_key: str, lock_key: str) -> Optional[str]:
+        """Poll for the value until the loader releases its lock or the lock times out"""
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.POLL_INTERVAL)
+            try:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    pipe.get(redis_key)
+                    pipe.exists(lock_key)
+                    cached, still_locked = await pipe.execute()
+            except RedisError as e:
+                self._redis_failed("read", e)
+                return None
+            if cached is not None or not still_locked:
+                return cached
+        return None
+
+    async def _redis_get(self, redis_key: str) -> Optional[str]:
+        try:
+            return await self.redis.get(redis_key)
+        except RedisError as e:
+            self._redis_failed("read", e)
+            return None
+
+    async def _redis_set(self, redis_key: str, value: str) -> None:
+        try:
+            await self.redis.set(redis_key, value, ex=self.ttl)
+        except RedisError as e:
+            self._redis_failed("write", e)
+
+    async def invalidate(self, scopes: Iterable[str]) -> None:
+        """Drop every entry in the given scopes"""
+        scopes = list(scopes)
+        for scope in scopes:
+            await self.local.delete(f"gen:{scope}")
+
+        # A fresh random token rather than a counter: generation keys expire,
+        # and a restarted counter could revive entries written under it before
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for scope in scopes:
+                    pipe.set(self._generation_key(scope), uuid.uuid4().hex[:16], ex=self.ttl * 2)
+                await pipe.execute()
+        except RedisError as e:
+            self._redis_failed("invalidation", e)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters"""
+        return {
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "local_entries": len(self.local)
+        }
+
+
+def create_read_cache() -> Optional[ReadCache]:
+    """Build the read cache from settings"""
+    if not settings.READ_CACHE_ENABLED:
+        return None
+
+    return ReadCache(
+        ttl=settings.READ_CACHE_TTL,
+        local_ttl=settings.READ_CACHE_LOCAL_TTL,
+        local_max_entries=settings.READ_CACHE_LOCAL_MAX_ENTRIES,
+        lock_timeout=settings.READ_CACHE_LOCK_TIMEOUT
+    )
@@ -0,0 +1,490 @@
+"""
+Rendering of platform video variants with ffmpeg, and of image crops and thumbnails
+"""
+import asyncio
+import json
+import logging
+import os
+import resource
+import shutil
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import aiofiles
+from redis.exceptions import RedisError
+from sqlalchemy import select
+
+from ..core.config import settings
+from ..core.database import read_only_session_maker, unit_of_work
+from ..core.locks import RedisLease
+from ..core.redis import get_redis
+from ..models.content import Adaptation, AdaptationStatus, Content, ContentType, Platform
+from ..models.scenes import VideoScenes
+from ..schemas.content import PLATFORM_CONFIGS
+from ..utils.media import MediaError, MediaInfo, probe_media, variant_size
+from .content_service import content_service
+from .image_service import image_service
+from .scene_service import scene_service, thumbnail_time
+from .storage_service import storage_service
+
+logger = logging.getLogger(__name__)
+
+ProgressCallback = Callable[[float], Awaitable[None]]
+
+# Formats an image platform accepts for a cropped image
+IMAGE_FORMATS = {"jpg", "png"}
+
+
+@dataclass
+class VideoVariant:
+    """One output file, shared by every platform with the same frame shape and length"""
+    width: int
+    height: int
+    duration: Optional[float]  # Seconds to keep from the start; None keeps all of it
+    platforms: List[Platform] = field(default_factory=list)
+    # A longer variant of the same size to cut this one from, instead of encoding it again
+    trim_of: Optional["VideoVariant"] = None
+
+    @property
+    def name(self) -> str:
+        suffix = f"_{int(self.duration)}s" if self.duration is not None else ""
+        return f"{self.width}x{self.height}{suffix}"
+
+
+def plan_video_variants(platforms: List[Platform], info: MediaInfo) -> List[VideoVariant]:
+    """
+    The distinct outputs the platforms need from this source.
+
+    Platforms share an output when they want the same aspect ratio and
+    the same length: a duration limit the source is already under counts
+    as no limit. Sources smaller than RENDER_SHORT_SIDE are not upscaled.
+    A shorter variant of a size that is also needed longer is marked to be
+    cut from the longer one.
+    """
+    short_side = settings.RENDER_SHORT_SIDE
+    if info.width and info.height:
+        short_side = min(short_side, info.width, info.height)
+
+    variants: Dict[tuple, VideoVariant] = {}
+    for platform in dict.fromkeys(platforms):
+        config = PLATFORM_CONFIGS[platform]
+        if "mp4" not in config.supported_formats:
+            continue
+        limit = config.max_duration_seconds
+        duration = float(limit) if limit is not None and limit < info.duration else None
+        width, height = variant_size(config.aspect_ratio, short_side)
+        key = (width, height, duration)
+        if key not in variants:
+            variants[key] = VideoVariant(width, height, duration)
+        variants[key].platforms.append(platform)
+
+    # Of each frame size only the longest is encoded; the shorter ones are its opening
+    longest: Dict[tuple, VideoVariant] = {}
+    for variant in sorted(variants.values(), key=lambda v: -(v.duration or float("inf"))):
+        size = (variant.width, variant.height)
+        if size in longest:
+            variant.trim_of = longest[size]
+        else:
+            longest[size] = variant
+    return list(variants.values())
+
+
+def build_render_command(
+    source: str,
+    variants: List[VideoVariant],
+    outputs: List[str],
+    has_audio: bool
+) -> List[str]:
+    """
+    One ffmpeg invocation that decodes the source once and encodes every variant.
+
+    The decoded video is split in the filter graph and each branch is
+    scaled to cover its frame and center-cropped; the audio stream is
+    decoded once and fed to each output's encoder. Each output stops at
+    its own duration while the others keep going.
+    """
+    branches = [f"[v{index}]" for index in range(len(variants))]
+    graph = [f"[0:v]split={len(variants)}{''.join(branches)}" if len(variants) > 1 else "[0:v]null[v0]"]
+    for index, variant in enumerate(variants):
+        graph.append(
+            f"[v{index}]scale={variant.width}:{variant.height}:force_original_aspect_ratio=increase,"
+            f"crop={variant.width}:{variant.height},setsar=1,format=yuv420p[out{index}]"
+        )
+
+    command = [
+        settings.FFMPEG_BINARY, "-nostdin", "-hide_banner", "-loglevel", "error", "-y",
+        "-progress", "pipe:1", "-nostats",
+        "-threads", str(settings.RENDER_THREADS),
+        "-i", source,
+        "-filter_complex", ";".join(graph),
+        "-filter_complex_threads", str(settings.RENDER_THREADS),
+    ]
+    for index, (variant, output) in enumerate(zip(variants, outputs)):
+        command += ["-map", f"[out{index}]"]
+        if has_audio:
+            command += ["-map", "0:a:0", "-c:a", "aac", "-b:a", "128k"]
+        if variant.duration is not None:
+            command += ["-t", f"{variant.duration:g}"]
+        command += [
+            "-c:v", "libx264", "-preset", settings.RENDER_X264_PRESET, "-crf", str(settings.RENDER_CRF),
+            "-threads", str(settings.RENDER_THREADS),
+            "-x264-params", f"rc-lookahead={settings.RENDER_LOOKAHEAD_FRAMES}",
+            "-movflags", "+faststart",
+            output
+        ]
+    return command
+
+
+def build_trim_command(rendered: str, duration: float, output: str) -> List[str]:
+    """
+    Copy the first `duration` seconds of a rendered variant without re-encoding.
+
+    Cutting the end needs no keyframe there, so the copy stops at the
+    requested time.
+    """
+    return [
+        settings.FFMPEG_BINARY, "-nostdin", "-hide_banner", "-loglevel", "error", "-y",
+        "-progress", "pipe:1", "-nostats",
+        "-i", rendered, "-map", "0", "-c", "copy", "-t", f"{duration:g}",
+        "-movflags", "+faststart", output
+    ]
+
+
+def _limit_memory() -> None:
+    """Runs in the ffmpeg child before exec"""
+    limit = settings.RENDER_MEMORY_LIMIT_MB * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+async def run_ffmpeg(command: List[str], total_seconds: float, on_progress: Optional[ProgressCallback] = None) -> None:
+    """Run an ffmpeg command that writes -progress to stdout, reporting the fraction done"""
+    process = await asyncio.create_subprocess_exec(
+        *command,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        # Few malloc arenas: glibc otherwise reserves one per encoder thread
+        env={**os.environ, "MALLOC_ARENA_MAX": "2"},
+        preexec_fn=_limit_memory if settings.RENDER_MEMORY_LIMIT_MB else None
+    )
+    # Drained alongside stdout so a chatty stderr can't fill its pipe and stall ffmpeg
+    stderr_task = asyncio.create_task(process.stderr.read())
+    try:
+        async for line in process.stdout:
+            key, _, value = line.decode("ascii", "replace").strip().partition("=")
+            # out_time_ms is in microseconds too; older builds only print that one
+            if key in ("out_time_us", "out_time_ms") and on_progress is not None and total_seconds > 0:
+                try:
+                    await on_progress(min(1.0, int(value) / 1_000_000 / total_seconds))
+                except ValueError:
+                    pass
+        returncode = await process.wait()
+    except BaseException:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        raise
+    finally:
+        stderr = await stderr_task
+    if returncode != 0:
+        raise MediaError(stderr.decode("utf-8", "replace").strip()[-2000:] or f"ffmpeg exited with {returncode}")
+
+
+class RenderService:
+    """
+    Renders each platform's video variant of a content.
+
+    ffmpeg runs as a pool of at most RENDER_PROCESSES child processes per
+    worker; each is bounded by RENDER_THREADS threads, a fixed encoder
+    lookahead, and optionally an address-space cap. Progress is kept in
+    Redis per content for polling.
+    """
+
+    def __init__(self):
+        self._slots = asyncio.Semaphore(max(1, settings.RENDER_PROCESSES))
+        self.running = 0
+        self.renders = 0
+        self.failures = 0
+        self.source_seconds = 0.0
+        self.render_seconds = 0.0
+
+    def _progress_key(self, content_id: int) -> str:
+        return f"render:progress:{content_id}"
+
+    async def _set_progress(self, content_id: int, state: Dict[str, Any]) -> None:
+        try:
+            await get_redis().set(self._progress_key(content_id), json.dumps(state), ex=24 * 3600)
+        except RedisError as e:
+            logger.warning("Failed to store render progress for content %s: %s", content_id, e)
+
+    async def get_progress(self, content_id: int) -> Optional[Dict[str, Any]]:
+        """{"status", "progress", "platforms", "error"} of the content's latest render, if any"""
+        raw = await get_redis().get(self._progress_key(content_id))
+        return json.loads(raw) if raw else None
+
+    async def render_variants(
+        self,
+        source: str,
+        platforms: List[Platform],
+        work_dir: str,
+        on_progress: Optional[ProgressCallback] = None
+    ) -> Dict[Platform, str]:
+        """
+        Render every platform's variant in one ffmpeg pass; returns local output paths.
+
+        Variants cut from a longer one are remuxed from its output afterwards,
+        which takes a fraction of a second.
+        """
+        info = await asyncio.get_running_loop().run_in_executor(None, probe_media, source)
+        if not info.width:
+            raise MediaError("Source has no video stream")
+        variants = plan_video_variants(platforms, info)
+        if not variants:
+            return {}
+
+        outputs = {id(variant): os.path.join(work_dir, f"{variant.name}.mp4") for variant in variants}
+        encoded = [variant for variant in variants if variant.trim_of is None]
+        command = build_render_command(
+            source, encoded, [outputs[id(variant)] for variant in encoded], info.has_audio
+        )
+        longest = max(variant.duration or info.duration for variant in encoded)
+
+        start = time.perf_counter()
+        async with self._slots:
+            self.running += 1
+            try:
+                await run_ffmpeg(command, longest, on_progress)
+                for variant in variants:
+                    if variant.trim_of is not None:
+                        await run_ffmpeg(
+                            build_trim_command(outputs[id(variant.trim_of)], variant.duration, outputs[id(variant)]),
+                            variant.duration
+                        )
+            finally:
+                self.running -= 1
+        self.renders += 1
+        self.source_seconds += longest
+        self.render_seconds += time.perf_counter() - start
+
+        return {
+            platform: outputs[id(variant)]
+            for variant in variants
+            for platform in variant.platforms
+        }
+
+    def _lock_key(self, content_id: int) -> str:
+        return f"render:lock:{content_id}"
+
+    async def render_adaptations(self, content_id: int) -> None:
+        """
+        Render files for the content's adaptations that don't have one yet.
+
+        Video is rendered to each platform's variant; images are cropped to
+        each image platform's aspect ratio. Every adaptation also gets a
+        thumbnail in its platform's aspect ratio, and Weibo and Xiaohongshu
+        adaptations their nine-grid or carousel images. Adaptations are PROCESSING
+        while this runs, then COMPLETED with their URLs set, or ERROR.
+        Platforms sharing a variant share its uploaded file.
+
+        One worker at a time renders a content, under a lease. A job that
+        finds the lease taken returns at once: the holder renders whatever
+        is still PENDING before it lets go, and checks once more after, so
+        adaptations added mid-render are not left behind. PROCESSING rows
+        are only taken over with the lease, i.e. once their renderer died.
+        """
+        while True:
+            lease = await RedisLease.acquire(self._lock_key(content_id), settings.RENDER_LOCK_LEASE_SECONDS)
+            if lease is None:
+                return
+            keep_alive = asyncio.create_task(lease.keep_alive())
+            try:
+                while await self._render_batch(content_id):
+                    pass
+            finally:
+                keep_alive.cancel()
+                try:
+                    await lease.release()
+                except RedisError as e:
+                    # The lease expires on its own
+                    logger.warning("Failed to release render lock for content %s: %s", content_id, e)
+            # A job that found the lease taken just before the release returned; cover for it
+            if not await self._has_pending(content_id):
+                return
+
+    async def _has_pending(self, content_id: int) -> bool:
+        async with read_only_session_maker() as db:
+            found = await db.scalar(
+                select(Adaptation.id).where(
+                    Adaptation.content_id == content_id,
+                    Adaptation.adapted_file_url.is_(None),
+                    Adaptation.status == AdaptationStatus.PENDING
+                ).limit(1)
+            )
+        return found is not None
+
+    async def _render_batch(self, content_id: int) -> bool:
+        """Render the adaptations waiting for a file; False when there were none"""
+        async with unit_of_work() as db:
+            content = await db.get(Content, content_id)
+            if content is None:
+                return False
+            result = await db.execute(
+                select(Adaptation).where(
+                    Adaptation.content_id == content_id,
+                    Adaptation.adapted_file_url.is_(None),
+                    Adaptation.status.in_([AdaptationStatus.PENDING, AdaptationStatus.PROCESSING])
+                )
+            )
+            adaptations = list(result.scalars().all())
+            if not adaptations:
+                return False
+            for adaptation in adaptations:
+                adaptation.status = AdaptationStatus.PROCESSING
+            user_id = content.user_id
+            content_service.invalidate_adaptations(db, user_id, content_id)
+
+        platforms = list(dict.fromkeys(adaptation.platform for adaptation in adaptations))
+        state: Dict[str, Any] = {
+            "status": "rendering", "progress": 0.0, "platforms": [p.value for p in platforms], "error": None
+        }
+        await self._set_progress(content_id, state)
+        last_report = 0.0
+
+        async def on_progress(fraction: float) -> None:
+            nonlocal last_report
+            # ffmpeg reports twice a second; Redis only needs a percent step
+            if fraction - last_report >= 0.01:
+                last_report = fraction
+                await self._set_progress(content_id, {**state, "progress": round(fraction, 3)})
+
+        work_dir = tempfile.mkdtemp(prefix="crosspilot_render_")
+        try:
+            if content.content_type == ContentType.IMAGE:
+                images = await image_service.platform_images(content, platforms)
+                urls = {
+                    platform: files["image"]
+                    for platform, files in images.items()
+                    if IMAGE_FORMATS & set(PLATFORM_CONFIGS[platform].supported_formats)
+                }
+                scenes = None
+            else:
+                # Scanned once, alongside the render, for both the thumbnails and the image sets
+                scenes, urls = await asyncio.gather(
+                    scene_service.get_scenes(content),
+                    self._render_video(content, platforms, work_dir, on_progress)
+                )
+                images = await self._thumbnails(content, platforms, scenes)
+            media = await self._image_sets(content, platforms, scenes)
+        except MediaError as e:
+            # The source itself can't be rendered; a retry would fail the same way
+            self.failures += 1
+            await self._finish(content_id, user_id, adaptations, {}, {}, {}, AdaptationStatus.ERROR)
+            await self._set_progress(content_id, {**state, "status": "error", "error": str(e)})
+            return True
+        except Exception as e:
+            # Possibly transient (storage, database): back to PENDING for the job's retry
+            self.failures += 1
+            await self._finish(content_id, user_id, adaptations, {}, {}, {}, AdaptationStatus.PENDING)
+            await self._set_progress(content_id, {**state, "status": "error", "error": str(e) or e.__class__.__name__})
+            raise
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        thumbnails = {platform: files["thumbnail"] for platform, files in images.items()}
+        await self._finish(content_id, user_id, adaptations, urls, thumbnails, media, None)
+        await self._set_progress(content_id, {**state, "status": "done", "progress": 1.0})
+        return True
+
+    async def _render_video(
+        self,
+        content: Content,
+        platforms: List[Platform],
+        work_dir: str,
+        on_progress: ProgressCallback
+    ) -> Dict[Platform, str]:
+        """Render and upload the platforms' video variants; returns their URLs"""
+        source = await storage_service.get_readable_source(content.original_file_url)
+        if source is None:
+            raise MediaError("Original file is not readable")
+        rendered = await self.render_variants(source, platforms, work_dir, on_progress)
+
+        uploaded: Dict[str, str] = {}
+        for path in dict.fromkeys(rendered.values()):
+            async with aiofiles.open(path, "rb") as f:
+                stored = await storage_service.upload_stream(
+                    content.user_id, f, os.path.basename(path), "video/mp4", folder="adapted"
+                )
+            uploaded[path] = stored.url
+        return {platform: uploaded[path] for platform, path in rendered.items()}
+
+    async def _thumbnails(
+        self,
+        content: Content,
+        platforms: List[Platform],
+        scenes: Optional[VideoScenes]
+    ) -> Dict[Platform, Dict[str, str]]:
+        """Platform crops of a video frame; a video that rendered is not failed for want of them"""
+        at_seconds = thumbnail_time(scenes.scenes) if scenes is not None else None
+        try:
+            return await image_service.platform_images(content, platforms, at_seconds)
+        except MediaError as e:
+            logger.warning("No thumbnails for content %s: %s", content.id, e)
+            return {}
+
+    async def _image_sets(
+        self,
+        content: Content,
+        platforms: List[Platform],
+        scenes: Optional[VideoScenes]
+    ) -> Dict[Platform, List[str]]:
+        """Grid tiles and carousel slides; optional extras, so their failure fails nothing else"""
+        try:
+            return await image_service.image_sets(content, platforms, scenes)
+        except MediaError as e:
+            logger.warning("No image sets for content %s: %s", content.id, e)
+            return {}
+
+    async def _finish(
+        self,
+        content_id: int,
+        user_id: int,
+        adaptations: List[Adaptation],
+        urls: Dict[Platform, str],
+        thumbnails: Dict[Platform, str],
+        media: Dict[Platform, List[str]],
+        failed_status: Optional[AdaptationStatus]
+    ) -> None:
+        """Record rendered file, thumbnail and image set URLs, or failed_status when the render failed"""
+        async with unit_of_work() as db:
+            for adaptation in adaptations:
+                adaptation = await db.get(Adaptation, adaptation.id)
+                if adaptation is None:
+                    continue
+                if adaptation.platform in thumbnails:
+                    adaptation.thumbnail_url = thumbnails[adaptation.platform]
+                if adaptation.platform in media:
+                    adaptation.media_urls = media[adaptation.platform]
+                if adaptation.platform in urls:
+                    adaptation.adapted_file_url = urls[adaptation.platform]
+                    adaptation.status = AdaptationStatus.COMPLETED
+                elif failed_status is not None:
+                    adaptation.status = failed_status
+                else:
+                    # No file for this platform (e.g. a WeChat article of a video): only text
+                    adaptation.status = AdaptationStatus.COMPLETED
+            content_service.invalidate_adaptations(db, user_id, content_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "renders": self.renders,
+            "failures": self.failures,
+            "running": self.running,
+            "source_seconds": round(self.source_seconds, 1),
+            "render_seconds": round(self.render_seconds, 1),
+            # Seconds of video rendered per second of wall time
+            "speed": round(self.source_seconds / self.render_seconds, 2) if self.render_seconds else None
+        }
+
+
+render_service = RenderService()
@@ -0,0 +1,393 @@
+"""
+Scene cut detection and keyframe selection for video content
+"""
+import asyncio
+import colorsys
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from redis.exceptions import RedisError
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from ..core.config import settings
+from ..core.database import read_only_session_maker, unit_of_work
+from ..core.locks import RedisLease
+from ..models.content import Content, ContentType
+from ..models.scenes import VideoScenes
+from ..utils.media import MediaError, probe_media, sample_frames
+from .storage_service import storage_service
+
+logger = logging.getLogger(__name__)
+
+VIDEO_CONTENT_TYPES = {ContentType.VIDEO, ContentType.LIVE_RECORDING}
+
+HISTOGRAM_BITS = 2  # Per channel, so 64 colour bins
+HISTOGRAM_BINS = 1 << (3 * HISTOGRAM_BITS)
+LUMA = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+def frame_features(frames: np.ndarray, previous: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """
+    Per-frame features of an (N, H, W, 3) uint8 batch, computed for the whole batch at once.
+
+    previous is the last frame of the batch before, so the change into a
+    batch's first frame is measured too (0 for the very first frame).
+    """
+    count = len(frames)
+    pixels = frames.reshape(count, -1, 3)
+
+    # Colour histogram: every pixel's bin, offset by its frame, counted in one bincount
+    quantized = (pixels >> (8 - HISTOGRAM_BITS)).astype(np.int32)
+    bins = (quantized[..., 0] << (2 * HISTOGRAM_BITS)) | (quantized[..., 1] << HISTOGRAM_BITS) | quantized[..., 2]
+    bins += np.arange(count, dtype=np.int32)[:, None] * HISTOGRAM_BINS
+    histograms = np.bincount(bins.ravel(), minlength=count * HISTOGRAM_BINS).reshape(count, HISTOGRAM_BINS)
+    histograms = histograms.astype(np.float32) / pixels.shape[1]
+
+    luma = (frames.astype(np.float32) @ LUMA) / 255.0
+    # The very first frame is compared with itself
+    first = luma[:1] if previous is None else (previous.astype(np.float32) @ LUMA)[None] / 255.0
+    difference = np.abs(luma - np.concatenate([first, luma[:-1]])).mean(axis=(1, 2))
+
+    channel_max = pixels.max(axis=2).astype(np.float32)
+    channel_min = pixels.min(axis=2).astype(np.float32)
+    saturation = np.where(channel_max > 0, (channel_max - channel_min) / np.maximum(channel_max, 1), 0).mean(axis=1)
+    # Mean gradient magnitude of luma: blurred and transitional frames score low
+    sharpness = np.abs(np.diff(luma, axis=1)).mean(axis=(1, 2)) + np.abs(np.diff(luma, axis=2)).mean(axis=(1, 2))
+
+    return {
+        "histograms": histograms,
+        "difference": difference.astype(np.float32),
+        "brightness": luma.mean(axis=(1, 2)),
+        "contrast": luma.std(axis=(1, 2)),
+        "saturation": saturation.astype(np.float32),
+        "sharpness": sharpness.astype(np.float32),
+    }
+
+
+def cut_scores(histograms: np.ndarray, difference: np.ndarray) -> np.ndarray:
+    """
+    How much of a cut lies before each frame, in [0, 1].
+
+    The histogram distance (half the L1 distance, so 1 means no colour in
+    common) catches cuts between differently lit shots; the luma
+    difference catches cuts between similar-looking ones. Averaging them
+    keeps a camera pan, which moves pixels but not colours, and a flash,
+    which shifts colours of the same picture, below a cut.
+    """
+    distance = np.zeros(len(histograms), dtype=np.float32)
+    distance[1:] = 0.5 * np.abs(np.diff(histograms, axis=0)).sum(axis=1)
+    return (distance + np.minimum(1.0, 4.0 * difference)) / 2
+
+
+def find_cuts(scores: np.ndarray, threshold: float, min_frames: int) -> np.ndarray:
+    """
+    Frame indices that start a new scene.
+
+    A cut is a score over the threshold that is also the largest within
+    min_frames either side, so a gradual transition yields one cut and no
+    scene is shorter than min_frames.
+    """
+    if len(scores) < 2:
+        return np.zeros(0, dtype=np.int64)
+    window = max(1, min_frames)
+    padded = np.pad(scores, window, constant_values=0)
+    local_max = sliding_window_view(padded, 2 * window + 1).max(axis=1)
+    candidates = np.flatnonzero((scores >= threshold) & (scores >= local_max))
+    candidates = candidates[(candidates >= window) & (candidates <= len(scores) - window)]
+    # Equal scores side by side are both local maxima; keep the first
+    keep = np.diff(np.concatenate([[-window], candidates])) >= window
+    return candidates[keep]
+
+
+def pick_keyframes(features: Dict[str, np.ndarray], starts: np.ndarray) -> np.ndarray:
+    """
+    The most representative frame of each scene, as frame indices.
+
+    That's the frame whose colours are closest to the scene's average,
+    preferring sharp, well-exposed frames; scenes are handled together
+    through reduceat over the scene boundaries.
+    """
+    histograms = features["histograms"]
+    count = len(histograms)
+    lengths = np.diff(np.concatenate([starts, [count]]))
+    scene_of = np.repeat(np.arange(len(starts)), lengths)
+
+    means = np.add.reduceat(histograms, starts, axis=0) / lengths[:, None]
+    distance = 0.5 * np.abs(histograms - means[scene_of]).sum(axis=1)
+
+    sharpness = features["sharpness"] / max(float(features["sharpness"].max()), 1e-6)
+    exposure = np.clip(np.minimum(features["brightness"], 1 - features["brightness"]) / 0.15, 0, 1)
+    cost = distance + 0.3 * (1 - sharpness) + 0.3 * (1 - exposure)
+    # Frames on a boundary often catch the transition
+    edge = np.zeros(count, dtype=bool)
+    edge[starts] = True
+    edge[np.concatenate([starts[1:], [count]]) - 1] = True
+    cost = np.where(edge & (lengths[scene_of] > 2), cost + 1.0, cost)
+
+    lowest = np.minimum.reduceat(cost, starts)
+    best = np.flatnonzero(cost == lowest[scene_of])
+    _, first = np.unique(scene_of[best], return_index=True)
+    return best[first]
+
+
+def _colour_name(rgb: np.ndarray) -> str:
+    hue, saturation, value = colorsys.rgb_to_hsv(*(rgb / 255.0))
+    if value < 0.2:
+        return "黑"
+    if saturation < 0.2:
+        return "白" if value > 0.8 else "灰"
+    names = ["红", "橙", "黄", "绿", "青", "蓝", "紫", "红"]
+    edges = [20, 45, 70, 160, 200, 260, 320, 360]
+    return names[next(index for index, edge in enumerate(edges) if hue * 360 < edge)]
+
+
+def dominant_colours(histogram: np.ndarray, limit: int = 3, min_share: float = 0.1) -> List[str]:
+    """Names of the largest colour bins of a histogram, largest first"""
+    centre = (np.arange(1 << HISTOGRAM_BITS) + 0.5) * (256 >> HISTOGRAM_BITS)
+    names: List[str] = []
+    for index in np.argsort(histogram)[::-1]:
+        if histogram[index] < min_share or len(names) >= limit:
+            break
+        rgb = np.array([
+            centre[index >> (2 * HISTOGRAM_BITS)],
+            centre[(index >> HISTOGRAM_BITS) & ((1 << HISTOGRAM_BITS) - 1)],
+            centre[index & ((1 << HISTOGRAM_BITS) - 1)]
+        ])
+        name = _colour_name(rgb)
+        if name not in names:
+            names.append(name)
+    return names
+
+
+def detect_scenes(frames, fps: float, threshold: float, min_seconds: float) -> Dict[str, Any]:
+    """
+    Scenes and visual statistics of a video from its sampled frames.
+
+    frames yields (N, H, W, 3) batches, as sample_frames does; features
+    are kept per frame (a few hundred bytes each), the frames themselves
+    only per batch.
+    """
+    batches: List[Dict[str, np.ndarray]] = []
+    previous = None
+    for batch in frames:
+        batches.append(frame_features(batch, previous))
+        previous = batch[-1].copy()
+    if not batches:
+        raise MediaError("No frames decoded")
+    features = {name: np.concatenate([batch[name] for batch in batches]) for name in batches[0]}
+
+    count = len(features["histograms"])
+    scores = cut_scores(features["histograms"], features["difference"])
+    cuts = find_cuts(scores, threshold, int(round(min_seconds * fps)))
+    starts = np.concatenate([[0], cuts]).astype(np.int64)
+    keyframes = pick_keyframes(features, starts)
+    ends = np.concatenate([starts[1:], [count]])
+
+    within = np.ones(count, dtype=bool)
+    within[starts] = False
+    return {
+        "duration_seconds": round(count / fps, 2),
+        "scenes": [
+            {"start": round(start / fps, 2), "end": round(end / fps, 2), "keyframe": round(keyframe / fps, 2)}
+            for start, end, keyframe in zip(starts.tolist(), ends.tolist(), keyframes.tolist())
+        ],
+        "visual": {
+            "brightness": round(float(features["brightness"].mean()), 3),
+            "saturation": round(float(features["saturation"].mean()), 3),
+            "motion": round(float(features["difference"][within].mean()) if within.any() else 0.0, 3),
+            "colors": dominant_colours(features["histograms"][keyframes].mean(axis=0))
+        }
+    }
+
+
+def keyframe_times(scenes: List[dict], count: int, duration: float) -> List[float]:
+    """
+    count timestamps in time order: the keyframes of the longest scenes.
+
+    With fewer scenes than count, evenly spread times fill in, away from
+    the keyframes already taken.
+    """
+    ranked = sorted(scenes, key=lambda scene: scene["end"] - scene["start"], reverse=True)
+    times = sorted(scene["keyframe"] for scene in ranked[:count])
+    if len(times) < count and duration > 0:
+        spacing = duration / count / 2
+        for index in range(count):
+            at = round((index + 0.5) * duration / count, 3)
+            if len(times) < count and all(abs(at - taken) >= spacing for taken in times):
+                times.append(at)
+        times.sort()
+    return times
+
+
+def thumbnail_time(scenes: List[dict]) -> Optional[float]:
+    """The keyframe of the longest scene, which is what the video is mostly of"""
+    if not scenes:
+        return None
+    return max(scenes, key=lambda scene: scene["end"] - scene["start"])["keyframe"]
+
+
+def describe_visuals(scenes: List[dict], visual: Dict[str, Any]) -> List[str]:
+    """Visual elements as short phrases, for the analysis and its prompt"""
+    duration = scenes[-1]["end"] if scenes else 0
+    phrases = []
+    if scenes and duration:
+        average = duration / len(scenes)
+        pace = "快剪" if average < 3 else "慢节奏长镜头" if average > 12 else "中等节奏剪辑"
+        phrases.append(f"{len(scenes)}个镜头，平均{average:.1f}秒，{pace}")
+    brightness, saturation = visual.get("brightness", 0.5), visual.get("saturation", 0.3)
+    phrases.append("画面明亮" if brightness > 0.6 else "画面偏暗" if brightness < 0.3 else "画面亮度适中")
+    phrases.append("色彩鲜艳" if saturation > 0.45 else "低饱和色调" if saturation < 0.15 else "色彩自然")
+    if visual.get("motion", 0) > 0.06:
+        phrases.append("镜头运动较多")
+    elif visual.get("motion", 0) < 0.01:
+        phrases.append("以固定机位为主")
+    if visual.get("colors"):
+        phrases.append(f"主色调：{'、'.join(visual['colors'])}")
+    return phrases
+
+
+class SceneService:
+    """
+    Finds scene cuts and keyframes in video.
+
+    Frames are sampled at SCENE_SAMPLE_FPS and a few dozen pixels wide,
+    so decoding dominates and the analysis is a handful of array
+    operations per batch. Results are stored per file (see
+    StorageService.source_id), so a file is scanned once however many
+    contents, analyses and renders use it. Concurrent scans of one file
+    are coalesced: in this process by sharing its task, across nodes by a
+    lease whose holder the others wait for.
+    """
+
+    def __init__(self):
+        self._scans: Dict[str, "asyncio.Future[Optional[VideoScenes]]"] = {}
+        self.detected = 0
+        self.cache_hits = 0
+        self.video_seconds = 0.0
+        self.processing_seconds = 0.0
+
+    @property
+    def available(self) -> bool:
+        return settings.SCENE_DETECTION_ENABLED
+
+    async def stored_scenes(self, content: Content) -> Optional[VideoScenes]:
+        """The content's scenes if its file was scanned before; never scans, so safe in a request"""
+        if content.content_type not in VIDEO_CONTENT_TYPES:
+            return None
+        async with read_only_session_maker() as db:
+            return await db.get(VideoScenes, storage_service.source_id(content.file_hash, content.original_file_url))
+
+    async def get_scenes(self, content: Content) -> Optional[VideoScenes]:
+        """
+        The content's scenes, scanning its file unless that was done before.
+
+        Scanning decodes the whole video, so this belongs in jobs; requests
+        use stored_scenes. Returns None for content without video, when
+        detection is off, or when the file can't be decoded.
+        """
+        if not self.available or content.content_type not in VIDEO_CONTENT_TYPES:
+            return None
+
+        stored = await self.stored_scenes(content)
+        if stored is not None:
+            self.cache_hits += 1
+            return stored
+
+        file_id = storage_service.source_id(content.file_hash, content.original_file_url)
+        scan = self._scans.get(file_id)
+        if scan is None:
+            scan = asyncio.ensure_future(self._scan(content, file_id))
+            self._scans[file_id] = scan
+            scan.add_done_callback(lambda _: self._scans.pop(file_id, None))
+        # A caller giving up doesn't cancel the scan the others wait for
+        return await asyncio.shield(scan)
+
+    def _lock_key(self, file_id: str) -> str:
+        return f"scenes:lock:{file_id}"
+
+    async def _scan(self, content: Content, file_id: str) -> Optional[VideoScenes]:
+        """Scan the file as the only node doing so, or wait for the node that is"""
+        try:
+            lease = await RedisLease.acquire(self._lock_key(file_id), settings.SCENE_LOCK_LEASE_SECONDS)
+            if lease is None:
+                while await RedisLease.is_held(self._lock_key(file_id)):
+                    await asyncio.sleep(settings.SCENE_WAIT_POLL_SECONDS)
+                # None if that scan failed; it would fail here the same way
+                return await self.stored_scenes(content)
+        except RedisError as e:
+            # Without Redis only in-process coalescing applies
+            logger.warning("Scene lock unavailable for content %s: %s", content.id, e)
+            lease = None
+
+        keep_alive = asyncio.create_task(lease.keep_alive()) if lease else None
+        try:
+            source = await storage_service.get_readable_source(content.original_file_url)
+            if source is None:
+                return None
+            try:
+                result = await self.detect(source)
+            except MediaError as e:
+                logger.warning("No scenes for content %s: %s", content.id, e)
+                return None
+
+            try:
+                async with unit_of_work() as db:
+                    await db.execute(
+                        pg_insert(VideoScenes)
+                        .values(file_hash=file_id, **result)
+                        .on_conflict_do_nothing(index_elements=[VideoScenes.file_hash])
+                    )
+            except Exception:
+                # Still worth using for this caller; the next one scans again
+                logger.exception("Storing the scenes of content %s failed", content.id)
+            return VideoScenes(file_hash=file_id, **result)
+        finally:
+            if keep_alive is not None:
+                keep_alive.cancel()
+            if lease is not None:
+                try:
+                    await lease.release()
+                except RedisError as e:
+                    # The lease expires on its own
+                    logger.warning("Failed to release scene lock for content %s: %s", content.id, e)
+
+    async def detect(self, source: str) -> Dict[str, Any]:
+        """Detect the scenes of a video; source is a path or URL ffmpeg can read"""
+        start = time.perf_counter()
+        result = await asyncio.get_running_loop().run_in_executor(None, self._detect, source)
+        self.detected += 1
+        self.video_seconds += result["duration_seconds"]
+        self.processing_seconds += time.perf_counter() - start
+        return result
+
+    def _detect(self, source: str) -> Dict[str, Any]:
+        info = probe_media(source)
+        if not info.width:
+            raise MediaError("Source has no video stream")
+        width = settings.SCENE_FRAME_WIDTH
+        height = max(2, round(width * info.height / info.width))
+        fps = settings.SCENE_SAMPLE_FPS
+        result = detect_scenes(
+            sample_frames(source, fps, width, height, settings.SCENE_BATCH_FRAMES),
+            fps, settings.SCENE_CUT_THRESHOLD, settings.SCENE_MIN_SECONDS
+        )
+        if info.duration:
+            result["duration_seconds"] = round(info.duration, 2)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "available": self.available,
+            "detected": self.detected,
+            "cache_hits": self.cache_hits,
+            "video_seconds": round(self.video_seconds, 1),
+            "processing_seconds": round(self.processing_seconds, 1),
+            # Seconds of video per second of processing
+            "speed": round(self.video_seconds / self.processing_seconds, 2) if self.processing_seconds else None
+        }
+
+
+scene_service = SceneService()
@@ -1,26 +1,65 @@
 """
 Storage service for file upload and management
 """
+import asyncio
+import functools
+import hashlib
 import os
+import shutil
 import uuid
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Protocol
 import boto3
+from botocore.config import Config as BotoConfig
 from botocore.exceptions import ClientError
 import aiofiles
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..core.config import settings
+from ..core.database import after_commit, on_rollback
+from ..core.metrics import MetricsRegistry
+from ..models.blob import StoredBlob
+
+
+class AsyncReadable(Protocol):
+    """Anything with an async read(size), such as FastAPI's UploadFile"""
+
+    async def read(self, size: int = -1) -> bytes:
+        ...
+
+
+@dataclass
+class StoredFile:
+    """Result of a streamed or chunked upload"""
+    url: str
+    file_key: str
+    size: int
+    sha256: Optional[str]  # Not known for S3 multipart assembled from out-of-order parts
 
 
 class StorageService:
     """Service for cloud storage operations"""
 
+    BLOB_FOLDER = "blobs"
+
     def __init__(self):
         if settings.AWS_ACCESS_KEY_ID and settings.AWS_SECRET_ACCESS_KEY:
+            # One client shared by all executor threads; its connection pool is
+            # sized to the executor so no thread waits on a connection
             self.s3_client = boto3.client(
                 's3',
                 aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
                 aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-                region_name=settings.AWS_REGION
+                region_name=settings.AWS_REGION,
+                endpoint_url=settings.S3_ENDPOINT_URL or None,
+                config=BotoConfig(
+                    max_pool_connections=max(settings.S3_MAX_POOL_CONNECTIONS, settings.STORAGE_MAX_WORKERS),
+                    tcp_keepalive=True,
+                    retries={"max_attempts": 3, "mode": "standard"}
+                )
             )
         else:
             self.s3_client = None
@@ -28,7 +67,33 @@ class StorageService:
         self.bucket_name = settings.S3_BUCKET_NAME
         self.local_storage_path = "/tmp/crosspilot_uploads"
 
-    def _generate_file_key(self, user_id: int, filename: str, folder: str = "uploads") -> str:
+        # Blocking boto3 calls run here so they never stall the event loop
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.STORAGE_MAX_WORKERS,
+            thread_name_prefix="storage"
+        )
+        self.metrics = MetricsRegistry()
+
+    async def _s3(self, operation: str, *args: Any, nbytes: int = 0, **kwargs: Any) -> Any:
+        """Run an S3 client method on the storage executor and record its latency"""
+        method: Callable[..., Any] = getattr(self.s3_client, operation)
+        loop = asyncio.get_running_loop()
+        with self.metrics.measure(f"s3.{operation}", nbytes):
+            return await loop.run_in_executor(
+                self._executor, functools.partial(method, *args, **kwargs)
+            )
+
+    def _object_url(self, file_key: str) -> str:
+        """Public URL of an object in the bucket"""
+        if settings.S3_ENDPOINT_URL:
+            return f"{settings.S3_ENDPOINT_URL.rstrip('/')}/{self.bucket_name}/{file_key}"
+        return f"https://{self.bucket_name}.s3.{settings.AWS_REGION}.amazonaws.com/{file_key}"
+
+    def shutdown(self) -> None:
+        """Stop the storage executor"""
+        self._executor.shutdown(wait=False)
+
+    def generate_file_key(self, user_id: int, filename: str, folder: str = "uploads") -> str:
         """Generate unique file key for storage"""
         ext = os.path.splitext(filename)[1]
         unique_id = str(uuid.uuid4())
@@ -43,17 +108,19 @@ class StorageService:
         folder: str = "uploads"
     ) -> str:
         """Upload file to storage and return URL"""
-        file_key = self._generate_file_key(user_id, filename, folder)
+        file_key = self.generate_file_key(user_id, filename, folder)
 
         if self.s3_client:
             try:
-                self.s3_client.put_object(
+                await self._s3(
+                    "put_object",
+                    nbytes=len(file_content),
                     Bucket=self.bucket_name,
                     Key=file_key,
                     Body=file_content,
                     ContentType=content_type
                 )
-                return f"https://{self.bucket_name}.s3.{settings.AWS_REGION}.amazonaws.com/{file_key}"
+                return self._object_url(file_key)
             except ClientError as e:
                 raise Exception(f"Failed to upload to S3: {str(e)}")
         else:
@@ -61,11 +128,312 @@ class StorageService:
             os.makedirs(os.path.join(self.local_storage_path, folder, str(user_id)), exist_ok=True)
             file_path = os.path.join(self.local_storage_path, file_key)
 
-            async with aiofiles.open(file_path, 'wb') as f:
-                await f.write(file_content)
+            with self.metrics.measure("local.write", len(file_content)):
+                async with aiofiles.open(file_path, 'wb') as f:
+                    await f.write(file_content)
 
             return f"file://{file_path}"
 
+    async def upload_stream(
+        self,
+        user_id: int,
+        stream: AsyncReadable,
+        filename: str,
+        content_type: str,
+        folder: str = "uploads"
+    ) -> StoredFile:
+        """
+        Upload a file from a stream without holding it in memory.
+
+        The stream is read in fixed-size chunks while size and SHA-256 are
+        computed on the fly. S3 uploads use multipart upload with several
+        parts in flight, so memory stays bounded by part size x concurrency.
+        """
+        file_key = self.generate_file_key(user_id, filename, folder)
+
+        if self.s3_client:
+            with self.metrics.measure("s3.upload_stream") as sample:
+                size, digest = await self._upload_stream_s3(stream, file_key, content_type)
+                sample.nbytes = size
+            url = self._object_url(file_key)
+        else:
+            size, digest = await self._upload_stream_local(stream, file_key)
+            url = f"file://{os.path.join(self.local_storage_path, file_key)}"
+
+        return StoredFile(url=url, file_key=file_key, size=size, sha256=digest)
+
+    async def _read_chunk(self, stream: AsyncReadable, size: int) -> bytes:
+        """Read up to size bytes, tolerating short reads"""
+        parts = []
+        remaining = size
+        while remaining > 0:
+            data = await stream.read(remaining)
+            if not data:
+                break
+            parts.append(data)
+            remaining -= len(data)
+        return b"".join(parts)
+
+    async def _upload_stream_local(self, stream: AsyncReadable, file_key: str):
+        file_path = os.path.join(self.local_storage_path, file_key)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+        hasher = hashlib.sha256()
+        size = 0
+        with self.metrics.measure("local.write_stream") as sample:
+            async with aiofiles.open(file_path, 'wb') as f:
+                while True:
+                    chunk = await stream.read(settings.UPLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    hasher.update(chunk)
+                    size += len(chunk)
+                    await f.write(chunk)
+            sample.nbytes = size
+        return size, hasher.hexdigest()
+
+    async def _upload_stream_s3(self, stream: AsyncReadable, file_key: str, content_type: str):
+        hasher = hashlib.sha256()
+        part_size = max(settings.S3_MULTIPART_PART_SIZE, 5 * 1024 * 1024)  # S3 minimum part size
+
+        first = await self._read_chunk(stream, part_size)
+        hasher.update(first)
+        if len(first) < part_size:
+            # Small file: a single PUT is cheaper than a multipart upload
+            try:
+                await self._s3(
+                    "put_object",
+                    nbytes=len(first),
+                    Bucket=self.bucket_name,
+                    Key=file_key,
+                    Body=first,
+                    ContentType=content_type
+                )
+            except ClientError as e:
+                raise Exception(f"Failed to upload to S3: {str(e)}")
+            return len(first), hasher.hexdigest()
+
+        try:
+            upload = await self._s3(
+                "create_multipart_upload",
+                Bucket=self.bucket_name,
+                Key=file_key,
+                ContentType=content_type
+            )
+        except ClientError as e:
+            raise Exception(f"Failed to upload to S3: {str(e)}")
+        upload_id = upload["UploadId"]
+
+        # The semaphore is taken before reading each part, bounding buffered parts
+        semaphore = asyncio.Semaphore(max(1, settings.S3_MULTIPART_CONCURRENCY))
+        etags = {}
+
+        async def upload_part(part_number: int, body: bytes):
+            try:
+                response = await self._s3(
+                    "upload_part",
+                    nbytes=len(body),
+                    Bucket=self.bucket_name,
+                    Key=file_key,
+                    UploadId=upload_id,
+                    PartNumber=part_number,
+                    Body=body
+                )
+                etags[part_number] = response["ETag"]
+            finally:
+                semaphore.release()
+
+        tasks = []
+        size = len(first)
+        try:
+            await semaphore.acquire()
+            tasks.append(asyncio.create_task(upload_part(1, first)))
+            del first
+
+            part_number = 1
+            while True:
+                await semaphore.acquire()
+                chunk = await self._read_chunk(stream, part_size)
+                if not chunk:
+                    semaphore.release()
+                    break
+                hasher.update(chunk)
+                size += len(chunk)
+                part_number += 1
+                tasks.append(asyncio.create_task(upload_part(part_number, chunk)))
+
+            await asyncio.gather(*tasks)
+            await self._s3(
+                "complete_multipart_upload",
+                Bucket=self.bucket_name,
+                Key=file_key,
+                UploadId=upload_id,
+                MultipartUpload={
+                    "Parts": [
+                        {"PartNumber": number, "ETag": etags[number]}
+                        for number in sorted(etags)
+                    ]
+                }
+            )
+        except BaseException as e:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            try:
+                await self._s3(
+                    "abort_multipart_upload",
+                    Bucket=self.bucket_name,
+                    Key=file_key,
+                    UploadId=upload_id
+                )
+            except ClientError:
+                pass  # Orphaned parts are cleaned up by the bucket lifecycle rule
+            if isinstance(e, ClientError):
+                raise Exception(f"Failed to upload to S3: {str(e)}")
+            raise
+
+        return size, hasher.hexdigest()
+
+    # Chunked uploads: parts may arrive in any order and are assembled on finish.
+    # S3 maps chunks to multipart parts; local storage keeps one file per part.
+
+    def _local_parts_dir(self, upload_id: str) -> str:
+        return os.path.join(self.local_storage_path, "_parts", upload_id)
+
+    async def begin_chunked_upload(self, upload_id: str, file_key: str, content_type: str) -> Optional[str]:
+        """Prepare a chunked upload; returns the S3 multipart upload id when using S3"""
+        if self.s3_client:
+            try:
+                upload = await self._s3(
+                    "create_multipart_upload",
+                    Bucket=self.bucket_name,
+                    Key=file_key,
+                    ContentType=content_type
+                )
+            except ClientError as e:
+                raise Exception(f"Failed to start S3 upload: {str(e)}")
+            return upload["UploadId"]
+
+        os.makedirs(self._local_parts_dir(upload_id), exist_ok=True)
+        return None
+
+    async def write_chunk(
+        self,
+        upload_id: str,
+        file_key: str,
+        s3_upload_id: Optional[str],
+        index: int,
+        data: bytes
+    ) -> Optional[str]:
+        """Store one chunk; returns the part ETag when using S3"""
+        if self.s3_client:
+            try:
+                response = await self._s3(
+                    "upload_part",
+                    nbytes=len(data),
+                    Bucket=self.bucket_name,
+                    Key=file_key,
+                    UploadId=s3_upload_id,
+                    PartNumber=index + 1,
+                    Body=data
+                )
+            except ClientError as e:
+                raise Exception(f"Failed to upload part to S3: {str(e)}")
+            return response["ETag"]
+
+        # Write to a temp name and rename so a dropped request never leaves a torn part
+        part_path = os.path.join(self._local_parts_dir(upload_id), f"{index}.part")
+        tmp_path = f"{part_path}.{uuid.uuid4().hex}.tmp"
+        with self.metrics.measure("local.write_chunk", len(data)):
+            async with aiofiles.open(tmp_path, 'wb') as f:
+                await f.write(data)
+            os.replace(tmp_path, part_path)
+        return None
+
+    async def finish_chunked_upload(
+        self,
+        upload_id: str,
+        file_key: str,
+        s3_upload_id: Optional[str],
+        total_chunks: int,
+        etags: Dict[int, str]
+    ) -> StoredFile:
+        """Assemble all chunks into the final object"""
+        if self.s3_client:
+            try:
+                await self._s3(
+                    "complete_multipart_upload",
+                    Bucket=self.bucket_name,
+                    Key=file_key,
+                    UploadId=s3_upload_id,
+                    MultipartUpload={
+                        "Parts": [
+                            {"PartNumber": index + 1, "ETag": etags[index]}
+                            for index in range(total_chunks)
+                        ]
+                    }
+                )
+                head = await self._s3("head_object", Bucket=self.bucket_name, Key=file_key)
+            except ClientError as e:
+                raise Exception(f"Failed to complete S3 upload: {str(e)}")
+            return StoredFile(
+                url=self._object_url(file_key),
+                file_key=file_key,
+                size=head["ContentLength"],
+                sha256=None
+            )
+
+        file_path = os.path.join(self.local_storage_path, file_key)
+        loop = asyncio.get_running_loop()
+        with self.metrics.measure("local.assemble") as sample:
+            size, digest = await loop.run_in_executor(
+                self._executor,
+                self._assemble_local_parts,
+                self._local_parts_dir(upload_id),
+                total_chunks,
+                file_path
+            )
+            sample.nbytes = size
+        return StoredFile(url=f"file://{file_path}", file_key=file_key, size=size, sha256=digest)
+
+    def _assemble_local_parts(self, parts_dir: str, total_chunks: int, file_path: str):
+        """Concatenate part files in order while hashing (runs on the executor)"""
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        hasher = hashlib.sha256()
+        size = 0
+        with open(file_path, 'wb') as out:
+            for index in range(total_chunks):
+                with open(os.path.join(parts_dir, f"{index}.part"), 'rb') as part:
+                    while True:
+                        block = part.read(settings.UPLOAD_CHUNK_SIZE)
+                        if not block:
+                            break
+                        hasher.update(block)
+                        size += len(block)
+                        out.write(block)
+        shutil.rmtree(parts_dir, ignore_errors=True)
+        return size, hasher.hexdigest()
+
+    async def abort_chunked_upload(self, upload_id: str, file_key: str, s3_upload_id: Optional[str]) -> None:
+        """Discard all chunks of an unfinished upload"""
+        if self.s3_client:
+            if s3_upload_id:
+                try:
+                    await self._s3(
+                        "abort_multipart_upload",
+                        Bucket=self.bucket_name,
+                        Key=file_key,
+                        UploadId=s3_upload_id
+                    )
+                except ClientError:
+                    pass  # Already completed or aborted
+            return
+
+        await asyncio.get_running_loop().run_in_executor(
+            self._executor,
+            functools.partial(shutil.rmtree, self._local_parts_dir(upload_id), ignore_errors=True)
+        )
+
     async def get_presigned_url(
         self,
         file_key: str,
@@ -76,7 +444,8 @@ class StorageService:
             return None
 
         try:
-            url = self.s3_client.generate_presigned_url(
+            url = await self._s3(
+                "generate_presigned_url",
                 'get_object',
                 Params={'Bucket': self.bucket_name, 'Key': file_key},
                 ExpiresIn=expiration
@@ -85,21 +454,189 @@ class StorageService:
         except ClientError:
             return None
 
-    async def delete_file(self, file_key: str) -> bool:
-        """Delete file from storage"""
+    async def read_file(self, url: str) -> bytes:
+        """Read a stored file into memory; meant for small files such as images"""
+        file_key = self.file_key_from_url(url)
+        if file_key is None:
+            raise ValueError(f"Not a stored file: {url}")
+
+        if self.s3_client:
+            response = await self._s3("get_object", Bucket=self.bucket_name, Key=file_key)
+            loop = asyncio.get_running_loop()
+            with self.metrics.measure("s3.read_body") as sample:
+                data = await loop.run_in_executor(self._executor, response["Body"].read)
+                sample.nbytes = len(data)
+            return data
+
+        with self.metrics.measure("local.read") as sample:
+            async with aiofiles.open(os.path.join(self.local_storage_path, file_key), "rb") as f:
+                data = await f.read()
+            sample.nbytes = len(data)
+        return data
+
+    async def get_readable_source(self, url: str, expiration: int = 3600) -> Optional[str]:
+        """A local path or presigned URL that ffmpeg can read a stored file from without downloading it first"""
+        file_key = self.file_key_from_url(url)
+        if file_key is None:
+            return None
+        if self.s3_client:
+            return await self.get_presigned_url(file_key, expiration)
+        return os.path.join(self.local_storage_path, file_key)
+
+    async def delete_file(self, file_key: str, db: Optional[AsyncSession] = None) -> bool:
+        """
+        Delete file from storage.
+
+        Content-addressed blobs are shared, so for those this drops one
+        reference (which needs db) and only removes the object once nothing
+        references it.
+        """
+        if file_key.startswith(f"{self.BLOB_FOLDER}/"):
+            if db is None:
+                return False
+            sha256 = os.path.splitext(os.path.basename(file_key))[0]
+            return await self.release_blob(db, sha256)
+
+        return await self._delete_object(file_key)
+
+    async def _delete_object(self, file_key: str) -> bool:
         if self.s3_client:
             try:
-                self.s3_client.delete_object(Bucket=self.bucket_name, Key=file_key)
+                await self._s3("delete_object", Bucket=self.bucket_name, Key=file_key)
                 return True
             except ClientError:
                 return False
         else:
             file_path = os.path.join(self.local_storage_path, file_key)
-            if os.path.exists(file_path):
-                os.remove(file_path)
+            try:
+                await asyncio.get_running_loop().run_in_executor(self._executor, os.remove, file_path)
                 return True
+            except FileNotFoundError:
+                return False
+
+    # Content-addressed storage: identical uploads share one object keyed by
+    # SHA-256, with a reference count in stored_blobs.
+
+    def _blob_key(self, sha256: str, filename: str) -> str:
+        ext = os.path.splitext(filename)[1].lower()
+        return f"{self.BLOB_FOLDER}/{sha256[:2]}/{sha256}{ext}"
+
+    def source_id(self, file_hash: Optional[str], url: str) -> str:
+        """
+        A 64-character key for results derived from a stored file (transcripts, scenes).
+
+        The file's SHA-256 when known. Files stored without one (S3 uploads
+        assembled from parts) are keyed by their URL, which no other upload shares.
+        """
+        return file_hash or hashlib.sha256(f"url:{url}".encode("utf-8")).hexdigest()
+
+    def file_key_from_url(self, url: str) -> Optional[str]:
+        """Recover the storage key from a URL produced by this service"""
+        if url.startswith("file://"):
+            prefix = f"file://{self.local_storage_path}/"
+            return url[len(prefix):] if url.startswith(prefix) else None
+        marker = f"/{self.bucket_name}/" if settings.S3_ENDPOINT_URL else ".amazonaws.com/"
+        _, found, key = url.partition(marker)
+        return key if found else None
+
+    async def _move_object(self, src_key: str, dst_key: str) -> None:
+        if self.s3_client:
+            # Managed copy switches to multipart copy for objects over 5 GB
+            await self._s3(
+                "copy",
+                {"Bucket": self.bucket_name, "Key": src_key},
+                self.bucket_name,
+                dst_key
+            )
+            await self._delete_object(src_key)
+        else:
+            dst_path = os.path.join(self.local_storage_path, dst_key)
+            os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+            os.replace(os.path.join(self.local_storage_path, src_key), dst_path)
+
+    async def store_blob(self, db: AsyncSession, stored: StoredFile, filename: str) -> StoredFile:
+        """
+        Move a freshly uploaded file into content-addressed storage.
+
+        If an identical blob already exists the upload is discarded and the
+        existing object is referenced instead. The blob row is locked for the
+        rest of the transaction, so concurrent uploads of the same file and
+        concurrent deletes are serialized. If the transaction rolls back, a
+        moved upload is moved back to its original key; a duplicate upload is
+        only deleted once the new reference has committed.
+        """
+        if not stored.sha256:
+            return stored
+
+        blob_key = self._blob_key(stored.sha256, filename)
+        await db.execute(
+            pg_insert(StoredBlob)
+            .values(sha256=stored.sha256, file_key=blob_key, size=stored.size, ref_count=0)
+            .on_conflict_do_nothing(index_elements=[StoredBlob.sha256])
+        )
+        result = await db.execute(
+            select(StoredBlob)
+            .where(StoredBlob.sha256 == stored.sha256)
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        )
+        blob = result.scalar_one()
+
+        upload_key = stored.file_key
+        if blob.ref_count == 0:
+            # New blob: the upload becomes the shared copy
+            await self._move_object(upload_key, blob.file_key)
+            blob_key = blob.file_key
+
+            async def restore_upload():
+                # Runs while the blob row is still locked, before its insert is undone
+                await self._move_object(blob_key, upload_key)
+
+            on_rollback(db, restore_upload)
+        else:
+            async def delete_upload():
+                await self._delete_object(upload_key)
+
+            after_commit(db, delete_upload)
+
+        blob.ref_count += 1
+        await db.flush()
+
+        if self.s3_client:
+            url = self._object_url(blob.file_key)
+        else:
+            url = f"file://{os.path.join(self.local_storage_path, blob.file_key)}"
+        return StoredFile(url=url, file_key=blob.file_key, size=blob.size, sha256=blob.sha256)
+
+    async def release_blob(self, db: AsyncSession, sha256: str) -> bool:
+        """Drop one reference to a blob, deleting it when none remain"""
+        result = await db.execute(
+            select(StoredBlob)
+            .where(StoredBlob.sha256 == sha256)
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        )
+        blob = result.scalar_one_or_none()
+        if blob is None:
             return False
 
+        blob.ref_count -= 1
+        if blob.ref_count > 0:
+            await db.flush()
+            return True
+
+        await db.delete(blob)
+        await db.flush()
+
+        # Only remove the object once the row deletion is durable
+        file_key = blob.file_key
+
+        async def delete_object():
+            await self._delete_object(file_key)
+
+        after_commit(db, delete_object)
+        return True
+
 
 # Create singleton instance
 storage_service = StorageService()
@@ -0,0 +1,227 @@
+"""
+Speech-to-text for video and audio content
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from ..core.config import settings
+from ..core.database import read_only_session_maker, unit_of_work
+from ..models.content import Content, ContentType
+from ..models.transcript import Transcript
+from ..utils.media import MediaError, decode_audio, split_on_silence
+from .storage_service import storage_service
+
+try:
+    import whisper
+except ImportError:  # Optional; without it content is analyzed from its text fields only
+    whisper = None
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000  # What whisper models expect
+SPEECH_CONTENT_TYPES = {ContentType.VIDEO, ContentType.AUDIO, ContentType.LIVE_RECORDING}
+
+# Loaded once per pool process by _load_model
+_model = None
+
+
+def _load_model(name: str, threads: int) -> None:
+    global _model
+    import torch
+    # Pool processes share the cores instead of each starting one thread per core
+    torch.set_num_threads(threads)
+    _model = whisper.load_model(name, device="cpu")
+
+
+def _transcribe_segment(samples: np.ndarray, offset: float, language: Optional[str]) -> Dict[str, Any]:
+    """Transcribe one int16 segment in a pool process; timestamps are shifted to the whole file"""
+    result = _model.transcribe(
+        samples.astype(np.float32) / 32768.0,
+        language=language,
+        fp16=False,
+        # Each segment starts cold; carrying text over would only tie them together
+        condition_on_previous_text=False,
+        verbose=None
+    )
+    return {
+        "language": result.get("language"),
+        "segments": [
+            {
+                "start": round(offset + segment["start"], 2),
+                "end": round(offset + segment["end"], 2),
+                "text": segment["text"].strip()
+            }
+            for segment in result["segments"]
+            if segment["text"].strip()
+        ]
+    }
+
+
+class TranscriptionService:
+    """
+    Transcribes speech with whisper on CPU.
+
+    The audio track is decoded once, cut into segments in pauses, and the
+    segments are transcribed in parallel across a process pool, then
+    stitched back in order with file-relative timestamps. Transcripts are
+    stored per file (see StorageService.source_id), so a file is
+    transcribed once no matter how often or by whom its content is analyzed.
+    """
+
+    def __init__(self):
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.transcribed = 0
+        self.cache_hits = 0
+        self.audio_seconds = 0.0
+        self.processing_seconds = 0.0
+
+    @property
+    def available(self) -> bool:
+        return settings.TRANSCRIBE_ENABLED and whisper is not None
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            processes = max(1, settings.TRANSCRIBE_PROCESSES)
+            self._pool = ProcessPoolExecutor(
+                max_workers=processes,
+                # Forking a process with a running event loop and open sockets is unsafe
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_load_model,
+                initargs=(settings.WHISPER_MODEL, max(1, (os.cpu_count() or 1) // processes))
+            )
+        return self._pool
+
+    def shutdown(self) -> None:
+        """Stop the whisper processes"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def get_transcript(self, content: Content) -> Optional[Transcript]:
+        """
+        The content's transcript, from the store when its file was transcribed before.
+
+        Returns None for content without speech, when transcription is
+        unavailable, or when it fails for any reason (unreadable audio,
+        whisper errors, a crashed pool process): the content is then
+        analyzed from its text fields alone. A new transcript is committed
+        right away, so it survives an analysis that fails after it.
+        """
+        if not self.available or content.content_type not in SPEECH_CONTENT_TYPES:
+            return None
+
+        file_id = storage_service.source_id(content.file_hash, content.original_file_url)
+        async with read_only_session_maker() as db:
+            stored = await db.get(Transcript, file_id)
+        if stored is not None:
+            self.cache_hits += 1
+            return stored
+
+        try:
+            source = await storage_service.get_readable_source(content.original_file_url)
+            if source is None:
+                return None
+            result = await self.transcribe(source)
+        except MediaError as e:
+            logger.warning("No transcript for content %s: %s", content.id, e)
+            return None
+        except Exception:
+            logger.exception("Transcribing content %s failed", content.id)
+            return None
+
+        transcript = Transcript(
+            file_hash=file_id,
+            language=result["language"],
+            text=result["text"],
+            segments=result["segments"],
+            duration_seconds=result["duration_seconds"],
+            model=settings.WHISPER_MODEL
+        )
+        try:
+            async with unit_of_work() as db:
+                # Another content with the same file may have stored it meanwhile
+                await db.execute(
+                    pg_insert(Transcript)
+                    .values(
+                        file_hash=transcript.file_hash,
+                        language=transcript.language,
+                        text=transcript.text,
+                        segments=transcript.segments,
+                        duration_seconds=transcript.duration_seconds,
+                        model=transcript.model
+                    )
+                    .on_conflict_do_nothing(index_elements=[Transcript.file_hash])
+                )
+        except Exception:
+            # Still worth using for this analysis; the next one transcribes again
+            logger.exception("Storing the transcript of content %s failed", content.id)
+        return transcript
+
+    async def transcribe(self, source: str) -> Dict[str, Any]:
+        """Transcribe a file's audio; source is a path or URL ffmpeg can read"""
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        samples = await loop.run_in_executor(None, decode_audio, source, SAMPLE_RATE)
+        ranges = await loop.run_in_executor(
+            None, split_on_silence, samples, SAMPLE_RATE,
+            settings.TRANSCRIBE_SEGMENT_SECONDS, settings.TRANSCRIBE_MIN_SEGMENT_SECONDS
+        )
+
+        pool = self._executor()
+        language = settings.TRANSCRIBE_LANGUAGE
+        results: List[Dict[str, Any]] = []
+        try:
+            if ranges and language is None:
+                # Detect the language once, so every segment is decoded in the same one
+                first_start, first_end = ranges[0]
+                first = await loop.run_in_executor(
+                    pool, _transcribe_segment, samples[first_start:first_end], first_start / SAMPLE_RATE, None
+                )
+                language = first["language"]
+                results.append(first)
+                ranges = ranges[1:]
+
+            results.extend(await asyncio.gather(*(
+                loop.run_in_executor(pool, _transcribe_segment, samples[begin:end], begin / SAMPLE_RATE, language)
+                for begin, end in ranges
+            )))
+        except BrokenProcessPool:
+            # A process died (e.g. out of memory); start a fresh pool next time
+            self.shutdown()
+            raise
+
+        segments = [segment for result in results for segment in result["segments"]]
+        duration = len(samples) / SAMPLE_RATE
+        self.transcribed += 1
+        self.audio_seconds += duration
+        self.processing_seconds += time.perf_counter() - start
+        return {
+            "language": language,
+            # One line per segment, which sentence splitting downstream treats as a boundary
+            "text": "\n".join(segment["text"] for segment in segments),
+            "segments": segments,
+            "duration_seconds": round(duration, 2)
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "available": self.available,
+            "transcribed": self.transcribed,
+            "cache_hits": self.cache_hits,
+            "audio_seconds": round(self.audio_seconds, 1),
+            "processing_seconds": round(self.processing_seconds, 1),
+            # Seconds of audio per second of processing
+            "speed": round(self.audio_seconds / self.processing_seconds, 2) if self.processing_seconds else None
+        }
+
+
+transcription_service = TranscriptionService()
@@ -0,0 +1,245 @@
+"""
+Resumable chunked upload sessions
+"""
+import json
+import math
+import time
+import uuid
+from dataclasses import asdict
+from datetime import datetime
+from typing import Any, Dict, Optional
+from redis import asyncio as aioredis
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.config import settings
+from ..core.database import after_commit, on_rollback
+from ..core.redis import get_redis
+from ..schemas.upload import UploadSessionCreate, UploadSessionResponse
+from .storage_service import StorageService, StoredFile, storage_service
+
+S3_MIN_PART_SIZE = 5 * 1024 * 1024
+S3_MAX_PARTS = 10000
+
+
+class UploadSessionError(ValueError):
+    """Raised for requests that don't fit the session (bad chunk, incomplete upload)"""
+    pass
+
+
+class UploadService:
+    """
+    Tracks resumable uploads in Redis.
+
+    Each session records its metadata and received chunks; chunks map to S3
+    multipart parts or local part files. Sessions idle for longer than
+    UPLOAD_SESSION_TTL_SECONDS are aborted by cleanup_stale_sessions.
+    """
+
+    def __init__(self, storage: StorageService, redis: Optional[aioredis.Redis] = None):
+        self.storage = storage
+        self._redis = redis
+        self.active_key = "uploads:active"
+
+    @property
+    def redis(self) -> aioredis.Redis:
+        return self._redis or get_redis()
+
+    def _session_key(self, upload_id: str) -> str:
+        return f"upload:{upload_id}"
+
+    def _parts_key(self, upload_id: str) -> str:
+        return f"upload:{upload_id}:parts"
+
+    def _chunk_size(self, total_size: int, requested: Optional[int]) -> int:
+        """Clamp the chunk size to what S3 multipart allows"""
+        chunk_size = requested or settings.UPLOAD_SESSION_CHUNK_SIZE
+        chunk_size = min(max(chunk_size, S3_MIN_PART_SIZE), settings.UPLOAD_SESSION_MAX_CHUNK_SIZE)
+        return max(chunk_size, math.ceil(total_size / S3_MAX_PARTS))
+
+    async def _touch(self, upload_id: str) -> None:
+        """Record activity and extend the session's lifetime"""
+        ttl = settings.UPLOAD_SESSION_TTL_SECONDS
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.zadd(self.active_key, {upload_id: time.time()})
+            pipe.expire(self._session_key(upload_id), ttl * 2)
+            pipe.expire(self._parts_key(upload_id), ttl * 2)
+            await pipe.execute()
+
+    async def create_session(self, user_id: int, data: UploadSessionCreate) -> Dict[str, Any]:
+        """Start a new resumable upload"""
+        if data.total_size > settings.UPLOAD_MAX_FILE_SIZE:
+            raise UploadSessionError("File exceeds maximum upload size")
+
+        upload_id = uuid.uuid4().hex
+        chunk_size = self._chunk_size(data.total_size, data.chunk_size)
+        file_key = self.storage.generate_file_key(user_id, data.filename, "original")
+        s3_upload_id = await self.storage.begin_chunked_upload(upload_id, file_key, data.mime_type)
+
+        session = {
+            "upload_id": upload_id,
+            "user_id": str(user_id),
+            "filename": data.filename,
+            "mime_type": data.mime_type,
+            "title": data.title,
+            "description": data.description or "",
+            "content_type": data.content_type.value,
+            "total_size": str(data.total_size),
+            "chunk_size": str(chunk_size),
+            "total_chunks": str(math.ceil(data.total_size / chunk_size)),
+            "file_key": file_key,
+            "s3_upload_id": s3_upload_id or "",
+            "created_at": str(time.time())
+        }
+        await self.redis.hset(self._session_key(upload_id), mapping=session)
+        await self._touch(upload_id)
+        return session
+
+    async def get_session(self, upload_id: str, user_id: int) -> Optional[Dict[str, Any]]:
+        """Get a session owned by the user"""
+        session = await self.redis.hgetall(self._session_key(upload_id))
+        if not session or session.get("user_id") != str(user_id):
+            return None
+        return session
+
+    def _expected_chunk_length(self, session: Dict[str, Any], index: int) -> int:
+        total_size = int(session["total_size"])
+        chunk_size = int(session["chunk_size"])
+        total_chunks = int(session["total_chunks"])
+        if index == total_chunks - 1:
+            return total_size - chunk_size * (total_chunks - 1)
+        return chunk_size
+
+    async def put_chunk(self, session: Dict[str, Any], index: int, data: bytes) -> int:
+        """Store one chunk; re-sending a chunk replaces it. Returns chunks received so far"""
+        upload_id = session["upload_id"]
+        total_chunks = int(session["total_chunks"])
+        if not 0 <= index < total_chunks:
+            raise UploadSessionError(f"Chunk index must be between 0 and {total_chunks - 1}")
+
+        expected = self._expected_chunk_length(session, index)
+        if len(data) != expected:
+            raise UploadSessionError(f"Chunk {index} must be {expected} bytes, got {len(data)}")
+
+        etag = await self.storage.write_chunk(
+            upload_id,
+            session["file_key"],
+            session["s3_upload_id"] or None,
+            index,
+            data
+        )
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.hset(self._parts_key(upload_id), str(index), etag or "")
+            pipe.hlen(self._parts_key(upload_id))
+            _, received = await pipe.execute()
+        await self._touch(upload_id)
+        return received
+
+    async def get_state(self, session: Dict[str, Any]) -> UploadSessionResponse:
+        """Describe which chunks have arrived and which are still missing"""
+        upload_id = session["upload_id"]
+        total_chunks = int(session["total_chunks"])
+        chunk_size = int(session["chunk_size"])
+
+        received = {int(index) for index in await self.redis.hkeys(self._parts_key(upload_id))}
+        missing = [index for index in range(total_chunks) if index not in received]
+        last_activity = await self.redis.zscore(self.active_key, upload_id) or float(session["created_at"])
+
+        return UploadSessionResponse(
+            upload_id=upload_id,
+            filename=session["filename"],
+            total_size=int(session["total_size"]),
+            chunk_size=chunk_size,
+            total_chunks=total_chunks,
+            received_chunks=len(received),
+            missing_chunks=missing,
+            missing_offsets=[index * chunk_size for index in missing],
+            expires_at=datetime.utcfromtimestamp(last_activity + settings.UPLOAD_SESSION_TTL_SECONDS)
+        )
+
+    async def finalize(self, db: AsyncSession, session: Dict[str, Any]) -> StoredFile:
+        """
+        Assemble the uploaded chunks into the final file.
+
+        The session ends only once db's transaction commits. If it rolls
+        back (e.g. creating the content failed) the session stays, and a
+        retried finalize returns the file already assembled.
+        """
+        upload_id = session["upload_id"]
+        total_chunks = int(session["total_chunks"])
+
+        # Only one finalize may run; a concurrent retry gets a conflict error
+        lock_key = f"{self._session_key(upload_id)}:finalizing"
+        if not await self.redis.set(lock_key, "1", nx=True, ex=settings.UPLOAD_SESSION_TTL_SECONDS):
+            raise UploadSessionError("Upload is already being finalized")
+
+        try:
+            if session.get("assembled"):
+                stored = StoredFile(**json.loads(session["assembled"]))
+            else:
+                parts = await self.redis.hgetall(self._parts_key(upload_id))
+                missing = [index for index in range(total_chunks) if str(index) not in parts]
+                if missing:
+                    raise UploadSessionError(f"Missing chunks: {missing[:20]}")
+
+                stored = await self.storage.finish_chunked_upload(
+                    upload_id,
+                    session["file_key"],
+                    session["s3_upload_id"] or None,
+                    total_chunks,
+                    {int(index): etag for index, etag in parts.items()}
+                )
+                # Parts are gone once assembled; a retry must reuse the result
+                await self.redis.hset(self._session_key(upload_id), "assembled", json.dumps(asdict(stored)))
+        except BaseException:
+            await self.redis.delete(lock_key)
+            raise
+
+        async def end_session():
+            await self._delete_session(upload_id)
+            await self.redis.delete(lock_key)
+
+        async def unlock():
+            await self.redis.delete(lock_key)
+
+        after_commit(db, end_session)
+        on_rollback(db, unlock)
+        return stored
+
+    async def abort(self, session: Dict[str, Any]) -> None:
+        """Cancel an upload and discard its chunks"""
+        await self._discard(session["upload_id"], session)
+        await self._delete_session(session["upload_id"])
+
+    async def _discard(self, upload_id: str, session: Dict[str, Any]) -> None:
+        """Remove an upload's chunks, and its assembled file if a finalize never committed"""
+        await self.storage.abort_chunked_upload(upload_id, session["file_key"], session["s3_upload_id"] or None)
+        if session.get("assembled"):
+            await self.storage.delete_file(json.loads(session["assembled"])["file_key"])
+
+    async def _delete_session(self, upload_id: str) -> None:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.delete(self._session_key(upload_id), self._parts_key(upload_id))
+            pipe.zrem(self.active_key, upload_id)
+            await pipe.execute()
+
+    async def cleanup_stale_sessions(self) -> int:
+        """Abort sessions with no activity within the TTL; returns how many were removed"""
+        cutoff = time.time() - settings.UPLOAD_SESSION_TTL_SECONDS
+        removed = 0
+        for upload_id in await self.redis.zrangebyscore(self.active_key, "-inf", cutoff):
+            # zrem succeeds for exactly one caller, so concurrent cleaners don't collide
+            if not await self.redis.zrem(self.active_key, upload_id):
+                continue
+            session = await self.redis.hgetall(self._session_key(upload_id))
+            if session:
+                await self._discard(upload_id, session)
+            else:
+                # Metadata already expired; local part files may still be on disk
+                await self.storage.abort_chunked_upload(upload_id, "", None)
+            await self._delete_session(upload_id)
+            removed += 1
+        return removed
+
+
+# Create singleton instance
+upload_service = UploadService(storage_service)
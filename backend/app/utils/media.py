@@ -0,0 +1,279 @@
+"""
+Audio and video helpers for media processing
+"""
+import json
+import re
+import subprocess
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from ..core.config import settings
+
+
+class MediaError(Exception):
+    """ffmpeg could not read or convert a media file"""
+    pass
+
+
+_ASPECT = re.compile(r"^(\d+):(\d+)$")
+
+
+def _even(value: float) -> int:
+    # x264 with yuv420p needs even dimensions
+    return max(2, int(round(value / 2)) * 2)
+
+
+def parse_aspect_ratio(aspect_ratio: str) -> Tuple[int, int]:
+    """(9, 16) from "9:16" """
+    match = _ASPECT.match(aspect_ratio)
+    if not match or not int(match.group(1)) or not int(match.group(2)):
+        raise ValueError(f"Bad aspect ratio: {aspect_ratio}")
+    return int(match.group(1)), int(match.group(2))
+
+
+def variant_size(aspect_ratio: str, short_side: int) -> Tuple[int, int]:
+    """Output width and height for an aspect ratio like "9:16" at the given short side"""
+    w, h = parse_aspect_ratio(aspect_ratio)
+    if w <= h:
+        return _even(short_side), _even(short_side * h / w)
+    return _even(short_side * w / h), _even(short_side)
+
+
+@dataclass
+class MediaInfo:
+    width: Optional[int]  # None for audio-only files
+    height: Optional[int]
+    duration: float  # Seconds
+    has_audio: bool
+
+
+def probe_media(source: str) -> MediaInfo:
+    """Dimensions, duration and streams of a media file, from ffprobe"""
+    command = [
+        settings.FFPROBE_BINARY, "-v", "error",
+        "-show_entries", "stream=codec_type,width,height:stream_side_data=rotation:format=duration",
+        "-of", "json", source
+    ]
+    try:
+        result = subprocess.run(command, capture_output=True, check=True)
+    except FileNotFoundError as e:
+        raise MediaError(f"ffprobe not found: {settings.FFPROBE_BINARY}") from e
+    except subprocess.CalledProcessError as e:
+        raise MediaError(e.stderr.decode("utf-8", "replace").strip() or "ffprobe failed") from e
+
+    data = json.loads(result.stdout or b"{}")
+    streams = data.get("streams", [])
+    video = next((stream for stream in streams if stream.get("codec_type") == "video"), None)
+    width = height = None
+    if video is not None:
+        width, height = video.get("width"), video.get("height")
+        # Phone footage is often stored landscape with a rotation flag
+        rotation = next((int(side.get("rotation", 0)) for side in video.get("side_data_list", [])), 0)
+        if rotation % 180:
+            width, height = height, width
+    try:
+        duration = float(data.get("format", {}).get("duration", 0))
+    except (TypeError, ValueError):
+        duration = 0.0
+    return MediaInfo(
+        width=width,
+        height=height,
+        duration=duration,
+        has_audio=any(stream.get("codec_type") == "audio" for stream in streams)
+    )
+
+
+def extract_frame(source: str, at_seconds: float) -> bytes:
+    """
+    The frame at at_seconds as a high-quality JPEG.
+
+    -ss before -i seeks by the container index to the keyframe before the
+    position, so only the frames from there on are decoded.
+    """
+    command = [
+        settings.FFMPEG_BINARY, "-nostdin", "-hide_banner", "-loglevel", "error",
+        "-ss", f"{max(0.0, at_seconds):.3f}", "-i", source,
+        "-frames:v", "1", "-q:v", "2", "-f", "image2pipe", "-c:v", "mjpeg", "-"
+    ]
+    try:
+        result = subprocess.run(command, capture_output=True, check=True)
+    except FileNotFoundError as e:
+        raise MediaError(f"ffmpeg not found: {settings.FFMPEG_BINARY}") from e
+    except subprocess.CalledProcessError as e:
+        raise MediaError(e.stderr.decode("utf-8", "replace").strip() or "ffmpeg failed") from e
+    if not result.stdout:
+        raise MediaError(f"No frame at {at_seconds:.1f}s")
+    return result.stdout
+
+
+def decode_frames(source: str, timestamps: List[float], out: np.ndarray) -> None:
+    """
+    Decode the frames at timestamps into out, an (N, height, width, 3) uint8 array.
+
+    Frames are scaled to out's size and read from ffmpeg straight into the
+    array (which may be a np.memmap), one fast seek per frame.
+    """
+    count, height, width, _ = out.shape
+    if len(timestamps) != count:
+        raise ValueError(f"{len(timestamps)} timestamps for {count} frames")
+    for index, at_seconds in enumerate(timestamps):
+        command = [
+            settings.FFMPEG_BINARY, "-nostdin", "-hide_banner", "-loglevel", "error",
+            "-ss", f"{max(0.0, at_seconds):.3f}", "-i", source,
+            "-frames:v", "1", "-vf", f"scale={width}:{height}",
+            "-f", "rawvideo", "-pix_fmt", "rgb24", "-"
+        ]
+        try:
+            process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        except FileNotFoundError as e:
+            raise MediaError(f"ffmpeg not found: {settings.FFMPEG_BINARY}") from e
+        frame = memoryview(out[index].reshape(-1))
+        filled = 0
+        while filled < len(frame):
+            read = process.stdout.readinto(frame[filled:])
+            if not read:
+                break
+            filled += read
+        _, stderr = process.communicate()
+        if process.returncode != 0:
+            raise MediaError(stderr.decode("utf-8", "replace").strip() or "ffmpeg failed")
+        if filled < len(frame):
+            raise MediaError(f"No frame at {at_seconds:.1f}s")
+
+
+def sample_frames(
+    source: str,
+    fps: float,
+    width: int,
+    height: int,
+    batch_frames: int = 256
+) -> Iterator[np.ndarray]:
+    """
+    Frames at fps, scaled to width x height, as (N, height, width, 3) uint8 batches.
+
+    For analysis, not display: the deblocking filter is skipped, which
+    saves a good part of decoding time, and frames are scaled down right
+    after the fps filter drops the ones not sampled. Closing the generator
+    early stops ffmpeg.
+    """
+    command = [
+        settings.FFMPEG_BINARY, "-nostdin", "-hide_banner", "-loglevel", "error",
+        "-skip_loop_filter", "all", "-threads", "0",
+        "-i", source,
+        "-an", "-sn", "-dn",
+        "-vf", f"fps={fps},scale={width}:{height}:flags=area",
+        "-f", "rawvideo", "-pix_fmt", "rgb24", "-"
+    ]
+    try:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except FileNotFoundError as e:
+        raise MediaError(f"ffmpeg not found: {settings.FFMPEG_BINARY}") from e
+
+    frame_bytes = width * height * 3
+    try:
+        while True:
+            data = process.stdout.read(frame_bytes * batch_frames)
+            count = len(data) // frame_bytes
+            if count:
+                yield np.frombuffer(data, dtype=np.uint8, count=count * frame_bytes).reshape(count, height, width, 3)
+            if len(data) < frame_bytes * batch_frames:
+                break
+        # With loglevel error stderr stays small, so reading it last can't stall ffmpeg
+        stderr = process.stderr.read()
+        if process.wait() != 0:
+            raise MediaError(stderr.decode("utf-8", "replace").strip() or "ffmpeg failed")
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        process.stderr.close()
+
+
+def decode_audio(source: str, sample_rate: int = 16000) -> np.ndarray:
+    """
+    Decode a file's audio track to mono 16-bit PCM at sample_rate.
+
+    source is anything ffmpeg can open, including a presigned URL, so a
+    stored file is streamed rather than downloaded first. The video stream
+    is never decoded. Samples stay int16 (half the memory of float32)
+    until a segment is handed to the model.
+    """
+    command = [
+        settings.FFMPEG_BINARY, "-nostdin", "-hide_banner", "-loglevel", "error",
+        "-i", source,
+        "-vn", "-ac", "1", "-ar", str(sample_rate), "-f", "s16le", "-"
+    ]
+    try:
+        result = subprocess.run(command, capture_output=True, check=True)
+    except FileNotFoundError as e:
+        raise MediaError(f"ffmpeg not found: {settings.FFMPEG_BINARY}") from e
+    except subprocess.CalledProcessError as e:
+        raise MediaError(e.stderr.decode("utf-8", "replace").strip() or "ffmpeg failed") from e
+    return np.frombuffer(result.stdout, dtype=np.int16)
+
+
+def split_on_silence(
+    samples: np.ndarray,
+    sample_rate: int,
+    max_segment_seconds: float = 120.0,
+    min_segment_seconds: float = 10.0,
+    min_silence_seconds: float = 0.3,
+    frame_seconds: float = 0.02
+) -> List[Tuple[int, int]]:
+    """
+    Sample ranges [start, end) that cut the audio in pauses, not mid-word.
+
+    Frame loudness is RMS over frame_seconds; a frame is silent when it is
+    well below the recording's typical speech level, so the threshold
+    follows the recording's gain. Segments grow to at most
+    max_segment_seconds and end in the middle of the last pause before
+    that, provided it leaves at least min_segment_seconds; otherwise they
+    are hard-cut. Segments that are silent throughout are dropped.
+    """
+    frame = max(1, int(sample_rate * frame_seconds))
+    frames = len(samples) // frame
+    if frames == 0:
+        return [(0, len(samples))] if len(samples) else []
+
+    framed = samples[:frames * frame].reshape(frames, frame)
+    rms = np.empty(frames, dtype=np.float32)
+    # In blocks, so an hour of audio isn't copied to float all at once
+    for block in range(0, frames, 8192):
+        chunk = framed[block:block + 8192].astype(np.float32)
+        rms[block:block + 8192] = np.sqrt(np.einsum("ij,ij->i", chunk, chunk) / frame)
+    speech_level = np.percentile(rms, 90)
+    silent = rms < max(speech_level * 0.1, 100.0)
+    if silent.all():
+        return []
+
+    # Pauses as runs of silent frames: [start, end) in frames
+    edges = np.diff(np.concatenate(([0], silent.astype(np.int8), [0])))
+    run_starts = np.flatnonzero(edges == 1)
+    run_ends = np.flatnonzero(edges == -1)
+    long_enough = (run_ends - run_starts) * frame_seconds >= min_silence_seconds
+    cuts = ((run_starts[long_enough] + run_ends[long_enough]) // 2).tolist()
+
+    max_frames = int(max_segment_seconds / frame_seconds)
+    min_frames = int(min_segment_seconds / frame_seconds)
+    bounds = [0]
+    last_pause = None
+    for cut in cuts + [frames]:
+        while cut - bounds[-1] > max_frames:
+            # Too long to reach this pause: end at the previous one, or hard-cut without one
+            if last_pause is not None and last_pause - bounds[-1] >= min_frames:
+                bounds.append(last_pause)
+            else:
+                bounds.append(bounds[-1] + max_frames)
+            last_pause = None
+        last_pause = cut
+    if bounds[-1] != frames:
+        bounds.append(frames)
+
+    segments = []
+    for start, end in zip(bounds, bounds[1:]):
+        if end > start and not silent[start:end].all():
+            segments.append((start * frame, len(samples) if end == frames else end * frame))
+    return segments
@@ -0,0 +1,150 @@
+"""
+Text helpers for LLM prompts
+"""
+import hashlib
+import re
+from typing import List, Optional, Tuple
+
+
+def _is_cjk(char: str) -> bool:
+    code = ord(char)
+    return (
+        0x4E00 <= code <= 0x9FFF      # CJK unified ideographs
+        or 0x3400 <= code <= 0x4DBF   # Extension A
+        or 0x3040 <= code <= 0x30FF   # Hiragana, katakana
+        or 0xAC00 <= code <= 0xD7AF   # Hangul syllables
+        or 0xFF00 <= code <= 0xFFEF   # Full-width forms
+        or 0x3000 <= code <= 0x303F   # CJK punctuation
+    )
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count without a tokenizer.
+
+    BPE tokenizers spend about one token per CJK character and about one
+    per four characters of other text; this errs slightly high for both.
+    """
+    return _tokens(*_char_counts(text))
+
+
+def _char_counts(text: str) -> Tuple[int, int]:
+    """(CJK, other) character counts, which estimate_tokens is computed from"""
+    cjk = sum(1 for char in text if _is_cjk(char))
+    return cjk, len(text) - cjk
+
+
+def _tokens(cjk: int, other: int) -> int:
+    return cjk + (other + 3) // 4
+
+
+class _JoinedSize:
+    """
+    Estimated tokens of sentences joined by newlines, kept as they are added.
+
+    Token estimates don't add up (each rounds up its Latin characters), and
+    the separators cost too, so this counts characters across the whole
+    joined text instead of summing per-sentence estimates.
+    """
+
+    def __init__(self):
+        self.cjk = 0
+        self.other = 0
+        self.count = 0
+
+    @property
+    def tokens(self) -> int:
+        return _tokens(self.cjk, self.other)
+
+    def with_sentence(self, sentence: str) -> int:
+        """Tokens once sentence is added, without adding it"""
+        cjk, other = _char_counts(sentence)
+        return _tokens(self.cjk + cjk, self.other + other + (1 if self.count else 0))
+
+    def add(self, sentence: str) -> None:
+        cjk, other = _char_counts(sentence)
+        self.other += other + (1 if self.count else 0)
+        self.cjk += cjk
+        self.count += 1
+
+
+_SENTENCE_END = re.compile(r"(?<=[。！？!?；;…])|(?<=[.](?=\s))|\n+")
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split on sentence punctuation (Chinese and Latin) and line breaks, keeping the punctuation"""
+    return [part for part in (piece.strip() for piece in _SENTENCE_END.split(text)) if part]
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to at most max_tokens by estimate_tokens, preferring a sentence boundary"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    kept: List[str] = []
+    size = _JoinedSize()
+    for sentence in split_sentences(text):
+        if size.with_sentence(sentence) > max_tokens:
+            if not kept:
+                # A single oversized sentence: cut it by characters
+                return _cut_chars(sentence, max_tokens)
+            break
+        kept.append(sentence)
+        size.add(sentence)
+    return "\n".join(kept)
+
+
+def _cut_chars(text: str, max_tokens: int) -> str:
+    used = 0
+    for index, char in enumerate(text):
+        used += 4 if _is_cjk(char) else 1
+        if used > max_tokens * 4:
+            return text[:index]
+    return text
+
+
+def chunk_text(text: str, max_tokens: int, min_tokens: Optional[int] = None) -> List[str]:
+    """
+    Split text into chunks of at most max_tokens, on sentence boundaries.
+
+    Boundaries are content-defined: once a chunk holds min_tokens (half the
+    budget by default), it ends after the first sentence whose hash picks
+    it as a cut point. An edit therefore only moves boundaries near the
+    edit, and chunks elsewhere keep their exact text, which lets per-chunk
+    results be cached across re-analysis.
+    """
+    min_tokens = min_tokens if min_tokens is not None else max_tokens // 2
+    # About one sentence in four is a cut point
+    sentences_per_cut = 4
+
+    chunks: List[str] = []
+    current: List[str] = []
+    size = _JoinedSize()
+
+    def flush() -> None:
+        nonlocal current, size
+        if current:
+            chunks.append("\n".join(current))
+        current, size = [], _JoinedSize()
+
+    for sentence in split_sentences(text):
+        if estimate_tokens(sentence) > max_tokens:
+            # Oversized sentence: emit as its own hard-split pieces
+            flush()
+            while sentence:
+                piece = _cut_chars(sentence, max_tokens)
+                chunks.append(piece)
+                sentence = sentence[len(piece):]
+            continue
+
+        if size.with_sentence(sentence) > max_tokens:
+            flush()
+        current.append(sentence)
+        size.add(sentence)
+
+        digest = hashlib.blake2b(sentence.encode("utf-8"), digest_size=4).digest()
+        if size.tokens >= min_tokens and int.from_bytes(digest, "big") % sentences_per_cut == 0:
+            flush()
+
+    flush()
+    return chunks
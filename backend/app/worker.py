@@ -0,0 +1,180 @@
+"""
+Background worker entry point
+
+Run with: python -m app.worker [--processes N] [--concurrency N]
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import signal
+from typing import Any, Awaitable, Callable, Dict
+
+from .core.config import settings
+from .core.database import engine, unit_of_work
+from .core.redis import close_redis
+from .models.content import Content, ContentStatus
+from .services.content_service import content_service
+from .services.job_queue import JobQueue, job_queue
+from .services.render_service import render_service
+from .services.transcription_service import transcription_service
+from .services.upload_service import upload_service
+
+logger = logging.getLogger(__name__)
+
+
+class JobError(Exception):
+    """Raised by a handler to have the job retried"""
+    pass
+
+
+async def handle_analyze_content(payload: Dict[str, Any]) -> None:
+    """Run AI analysis for an uploaded content"""
+    async with unit_of_work() as db:
+        content = await db.get(Content, payload["content_id"])
+        if content is None or content.status == ContentStatus.READY:
+            return
+
+        content = await content_service.analyze_content(db, content, use_cache=payload.get("use_cache", True))
+
+    # Raised after the unit of work so the ERROR status is still committed
+    if content.status == ContentStatus.ERROR:
+        error = (content.analysis_result or {}).get("error", "Analysis failed")
+        raise JobError(error)
+
+
+async def handle_render_adaptations(payload: Dict[str, Any]) -> None:
+    """Render platform videos for a content's new adaptations"""
+    await render_service.render_adaptations(payload["content_id"])
+
+
+JOB_HANDLERS: Dict[str, Callable[[Dict[str, Any]], Awaitable[None]]] = {
+    "analyze_content": handle_analyze_content,
+    "render_adaptations": handle_render_adaptations,
+}
+
+
+async def _heartbeat(queue: JobQueue, job_id: str) -> None:
+    """Keep extending the visibility deadline while a job runs"""
+    interval = max(1, queue.visibility_timeout // 3)
+    while True:
+        await asyncio.sleep(interval)
+        await queue.extend(job_id)
+
+
+async def run_job(queue: JobQueue, job: Dict[str, Any]) -> None:
+    """Run a single job and ack or fail it"""
+    handler = JOB_HANDLERS.get(job["type"])
+    if handler is None:
+        await queue.fail(job, f"Unknown job type: {job['type']}")
+        return
+
+    heartbeat = asyncio.create_task(_heartbeat(queue, job["id"]))
+    try:
+        await handler(job["payload"])
+    except Exception as e:
+        retry = await queue.fail(job, str(e) or e.__class__.__name__)
+        logger.warning("Job %s (%s) failed, %s: %s", job["id"], job["type"],
+                       "retrying" if retry else "dead-lettered", e)
+    else:
+        await queue.ack(job["id"])
+    finally:
+        heartbeat.cancel()
+
+
+async def worker_loop(queue: JobQueue, concurrency: int, stop: asyncio.Event) -> None:
+    """Claim and run jobs until stop is set, at most `concurrency` at a time"""
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = set()
+
+    while not stop.is_set():
+        await semaphore.acquire()
+        try:
+            job = await queue.claim(timeout=1)
+        except Exception:
+            semaphore.release()
+            logger.exception("Failed to claim job")
+            await asyncio.sleep(1)
+            continue
+
+        if job is None:
+            semaphore.release()
+            continue
+
+        task = asyncio.create_task(run_job(queue, job))
+        tasks.add(task)
+        task.add_done_callback(lambda t: (tasks.discard(t), semaphore.release()))
+
+    # Let running jobs finish; unfinished ones are redelivered after their timeout
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def maintenance_loop(stop: asyncio.Event) -> None:
+    """Periodic housekeeping; safe to run in every worker process"""
+    while not stop.is_set():
+        try:
+            removed = await upload_service.cleanup_stale_sessions()
+            if removed:
+                logger.info("Removed %d stale upload sessions", removed)
+        except Exception:
+            logger.exception("Maintenance run failed")
+
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=settings.WORKER_MAINTENANCE_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def _run_worker(concurrency: int) -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    try:
+        await asyncio.gather(
+            worker_loop(job_queue, concurrency, stop),
+            maintenance_loop(stop)
+        )
+    finally:
+        transcription_service.shutdown()
+        await close_redis()
+        await engine.dispose()
+
+
+def run_worker_process(concurrency: int) -> None:
+    """Entry point for one worker process"""
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_run_worker(concurrency))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="CrossPilot background worker")
+    parser.add_argument("--processes", type=int, default=settings.WORKER_PROCESSES)
+    parser.add_argument("--concurrency", type=int, default=settings.WORKER_CONCURRENCY)
+    args = parser.parse_args()
+
+    # Spawn so each process builds its own event loop, engine and Redis client
+    ctx = multiprocessing.get_context("spawn")
+    processes = [
+        ctx.Process(target=run_worker_process, args=(args.concurrency,), daemon=False)
+        for _ in range(max(1, args.processes))
+    ]
+    for process in processes:
+        process.start()
+
+    def shutdown(signum, frame):
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
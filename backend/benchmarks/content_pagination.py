@@ -0,0 +1,105 @@
+"""
+Offset vs keyset paging over a large synthetic content list
+
+Seeds one user with many contents in the configured PostgreSQL database
+(DATABASE_URL), then times fetching pages at increasing depths with
+offset paging and with keyset paging. The synthetic user and its rows
+are removed afterwards unless --keep is given.
+
+    python -m benchmarks.content_pagination --rows 50000 --page-size 20
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert
+
+from app.core.database import async_session_maker, engine, init_db
+from app.models.content import Content, ContentStatus, ContentType
+from app.models.user import User
+from app.services.content_service import content_service
+
+
+async def seed(rows: int) -> int:
+    async with async_session_maker() as db:
+        tag = uuid.uuid4().hex[:8]
+        user = User(email=f"bench-{tag}@example.com", username=f"bench-{tag}", hashed_password="x")
+        db.add(user)
+        await db.flush()
+
+        start = datetime.utcnow()
+        batch = []
+        for i in range(rows):
+            # Some rows share a timestamp so the id tie-breaker is exercised
+            created = start - timedelta(seconds=i // 3)
+            batch.append({
+                "user_id": user.id,
+                "title": f"Synthetic post {i}",
+                "content_type": ContentType.ARTICLE,
+                "original_file_url": f"file:///tmp/bench/{i}",
+                "status": ContentStatus.READY,
+                "created_at": created,
+                "updated_at": created
+            })
+            if len(batch) == 5000:
+                await db.execute(insert(Content), batch)
+                batch = []
+        if batch:
+            await db.execute(insert(Content), batch)
+        await db.commit()
+        return user.id
+
+
+async def time_offset(user_id: int, page: int, page_size: int) -> float:
+    async with async_session_maker() as db:
+        start = time.perf_counter()
+        await content_service.list_user_contents(db, user_id, skip=page * page_size, limit=page_size)
+        return time.perf_counter() - start
+
+
+async def time_keyset(user_id: int, page: int, page_size: int, cursors: dict) -> float:
+    async with async_session_maker() as db:
+        start = time.perf_counter()
+        items = await content_service.list_user_contents(
+            db, user_id, limit=page_size, after=cursors.get(page)
+        )
+        elapsed = time.perf_counter() - start
+        if items:
+            cursors[page + 1] = (items[-1].created_at, items[-1].id)
+        return elapsed
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--keep", action="store_true")
+    args = parser.parse_args()
+
+    await init_db()
+    user_id = await seed(args.rows)
+    total_pages = args.rows // args.page_size
+
+    # Walk keyset pages once to learn the cursor for each depth
+    cursors = {0: None}
+    for page in range(total_pages):
+        await time_keyset(user_id, page, args.page_size, cursors)
+
+    print(f"{'page':>8} {'offset ms':>10} {'keyset ms':>10}")
+    for page in (0, 10, 100, total_pages // 4, total_pages // 2, total_pages - 1):
+        offset = min(await time_offset(user_id, page, args.page_size) for _ in range(5))
+        keyset = min(await time_keyset(user_id, page, args.page_size, cursors) for _ in range(5))
+        print(f"{page:>8} {1000 * offset:>10.2f} {1000 * keyset:>10.2f}")
+
+    if not args.keep:
+        async with async_session_maker() as db:
+            await db.execute(delete(Content).where(Content.user_id == user_id))
+            await db.execute(delete(User).where(User.id == user_id))
+            await db.commit()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
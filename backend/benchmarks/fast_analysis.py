@@ -0,0 +1,96 @@
+"""
+Throughput of the local analysis tier on a corpus of sample posts
+
+Analyzes every post with the configured fast analyzer and reports posts
+per second, per-post latency and what was extracted for a few posts. Uses
+jieba when it is installed, the bigram fallback otherwise. Needs no
+services or API keys.
+
+    python -m benchmarks.fast_analysis --posts 2000
+    python -m benchmarks.fast_analysis --corpus posts.txt   # one post per line
+"""
+import argparse
+import random
+import time
+from typing import List
+
+from app.services import fast_analysis
+from app.services.fast_analysis import TextRankAnalyzer
+
+SUBJECTS = ["人工智能", "短视频剪辑", "露营装备", "咖啡拉花", "健身减脂", "理财入门", "旅行攻略", "数码测评"]
+OPENERS = ["今天和大家聊聊{s}。", "很多人问我关于{s}的问题。", "最近在研究{s}，有一些心得。", "{s}到底值不值得入门？"]
+BODIES = [
+    "{s}最重要的是坚持，每天进步一点点。",
+    "新手入门{s}时最容易犯的错误就是贪多求快。",
+    "我整理了三个关于{s}的小技巧，建议收藏。",
+    "关于{s}，网上的说法很多，但真正有用的不多。",
+    "如果你预算有限，{s}可以先从基础款开始。",
+    "我用了一个月的时间测试{s}，结论有点意外。",
+    "评论区告诉我你们对{s}的看法。",
+]
+ENGLISH = [
+    "Quick {s} tips for beginners.",
+    "I tested {s} for a month and here is what happened.",
+    "The biggest mistake people make with {s} is rushing.",
+]
+
+
+def synthetic_posts(count: int, seed: int = 7) -> List[str]:
+    rng = random.Random(seed)
+    posts = []
+    for _ in range(count):
+        subject = rng.choice(SUBJECTS)
+        sentences = [rng.choice(OPENERS)] + rng.sample(BODIES, k=rng.randint(3, 6))
+        if rng.random() < 0.2:
+            sentences.append(rng.choice(ENGLISH))
+        posts.append("".join(sentence.format(s=subject) for sentence in sentences))
+    return posts
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--posts", type=int, default=2000)
+    parser.add_argument("--corpus", help="Text file with one post per line instead of synthetic posts")
+    parser.add_argument("--show", type=int, default=3, help="Print the result for this many posts")
+    args = parser.parse_args()
+
+    if args.corpus:
+        with open(args.corpus, encoding="utf-8") as f:
+            posts = [line.strip() for line in f if line.strip()]
+    else:
+        posts = synthetic_posts(args.posts)
+
+    analyzer = TextRankAnalyzer()
+    analyzer.analyze(posts[0])  # Warm up (loads jieba's dictionary if installed)
+
+    latencies = []
+    start = time.perf_counter()
+    results = []
+    for post in posts:
+        post_start = time.perf_counter()
+        results.append(analyzer.analyze(post))
+        latencies.append(time.perf_counter() - post_start)
+    elapsed = time.perf_counter() - start
+
+    tokenizer = "jieba" if fast_analysis.jieba is not None else "bigram fallback"
+    characters = sum(len(post) for post in posts)
+    print(f"analyzer={analyzer.name} tokenizer={tokenizer} posts={len(posts)} avg_chars={characters / len(posts):.0f}")
+    print(
+        f"{len(posts) / elapsed:8.0f} posts/s  {characters / elapsed / 1000:8.1f}k chars/s  "
+        f"p50={1000 * percentile(latencies, 50):.2f}ms p95={1000 * percentile(latencies, 95):.2f}ms "
+        f"max={1000 * max(latencies):.2f}ms"
+    )
+    for post, result in list(zip(posts, results))[:args.show]:
+        print(f"\n{post[:60]}...")
+        print(f"  topics:   {result['main_topics']}")
+        print(f"  hashtags: {result['hashtags']}")
+        print(f"  points:   {result['key_points'][:2]}")
+
+
+if __name__ == "__main__":
+    main()
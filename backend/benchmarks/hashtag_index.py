@@ -0,0 +1,84 @@
+"""
+Build time and search latency of the hashtag index on synthetic adaptations
+
+Builds one platform's index from generated (hashtags, title) rows the way
+the refresh does, then times suggestions for a set of queries and prints
+a few results. Needs no database.
+
+    python -m benchmarks.hashtag_index --adaptations 50000
+    python -m benchmarks.hashtag_index --adaptations 50000 --probes 8
+"""
+import argparse
+import random
+import time
+from typing import List, Tuple
+
+from app.core.config import settings
+from app.services.hashtag_index import build_platform_index, embed
+
+SUBJECTS = {
+    "咖啡": ["咖啡拉花", "手冲咖啡", "咖啡豆", "拿铁", "咖啡店探店"],
+    "露营": ["露营装备", "户外露营", "帐篷推荐", "野餐", "自驾游"],
+    "健身": ["健身减脂", "增肌", "居家健身", "跑步", "健康饮食"],
+    "理财": ["理财入门", "基金定投", "存钱计划", "副业", "记账"],
+    "数码": ["数码测评", "手机推荐", "耳机", "平板电脑", "拍照技巧"],
+    "旅行": ["旅行攻略", "小众景点", "酒店推荐", "citywalk", "美食地图"],
+}
+TITLES = ["{s}新手必看的{n}个技巧", "关于{s}我踩过的{n}个坑", "{n}分钟讲清楚{s}", "{s}到底值不值得"]
+QUERIES = ["今天聊聊手冲咖啡怎么做", "新手露营需要带什么", "基金定投怎么开始", "居家健身一周计划", "这款耳机值得买吗", "周末去哪里citywalk"]
+
+
+def synthetic_rows(count: int, seed: int = 7) -> List[Tuple[List[str], str]]:
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(count):
+        subject = rng.choice(list(SUBJECTS))
+        tags = [f"#{tag}" for tag in rng.sample(SUBJECTS[subject], 3)]
+        # A long tail of one-off tags, as real adaptations have
+        tags.append(f"#{subject}{rng.randint(0, count // 10)}")
+        if rng.random() < 0.3:
+            tags.append("#干货")
+        title = rng.choice(TITLES).format(s=subject, n=rng.randint(2, 9))
+        rows.append((tags, f"{title} {subject}"))
+    return rows
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--adaptations", type=int, default=50000)
+    parser.add_argument("--searches", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--probes", type=int, default=settings.HASHTAG_INDEX_PROBES)
+    args = parser.parse_args()
+
+    rows = synthetic_rows(args.adaptations)
+    start = time.perf_counter()
+    index = build_platform_index(rows, settings.HASHTAG_INDEX_DIM, settings.HASHTAG_INDEX_TAG_WEIGHT)
+    build_seconds = time.perf_counter() - start
+    print(f"adaptations={len(rows)} tags={len(index)} lists={len(index.lists)} build={build_seconds:.2f}s")
+
+    latencies = []
+    for i in range(args.searches):
+        search_start = time.perf_counter()
+        query = embed([QUERIES[i % len(QUERIES)]], settings.HASHTAG_INDEX_DIM)[0]
+        index.search(query, args.limit, args.probes)
+        latencies.append(time.perf_counter() - search_start)
+    print(
+        f"probes={args.probes}  p50={1000 * percentile(latencies, 50):.3f}ms "
+        f"p95={1000 * percentile(latencies, 95):.3f}ms p99={1000 * percentile(latencies, 99):.3f}ms "
+        f"max={1000 * max(latencies):.3f}ms"
+    )
+
+    for text in QUERIES[:3]:
+        matches = index.search(embed([text], settings.HASHTAG_INDEX_DIM)[0], args.limit, args.probes)
+        print(f"\n{text}")
+        print("  " + " ".join(f"{match.tag}({match.uses})" for match in matches))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Latency of unrelated endpoints during a login storm
+
+Runs a burst of bcrypt verifications inside the API's event loop, first
+inline (the old verify_password) and then through the password executor,
+while probing GET /health through the ASGI app. Needs no database.
+
+    python -m benchmarks.login_storm --logins 200 --probes 400
+"""
+import argparse
+import asyncio
+import time
+from typing import List
+
+import httpx
+
+from app.core.security import get_password_hash, verify_password, verify_password_async
+from app.main import app
+
+
+async def probe(client: httpx.AsyncClient, count: int, latencies: List[float]) -> None:
+    for _ in range(count):
+        start = time.perf_counter()
+        response = await client.get("/health")
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(0.002)
+
+
+async def inline_login(password: str, hashed: str) -> None:
+    verify_password(password, hashed)
+
+
+async def offloaded_login(password: str, hashed: str) -> None:
+    await verify_password_async(password, hashed)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+async def run(name: str, login, logins: int, probes: int, hashed: str) -> None:
+    latencies: List[float] = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        storm = asyncio.gather(*(login("correct horse battery", hashed) for _ in range(logins)))
+        await asyncio.gather(storm, probe(client, probes, latencies))
+        elapsed = time.perf_counter() - start
+
+    print(
+        f"{name:>9}: {logins} logins in {elapsed:6.2f}s  /health "
+        f"p50={1000 * percentile(latencies, 50):7.1f}ms "
+        f"p99={1000 * percentile(latencies, 99):7.1f}ms "
+        f"max={1000 * max(latencies):7.1f}ms"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--probes", type=int, default=400)
+    args = parser.parse_args()
+
+    hashed = get_password_hash("correct horse battery")
+    await run("inline", inline_login, args.logins, args.probes, hashed)
+    await run("offloaded", offloaded_login, args.logins, args.probes, hashed)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
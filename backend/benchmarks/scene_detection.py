@@ -0,0 +1,129 @@
+"""
+Scene detection speed and accuracy on a 1080p clip with known cuts
+
+Generates a 1080p clip of test-pattern shots of random length (or takes
+--source), stream-copies it in a loop to --seconds so an hour of video
+costs one short encode, then runs the scene service's detection on it.
+Reports decode-only and full detection time as a multiple of real time,
+the time per hour of video, and (for the generated clip) how many of the
+known cuts were found within one sampled frame. Needs ffmpeg; no database.
+
+    python -m benchmarks.scene_detection --seconds 3600
+    python -m benchmarks.scene_detection --source talk.mp4 --fps 4
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import subprocess
+import tempfile
+import time
+from typing import List
+
+from app.core.config import settings
+from app.services.scene_service import scene_service
+from app.utils.media import probe_media, sample_frames
+
+PATTERNS = ["testsrc2", "smptehdbars", "rgbtestsrc"]
+
+
+def make_source(path: str, seconds: int, seed: int) -> List[float]:
+    """Encode a clip of shots summing to seconds; returns the times of its cuts"""
+    rng = random.Random(seed)
+    shots, cuts, elapsed = [], [], 0.0
+    while elapsed < seconds:
+        length = min(rng.randint(2, 20), seconds - elapsed)
+        # Consecutive shots use different patterns, so every cut is a real change of picture
+        pattern = rng.choice([name for name in PATTERNS if not shots or not shots[-1].startswith(name)])
+        shots.append(f"{pattern}=size=1920x1080:rate=30:duration={length},hue=h={rng.randint(0, 359)}[v{len(shots)}]")
+        elapsed += length
+        cuts.append(elapsed)
+    graph = ";".join(shots) + ";" + "".join(f"[v{index}]" for index in range(len(shots)))
+    graph += f"concat=n={len(shots)}:v=1:a=0[out]"
+    subprocess.run(
+        [
+            settings.FFMPEG_BINARY, "-hide_banner", "-loglevel", "error", "-y",
+            "-filter_complex", graph, "-map", "[out]",
+            "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p", path
+        ],
+        check=True
+    )
+    return cuts[:-1]
+
+
+def loop_source(clip: str, path: str, seconds: int) -> None:
+    subprocess.run(
+        [
+            settings.FFMPEG_BINARY, "-hide_banner", "-loglevel", "error", "-y",
+            "-stream_loop", "-1", "-i", clip, "-t", str(seconds), "-c", "copy", path
+        ],
+        check=True
+    )
+
+
+def decode_only(source: str) -> int:
+    info = probe_media(source)
+    width = settings.SCENE_FRAME_WIDTH
+    height = max(2, round(width * info.height / info.width))
+    return sum(
+        len(batch)
+        for batch in sample_frames(source, settings.SCENE_SAMPLE_FPS, width, height, settings.SCENE_BATCH_FRAMES)
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--source", help="Video to scan instead of a generated clip")
+    parser.add_argument("--seconds", type=int, default=600, help="Length of the generated video")
+    parser.add_argument("--clip-seconds", type=int, default=300, help="Length of the clip that is looped")
+    parser.add_argument("--fps", type=float, default=settings.SCENE_SAMPLE_FPS, help="Sampled frames per second")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    settings.SCENE_SAMPLE_FPS = args.fps
+
+    work_dir = tempfile.mkdtemp(prefix="crosspilot_scene_bench_")
+    try:
+        source, cuts = args.source, None
+        if not source:
+            clip = os.path.join(work_dir, "clip.mp4")
+            clip_seconds = min(args.clip_seconds, args.seconds)
+            clip_cuts = make_source(clip, clip_seconds, args.seed)
+            source = os.path.join(work_dir, "source.mp4")
+            loop_source(clip, source, args.seconds)
+            # Every loop starts with a cut back to the first shot
+            cuts = [
+                start + cut
+                for start in range(0, args.seconds, clip_seconds)
+                for cut in ([0.0] if start else []) + clip_cuts
+                if start + cut < args.seconds
+            ]
+
+        info = probe_media(source)
+        print(f"source={info.width}x{info.height} {info.duration:.0f}s  sample_fps={args.fps} width={settings.SCENE_FRAME_WIDTH}")
+
+        start = time.perf_counter()
+        frames = decode_only(source)
+        decode_wall = time.perf_counter() - start
+        start = time.perf_counter()
+        result = asyncio.run(scene_service.detect(source))
+        detect_wall = time.perf_counter() - start
+
+        for label, wall in (("decode only", decode_wall), ("decode + detection", detect_wall)):
+            print(
+                f"{label:<20} wall={wall:7.1f}s speed={info.duration / wall:6.1f}x realtime  "
+                f"per hour of video={3600 * wall / info.duration:6.1f}s"
+            )
+        print(f"frames sampled={frames}  scenes={len(result['scenes'])}  visual={result['visual']}")
+
+        if cuts is not None:
+            found = [scene["start"] for scene in result["scenes"][1:]]
+            tolerance = 1 / args.fps + 1e-6
+            hits = sum(any(abs(cut - at) <= tolerance for at in found) for cut in cuts)
+            print(f"known cuts={len(cuts)}  found={hits} ({hits / max(len(cuts), 1):.0%})  detected={len(found)}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Event-loop lag under concurrent S3 uploads
+
+Compares calling boto3 directly inside coroutines (the old behaviour)
+with StorageService's executor-backed client, against a local
+S3-compatible server.
+
+    moto_server -p 5000            # or: minio server /tmp/minio
+    S3_ENDPOINT_URL=http://localhost:5000 \\
+    AWS_ACCESS_KEY_ID=test AWS_SECRET_ACCESS_KEY=test \\
+    python -m benchmarks.storage_event_loop --uploads 32 --size-mb 8
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from typing import List
+
+from app.core.config import settings
+from app.services.storage_service import storage_service
+
+
+async def measure_lag(stop: asyncio.Event, interval: float, samples: List[float]) -> None:
+    """Record how late a periodic timer fires; lateness is time the loop was blocked"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(time.perf_counter() - start - interval)
+
+
+async def blocking_upload(key: str, body: bytes) -> None:
+    storage_service.s3_client.put_object(Bucket=storage_service.bucket_name, Key=key, Body=body)
+
+
+async def executor_upload(key: str, body: bytes) -> None:
+    await storage_service._s3("put_object", nbytes=len(body), Bucket=storage_service.bucket_name, Key=key, Body=body)
+
+
+async def run(name: str, upload, uploads: int, body: bytes) -> None:
+    samples: List[float] = []
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(measure_lag(stop, 0.005, samples))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(upload(f"bench/{name}/{i}", body) for i in range(uploads)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await ticker
+
+    samples.sort()
+    p99 = samples[int(0.99 * (len(samples) - 1))] if samples else 0.0
+    total_mb = uploads * len(body) / (1024 * 1024)
+    print(
+        f"{name:>9}: {elapsed:6.2f}s  {total_mb / elapsed:7.1f} MB/s  "
+        f"loop lag p50={1000 * statistics.median(samples or [0]):7.1f}ms "
+        f"p99={1000 * p99:7.1f}ms max={1000 * max(samples or [0]):7.1f}ms  "
+        f"ticks={len(samples)}"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uploads", type=int, default=32)
+    parser.add_argument("--size-mb", type=float, default=8)
+    args = parser.parse_args()
+
+    if not storage_service.s3_client or not settings.S3_ENDPOINT_URL:
+        raise SystemExit("Set S3_ENDPOINT_URL, AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY")
+
+    exceptions = storage_service.s3_client.exceptions
+    try:
+        storage_service.s3_client.create_bucket(Bucket=storage_service.bucket_name)
+    except (exceptions.BucketAlreadyOwnedByYou, exceptions.BucketAlreadyExists):
+        pass
+
+    body = os.urandom(int(args.size_mb * 1024 * 1024))
+    await run("blocking", blocking_upload, args.uploads, body)
+    await run("executor", executor_upload, args.uploads, body)
+    print(storage_service.metrics.snapshot())
+    storage_service.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,115 @@
+"""
+Single-decode multi-output rendering vs. one re-encode per platform
+
+Renders the video variants for the given platforms twice: once as the
+render service does (one ffmpeg process decoding the source once and
+encoding every distinct variant), and once naively (a separate decode and
+encode per platform, run one after another or with --parallel side by
+side). The render pool allows RENDER_PROCESSES ffmpeg processes at a time.
+Reports wall time, child CPU time and the largest ffmpeg resident set.
+Needs ffmpeg; without --source a 1080p test clip is generated.
+
+    python -m benchmarks.video_render --seconds 120
+    python -m benchmarks.video_render --source talk.mp4 --parallel 2
+"""
+import argparse
+import asyncio
+import os
+import resource
+import shutil
+import subprocess
+import tempfile
+import time
+from typing import List
+
+from app.core.config import settings
+from app.models.content import Platform
+from app.services.render_service import plan_video_variants, render_service
+from app.utils.media import probe_media
+
+DEFAULT_PLATFORMS = "douyin,kuaishou,xiaohongshu,weibo,bilibili,wechat_video"
+
+
+def make_source(path: str, seconds: int) -> None:
+    subprocess.run(
+        [
+            settings.FFMPEG_BINARY, "-hide_banner", "-loglevel", "error", "-y",
+            "-f", "lavfi", "-i", f"testsrc2=size=1920x1080:rate=30:duration={seconds}",
+            "-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}",
+            "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac", "-shortest", path
+        ],
+        check=True
+    )
+
+
+def children_usage():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime, usage.ru_maxrss
+
+
+async def render_all(source: str, platforms: List[Platform], work_dir: str) -> None:
+    await render_service.render_variants(source, platforms, work_dir)
+
+
+async def render_each(source: str, platforms: List[Platform], work_dir: str, parallel: int) -> None:
+    slots = asyncio.Semaphore(parallel)
+
+    async def render(platform: Platform) -> None:
+        async with slots:
+            platform_dir = os.path.join(work_dir, platform.value)
+            os.makedirs(platform_dir, exist_ok=True)
+            await render_service.render_variants(source, [platform], platform_dir)
+
+    await asyncio.gather(*(render(platform) for platform in platforms))
+
+
+def measure(label: str, run, seconds: float) -> None:
+    cpu_before, _ = children_usage()
+    start = time.perf_counter()
+    asyncio.run(run)
+    wall = time.perf_counter() - start
+    cpu_after, max_rss = children_usage()
+    print(
+        f"{label:<28} wall={wall:7.1f}s cpu={cpu_after - cpu_before:7.1f}s "
+        f"speed={seconds / wall:5.2f}x realtime  peak_rss={max_rss / 1024:.0f}MB (largest child so far)"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--source", help="Video to render instead of a generated test clip")
+    parser.add_argument("--seconds", type=int, default=60, help="Length of the generated clip")
+    parser.add_argument("--platforms", default=DEFAULT_PLATFORMS)
+    parser.add_argument("--parallel", type=int, default=1, help="Naive re-encodes run side by side")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="crosspilot_render_bench_")
+    try:
+        source = args.source
+        if not source:
+            source = os.path.join(work_dir, "source.mp4")
+            make_source(source, args.seconds)
+
+        info = probe_media(source)
+        platforms = [Platform(name.strip()) for name in args.platforms.split(",")]
+        variants = plan_video_variants(platforms, info)
+        longest = max(variant.duration or info.duration for variant in variants)
+        os.makedirs(os.path.join(work_dir, "single"))
+        print(f"source={info.width}x{info.height} {info.duration:.0f}s  platforms={len(platforms)} variants={len(variants)}")
+        for variant in variants:
+            how = f"cut from {variant.trim_of.name}" if variant.trim_of else "encoded"
+            print(f"  {variant.name:<18} {how:<22} {', '.join(platform.value for platform in variant.platforms)}")
+
+        measure("single decode, all outputs", render_all(source, platforms, os.path.join(work_dir, "single")), longest)
+        # The naive pipeline renders each platform on its own, sharing nothing
+        measure(
+            f"per platform (parallel={args.parallel})",
+            render_each(source, platforms, os.path.join(work_dir, "naive"), args.parallel),
+            longest
+        )
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
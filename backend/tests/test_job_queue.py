@@ -0,0 +1,173 @@
+"""
+Job queue state moves against an in-process Redis stand-in (fakeredis, with Lua)
+"""
+import types
+
+import pytest
+from fakeredis import aioredis as fakeredis
+
+from app.services import job_queue as job_queue_module
+from app.services.job_queue import JobQueue
+
+
+class Clock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(job_queue_module, "time", types.SimpleNamespace(time=clock.time))
+    return clock
+
+
+@pytest.fixture
+async def redis():
+    client = fakeredis.FakeRedis(decode_responses=True)
+    yield client
+    await client.aclose()
+
+
+@pytest.fixture
+def queue(redis, clock) -> JobQueue:
+    return JobQueue("test", redis=redis, visibility_timeout=30, max_attempts=3, backoff_base=10.0, backoff_max=60.0)
+
+
+async def test_claim_and_ack(queue, redis):
+    job_id = await queue.enqueue("analyze_content", {"content_id": 7})
+
+    job = await queue.claim(timeout=1)
+    assert job["id"] == job_id
+    assert job["payload"] == {"content_id": 7}
+    assert await queue.stats() == {"ready": 0, "inflight": 1, "delayed": 0, "dead": 0}
+    assert await redis.lrange(queue.claimed_key, 0, -1) == [job_id]
+
+    await queue.ack(job_id)
+    assert await queue.stats() == {"ready": 0, "inflight": 0, "delayed": 0, "dead": 0}
+    assert await redis.llen(queue.claimed_key) == 0
+    assert await redis.hget(queue.jobs_key, job_id) is None
+
+
+async def test_jobs_are_claimed_in_enqueue_order(queue):
+    first = await queue.enqueue("a", {})
+    second = await queue.enqueue("b", {})
+    assert (await queue.claim(timeout=1))["id"] == first
+    assert (await queue.claim(timeout=1))["id"] == second
+
+
+async def test_expired_claim_is_redelivered(queue, clock):
+    job_id = await queue.enqueue("render_adaptations", {"content_id": 1})
+    await queue.claim(timeout=1)
+
+    clock.advance(queue.visibility_timeout + 1)
+    await queue.promote_due()
+    # The lost attempt counts, and the job waits out its backoff like any failure
+    assert await queue.stats() == {"ready": 0, "inflight": 0, "delayed": 1, "dead": 0}
+
+    clock.advance(queue.backoff_base)
+    job = await queue.claim(timeout=1)
+    assert job["id"] == job_id
+    assert job["attempts"] == 1
+    assert job["last_error"] == "Visibility timeout expired"
+
+
+async def test_extended_claim_is_not_redelivered(queue, clock):
+    job_id = await queue.enqueue("render_adaptations", {})
+    await queue.claim(timeout=1)
+
+    clock.advance(queue.visibility_timeout - 1)
+    await queue.extend(job_id)
+    clock.advance(2)
+    await queue.promote_due()
+    assert await queue.stats() == {"ready": 0, "inflight": 1, "delayed": 0, "dead": 0}
+
+
+async def test_job_claimed_by_a_crashed_worker_is_adopted(queue, redis, clock):
+    # The worker moved the job to claimed but died before giving it a deadline
+    job_id = await queue.enqueue("analyze_content", {})
+    await redis.lmove(queue.ready_key, queue.claimed_key, "RIGHT", "LEFT")
+
+    await queue.promote_due()
+    assert await redis.zscore(queue.inflight_key, job_id) == clock.now + queue.visibility_timeout
+
+    clock.advance(queue.visibility_timeout + 1)
+    await queue.promote_due()
+    assert await redis.llen(queue.claimed_key) == 0
+    assert await redis.zscore(queue.delayed_key, job_id) is not None
+
+
+async def test_failed_job_is_retried_with_exponential_backoff(queue, redis, clock):
+    job_id = await queue.enqueue("analyze_content", {})
+
+    for attempt, delay in ((1, queue.backoff_base), (2, 2 * queue.backoff_base)):
+        job = await queue.claim(timeout=1)
+        assert job["id"] == job_id
+        assert await queue.fail(job, "boom") is True
+
+        retry_at = await redis.zscore(queue.delayed_key, job_id)
+        # Full jitter over the upper half of the delay
+        assert clock.now + delay / 2 <= retry_at <= clock.now + delay
+        assert await redis.llen(queue.claimed_key) == 0
+
+        await queue.promote_due()
+        assert await queue.stats() == {"ready": 0, "inflight": 0, "delayed": 1, "dead": 0}
+        clock.advance(delay)
+        await queue.promote_due()
+        assert await queue.stats() == {"ready": 1, "inflight": 0, "delayed": 0, "dead": 0}
+
+    job = await queue.claim(timeout=1)
+    assert job["attempts"] == 2
+    assert job["last_error"] == "boom"
+
+
+async def test_backoff_is_capped(queue):
+    assert all(queue._backoff(20) <= queue.backoff_max for _ in range(100))
+
+
+async def test_job_moves_to_dead_after_its_last_attempt(queue, clock):
+    job_id = await queue.enqueue("analyze_content", {}, max_attempts=2)
+
+    job = await queue.claim(timeout=1)
+    assert await queue.fail(job, "first") is True
+    clock.advance(queue.backoff_base)
+    job = await queue.claim(timeout=1)
+    assert await queue.fail(job, "second") is False
+
+    assert await queue.stats() == {"ready": 0, "inflight": 0, "delayed": 0, "dead": 1}
+    [dead] = await queue.dead_letters()
+    assert dead["id"] == job_id
+    assert dead["attempts"] == 2
+    assert dead["last_error"] == "second"
+
+
+async def test_expired_last_attempt_moves_to_dead(queue, clock):
+    await queue.enqueue("analyze_content", {}, max_attempts=1)
+    await queue.claim(timeout=1)
+
+    clock.advance(queue.visibility_timeout + 1)
+    await queue.promote_due()
+    assert await queue.stats() == {"ready": 0, "inflight": 0, "delayed": 0, "dead": 1}
+
+
+async def test_requeue_dead(queue, redis):
+    job_id = await queue.enqueue("render_adaptations", {"content_id": 3, "platforms": []}, max_attempts=1)
+    await queue.fail(await queue.claim(timeout=1), "boom")
+
+    assert await queue.requeue_dead(job_id) is True
+    assert await queue.stats() == {"ready": 1, "inflight": 0, "delayed": 0, "dead": 0}
+    job = await queue.claim(timeout=1)
+    assert job["id"] == job_id
+    assert job["attempts"] == 0
+    # Empty lists survive the round trip through the requeue script
+    assert job["payload"] == {"content_id": 3, "platforms": []}
+
+    # Only dead jobs can be requeued, and only once
+    assert await queue.requeue_dead(job_id) is False
+    assert await queue.requeue_dead("missing") is False
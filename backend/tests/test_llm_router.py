@@ -0,0 +1,220 @@
+"""
+LLM routing against mock HTTP servers: failover, circuit breakers and hedged requests
+
+Both SDK clients talk to httpx.MockTransport handlers, so requests go
+through the real clients and error mapping, with no network.
+"""
+import asyncio
+import json
+import time
+
+import httpx
+import openai
+import pytest
+
+from app.core.config import settings
+from app.services.llm_router import AnthropicProvider, CircuitBreaker, LLMRouter, LLMUnavailableError, OpenAIProvider
+
+
+def openai_reply(text: str) -> httpx.Response:
+    return httpx.Response(200, json={
+        "id": "chatcmpl-test",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "gpt-test",
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}
+    })
+
+
+def anthropic_reply(text: str) -> httpx.Response:
+    return httpx.Response(200, json={
+        "id": "msg_test",
+        "type": "message",
+        "role": "assistant",
+        "model": "claude-test",
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {"input_tokens": 10, "output_tokens": 5}
+    })
+
+
+def error_reply(status_code: int) -> httpx.Response:
+    return httpx.Response(status_code, json={"error": {"type": "error", "message": f"status {status_code}"}})
+
+
+class MockServer:
+    """Counts requests and answers them with handler, which may be async"""
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.requests = 0
+        self.request_times = []
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        self.request_times.append(time.monotonic())
+        response = self.handler(request)
+        if asyncio.iscoroutine(response):
+            response = await response
+        return response
+
+
+@pytest.fixture(autouse=True)
+def llm_settings(monkeypatch):
+    # Failover, not the SDKs' own retries, is under test
+    monkeypatch.setattr(settings, "LLM_CLIENT_MAX_RETRIES", 0)
+    monkeypatch.setattr(settings, "LLM_BREAKER_FAILURE_THRESHOLD", 2)
+    monkeypatch.setattr(settings, "LLM_BREAKER_COOLDOWN_SECONDS", 30.0)
+    monkeypatch.setattr(settings, "LLM_RATE_LIMIT_RETRIES", 0)
+
+
+def openai_provider(server: MockServer) -> OpenAIProvider:
+    return OpenAIProvider(
+        "test-key", "gpt-test", base_url="http://openai.test/v1",
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(server))
+    )
+
+
+def anthropic_provider(server: MockServer) -> AnthropicProvider:
+    return AnthropicProvider(
+        "test-key", "claude-test", base_url="http://anthropic.test",
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(server))
+    )
+
+
+def timeout(request: httpx.Request) -> httpx.Response:
+    raise httpx.ReadTimeout("timed out", request=request)
+
+
+async def test_fails_over_on_timeout():
+    primary = MockServer(timeout)
+    secondary = MockServer(lambda request: anthropic_reply('"from": "anthropic"}'))
+    router = LLMRouter([openai_provider(primary), anthropic_provider(secondary)])
+
+    assert json.loads(await router.complete("system", "prompt")) == {"from": "anthropic"}
+    assert (primary.requests, secondary.requests) == (1, 1)
+    assert router.failovers == 1
+    assert router.providers[0].breaker.failures == 1
+    assert router.providers[0].health.error_rate == 1.0
+
+
+async def test_fails_over_past_a_misconfigured_provider():
+    primary = MockServer(lambda request: error_reply(401))
+    secondary = MockServer(lambda request: anthropic_reply('"ok": true}'))
+    router = LLMRouter([openai_provider(primary), anthropic_provider(secondary)])
+
+    assert json.loads(await router.complete("system", "prompt")) == {"ok": True}
+    # A bad key fails every call: the breaker opens without waiting for the threshold
+    assert router.providers[0].breaker.state == CircuitBreaker.OPEN
+
+    await router.complete("system", "prompt")
+    assert (primary.requests, secondary.requests) == (1, 2)
+
+
+async def test_bad_request_is_not_sent_to_another_provider():
+    primary = MockServer(lambda request: error_reply(400))
+    secondary = MockServer(lambda request: anthropic_reply('"ok": true}'))
+    router = LLMRouter([openai_provider(primary), anthropic_provider(secondary)])
+
+    with pytest.raises(openai.BadRequestError):
+        await router.complete("system", "prompt")
+    assert secondary.requests == 0
+    assert router.providers[0].breaker.state == CircuitBreaker.CLOSED
+
+
+async def test_own_errors_are_not_retryable():
+    assert not OpenAIProvider.is_retryable(json.JSONDecodeError("bad", "", 0))
+    assert not OpenAIProvider.is_retryable(KeyError("choices"))
+    assert OpenAIProvider.is_retryable(asyncio.TimeoutError())
+    assert OpenAIProvider.is_retryable(httpx.ConnectError("refused"))
+
+
+async def test_breaker_opens_then_half_open_probe_closes_it():
+    healthy = False
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return openai_reply('{"ok": true}') if healthy else timeout(request)
+
+    server = MockServer(handler)
+    provider = openai_provider(server)
+    router = LLMRouter([provider])
+
+    for _ in range(settings.LLM_BREAKER_FAILURE_THRESHOLD):
+        with pytest.raises(LLMUnavailableError):
+            await router.complete("system", "prompt")
+    assert provider.breaker.state == CircuitBreaker.OPEN
+
+    # Open: nothing is sent during the cooldown
+    with pytest.raises(LLMUnavailableError):
+        await router.complete("system", "prompt")
+    assert server.requests == settings.LLM_BREAKER_FAILURE_THRESHOLD
+
+    # After the cooldown one probe goes through; a second caller is held back meanwhile
+    provider.breaker.opened_at -= settings.LLM_BREAKER_COOLDOWN_SECONDS
+    assert provider.breaker.acquire()
+    assert provider.breaker.state == CircuitBreaker.HALF_OPEN
+    assert not provider.breaker.acquire()
+    provider.breaker.release()
+
+    healthy = True
+    assert json.loads(await router.complete("system", "prompt")) == {"ok": True}
+    assert provider.breaker.state == CircuitBreaker.CLOSED
+
+
+async def test_failed_half_open_probe_reopens_breaker():
+    server = MockServer(timeout)
+    provider = openai_provider(server)
+    router = LLMRouter([provider])
+    provider.breaker.trip()
+    provider.breaker.opened_at -= settings.LLM_BREAKER_COOLDOWN_SECONDS
+
+    with pytest.raises(LLMUnavailableError):
+        await router.complete("system", "prompt")
+    assert server.requests == 1
+    assert provider.breaker.state == CircuitBreaker.OPEN
+    assert not provider.breaker.available()
+
+
+def hedging_router(primary: MockServer, secondary: MockServer, p95: float) -> LLMRouter:
+    router = LLMRouter([openai_provider(primary), anthropic_provider(secondary)], hedge=True, hedge_min_delay=0.01)
+    # Enough history for the hedge delay to be the primary's p95; the secondary is slower, so ranked second
+    for _ in range(LLMRouter.MIN_HEDGE_SAMPLES):
+        router.providers[0].health.record(p95, True)
+        router.providers[1].health.record(p95 * 4, True)
+    return router
+
+
+async def test_hedge_fires_after_p95_and_first_response_wins():
+    async def slow(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(5)
+        return openai_reply('{"from": "openai"}')
+
+    primary = MockServer(slow)
+    secondary = MockServer(lambda request: anthropic_reply('"from": "anthropic"}'))
+    router = hedging_router(primary, secondary, p95=0.2)
+
+    started = time.monotonic()
+    assert json.loads(await router.complete("system", "prompt")) == {"from": "anthropic"}
+    elapsed = time.monotonic() - started
+
+    assert router.hedges == 1
+    assert secondary.request_times[0] - started >= 0.2
+    # The slow primary was cancelled rather than awaited, and losing the race isn't held against it
+    assert elapsed < 2
+    assert router.providers[0].breaker.failures == 0
+
+
+async def test_no_hedge_when_primary_answers_within_p95():
+    async def quick(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(0.02)
+        return openai_reply('{"from": "openai"}')
+
+    primary = MockServer(quick)
+    secondary = MockServer(lambda request: anthropic_reply('"from": "anthropic"}'))
+    router = hedging_router(primary, secondary, p95=0.5)
+
+    assert json.loads(await router.complete("system", "prompt")) == {"from": "openai"}
+    assert router.hedges == 0
+    assert secondary.requests == 0
@@ -0,0 +1,46 @@
+"""
+Token budgets of truncate_to_tokens and chunk_text
+"""
+import random
+
+import pytest
+
+from app.utils.text import chunk_text, estimate_tokens, truncate_to_tokens
+
+
+def mixed_text(seed: int, sentences: int) -> str:
+    """Many short sentences of Chinese and Latin text, where newline separators add up"""
+    rng = random.Random(seed)
+    parts = []
+    for _ in range(sentences):
+        kind = rng.random()
+        if kind < 0.5:
+            parts.append("好" * rng.randint(1, 8) + "。")
+        elif kind < 0.9:
+            parts.append("word " * rng.randint(0, 5) + "end. ")
+        else:
+            parts.append("短；")
+    return "".join(parts)
+
+
+@pytest.mark.parametrize("budget", [50, 300, 3000])
+def test_chunks_stay_within_budget(budget):
+    text = mixed_text(seed=budget, sentences=5000)
+    chunks = chunk_text(text, budget)
+    assert len(chunks) > 1
+    assert max(estimate_tokens(chunk) for chunk in chunks) <= budget
+
+
+@pytest.mark.parametrize("budget", [50, 300, 3000])
+def test_truncation_stays_within_budget(budget):
+    text = mixed_text(seed=budget, sentences=5000)
+    truncated = truncate_to_tokens(text, budget)
+    assert estimate_tokens(truncated) <= budget
+    # Close to the budget, not cut far short
+    assert estimate_tokens(truncated) > budget * 0.9
+
+
+def test_oversized_sentence_is_split():
+    text = "好" * 250
+    assert [estimate_tokens(chunk) for chunk in chunk_text(text, 100)] == [100, 100, 50]
+    assert truncate_to_tokens(text, 100) == "好" * 100
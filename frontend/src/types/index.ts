@@ -91,6 +91,7 @@ export interface AdaptationPreview {
   suggested_hashtags: string[];
   thumbnail_preview_url: string | null;
   estimated_duration_seconds: number | null;
+  error?: string | null;
 }
 
 export interface Adaptation {
@@ -103,6 +104,7 @@ export interface Adaptation {
   hashtags: string[] | null;
   adapted_file_url: string | null;
   thumbnail_url: string | null;
+  media_urls?: string[] | null;
   status: AdaptationStatus;
   published_at: string | null;
   platform_post_url: string | null;